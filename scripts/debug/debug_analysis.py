@@ -2,6 +2,7 @@
 
 用法：
     python scripts/debug/debug_analysis.py path/to/frames_dir [--mock]
+    python scripts/debug/debug_analysis.py path/to/frames_dir --compare-contact-sheet [--grid 3]
     
 功能：
     - 测试两层并发策略
@@ -9,10 +10,12 @@
     - 测试提示词加载
     - 模拟或真实 LLM 调用
     - 输出详细并发日志
+    - 对比拼图模式与逐帧模式的请求数和标签一致性
 """
 
 import asyncio
 import sys
+import time
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -41,7 +44,67 @@ class MockLLMClient:
         return '{"names": ["候选1", "候选2", "候选3"]}'
 
 
-async def main(frames_dir: Path, use_mock: bool = False):
+class CountingLLMClient:
+    """统计请求数、图片分片数和图片字节数的 LLM 客户端包装."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.requests = 0
+        self.images = 0
+        self.image_bytes = 0
+
+    async def classify(self, prompt, images, **kwargs):
+        self.requests += 1
+        self.images += len(images)
+        self.image_bytes += sum(len(img.read_bytes()) for img in images)
+        return await self.inner.classify(prompt, images, **kwargs)
+
+    async def generate(self, prompt, **kwargs):
+        return await self.inner.generate(prompt, **kwargs)
+
+
+def label_agreement(a, b) -> float:
+    """两组标签的一致性（Jaccard 相似度）."""
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+async def compare_contact_sheet(frames, llm_client, config, logger, grid: int):
+    """对比逐帧模式与拼图模式的请求数、图片分片数、耗时和标签一致性."""
+    print(f"\n对比逐帧模式与 {grid}×{grid} 拼图模式（{len(frames)} 帧）...")
+
+    runs = {}
+    for label, value in (("逐帧", 0), (f"拼图 {grid}×{grid}", grid)):
+        analysis = config.analysis.model_copy(update={"contact_sheet_grid": value})
+        counter = CountingLLMClient(llm_client)
+        service = AnalysisService(counter, config.model_copy(update={"analysis": analysis}), logger)
+        start = time.perf_counter()
+        result = await service.analyze_video(frames=frames)
+        runs[label] = (counter, time.perf_counter() - start, result)
+
+    print(f"\n{'模式':<12}{'请求数':>8}{'图片数':>8}{'图片KB':>10}{'耗时(s)':>10}")
+    for label, (counter, elapsed, _) in runs.items():
+        print(
+            f"{label:<12}{counter.requests:>8}{counter.images:>8}"
+            f"{counter.image_bytes / 1024:>10.0f}{elapsed:>10.2f}"
+        )
+
+    (base_label, (base_counter, _, base)), (tiled_label, (tiled_counter, _, tiled)) = runs.items()
+    print(f"\n标签一致性（{base_label} vs {tiled_label}）：")
+    scores = []
+    for task_id, labels in base.items():
+        score = label_agreement(labels, tiled.get(task_id, []))
+        scores.append(score)
+        print(f"  {task_id}: {score:.0%}  {labels} / {tiled.get(task_id, [])}")
+    if scores:
+        print(f"  平均: {sum(scores) / len(scores):.0%}")
+    if tiled_counter.requests:
+        print(f"\n请求数减少: {base_counter.requests / tiled_counter.requests:.1f}x")
+
+
+async def main(frames_dir: Path, use_mock: bool = False, compare_grid: int = 0):
     """主函数."""
     logger = AppLogger.setup(Path("logs"), level="DEBUG", console=True)
     config = AppConfig()
@@ -69,6 +132,10 @@ async def main(frames_dir: Path, use_mock: bool = False):
         print(f"错误: 目录中没有 .jpg 文件: {frames_dir}")
         return
 
+    if compare_grid:
+        await compare_contact_sheet(frames, llm_client, config, logger, compare_grid)
+        return
+
     # 进度回调
     def progress_callback(task_id, status, data):
         if status == "batch_done":
@@ -110,6 +177,7 @@ if __name__ == "__main__":
         print("用法: python debug_analysis.py <frames_dir> [--mock]")
         print("示例: python debug_analysis.py frames/video_name")
         print("      python debug_analysis.py frames/video_name --mock")
+        print("      python debug_analysis.py frames/video_name --compare-contact-sheet --grid 3")
         sys.exit(1)
 
     frames_dir = Path(sys.argv[1])
@@ -118,5 +186,10 @@ if __name__ == "__main__":
         sys.exit(1)
 
     use_mock = "--mock" in sys.argv
+    compare_grid = 0
+    if "--compare-contact-sheet" in sys.argv:
+        compare_grid = 3
+        if "--grid" in sys.argv:
+            compare_grid = int(sys.argv[sys.argv.index("--grid") + 1])
 
-    asyncio.run(main(frames_dir, use_mock))
+    asyncio.run(main(frames_dir, use_mock, compare_grid))
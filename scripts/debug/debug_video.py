@@ -1,13 +1,14 @@
 """视频处理模块调试脚本
 
 用法：
-    python scripts/debug/debug_video.py path/to/video.mp4
+    python scripts/debug/debug_video.py path/to/video.mp4 [--compare-modes]
     
 功能：
     - 测试视频抽帧
     - 验证 ffmpeg 可用性
     - 检查帧去重逻辑
     - 输出详细日志
+    - 对比各抽帧模式耗时（--compare-modes）
 """
 
 import asyncio
@@ -17,7 +18,9 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from vrenamer.core.config import VideoConfig
 from vrenamer.core.logging import AppLogger
+from vrenamer.services.extractor import AUTO_MODE, SAMPLING_MODES
 from vrenamer.services.video import VideoProcessor
 
 
@@ -32,7 +35,7 @@ async def main(video_path: Path):
 
     print(f"\n[1/3] 检查视频时长...")
     try:
-        duration = processor.get_duration(video_path)
+        duration = await processor.get_duration(video_path)
         print(f"  ✓ 时长: {duration:.2f} 秒")
     except Exception as e:
         print(f"  ✗ 失败: {e}")
@@ -42,29 +45,58 @@ async def main(video_path: Path):
     try:
         result = await processor.sample_frames(video_path, target_frames=96)
         print(f"  ✓ 抽取帧数: {len(result.frames)}")
-        print(f"  ✓ 保存目录: {result.directory}")
+        print(f"  ✓ 落盘目录: {result.directory or '未落盘（内存帧）'}")
         print(f"  ✓ 抽帧帧率: {result.fps:.4f} fps")
     except Exception as e:
         print(f"  ✗ 失败: {e}")
         return
 
-    print(f"\n[3/3] 验证帧文件...")
+    print("\n[3/3] 验证帧数据...")
     for i, frame in enumerate(result.frames[:5], 1):
-        size_kb = frame.stat().st_size / 1024
+        size_kb = len(frame.data) / 1024
         print(f"  {i}. {frame.name} ({size_kb:.2f} KB)")
 
     if len(result.frames) > 5:
-        print(f"  ... 还有 {len(result.frames) - 5} 个帧文件")
+        print(f"  ... 还有 {len(result.frames) - 5} 帧")
 
     print(f"\n✅ 视频处理模块测试完成")
     print(f"总帧数: {len(result.frames)}")
-    print(f"帧目录: {result.directory}")
+    print(f"帧目录: {result.directory or '未落盘'}")
+
+
+async def compare_modes(video_path: Path):
+    """依次用各抽帧模式抽帧，输出耗时及相对默认模式的加速比."""
+    logger = AppLogger.setup(Path("logs"), level="INFO", console=True)
+    # 对比耗时时关闭帧缓存，否则重复运行会直接命中缓存
+    processor = VideoProcessor(logger, VideoConfig(cache_enabled=False))
+    default_mode = VideoConfig().sampling_mode
+
+    print("=" * 60)
+    print("抽帧模式耗时对比")
+    print("=" * 60)
+
+    timings = {}
+    for mode in (AUTO_MODE, *SAMPLING_MODES):
+        try:
+            result = await processor.sample_frames(video_path, target_frames=96, mode=mode)
+        except Exception as e:
+            print(f"  ✗ {mode}: 失败 {e}")
+            continue
+        timings[mode] = (result.extract_seconds, len(result.frames), result.mode)
+
+    baseline = timings.get(default_mode, (0.0, 0, default_mode))[0]
+    print(f"\n{'模式':<10}{'耗时(s)':>10}{'帧数':>8}{'相对 ' + default_mode:>14}")
+    for mode, (seconds, count, actual) in timings.items():
+        speedup = f"{baseline / seconds:.2f}x" if baseline and seconds else "-"
+        label = mode if actual == mode else f"{mode}->{actual}"
+        print(f"{label:<10}{seconds:>10.2f}{count:>8}{speedup:>14}")
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("用法: python debug_video.py <video_path>")
+        print("用法: python debug_video.py <video_path> [--compare-modes]")
         print("示例: python debug_video.py test.mp4")
+        print("      python debug_video.py test.mp4 --compare-modes")
         sys.exit(1)
 
     video_path = Path(sys.argv[1])
@@ -72,4 +104,7 @@ if __name__ == "__main__":
         print(f"错误: 文件不存在: {video_path}")
         sys.exit(1)
 
-    asyncio.run(main(video_path))
+    if "--compare-modes" in sys.argv:
+        asyncio.run(compare_modes(video_path))
+    else:
+        asyncio.run(main(video_path))
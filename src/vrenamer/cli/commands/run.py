@@ -22,20 +22,28 @@ console = Console()
 
 
 def command(
-    video: Path = typer.Argument(
-        ..., exists=True, dir_okay=False, help="视频文件路径"
-    ),
+    video: Path = typer.Argument(..., exists=True, dir_okay=False, help="视频文件路径"),
     n: int = typer.Option(5, "--candidates", "-n", min=1, max=10, help="候选数量"),
     dry_run: bool = typer.Option(False, "--dry-run", help="预览模式，不实际改名"),
     styles: Optional[str] = typer.Option(None, "--styles", help="命名风格（逗号分隔）"),
-    non_interactive: bool = typer.Option(False, "--non-interactive", help="测试模式：自动选择序号 1，无需交互"),
+    non_interactive: bool = typer.Option(
+        False, "--non-interactive", help="测试模式：自动选择序号 1，无需交互"
+    ),
+    sampling_mode: Optional[str] = typer.Option(
+        None, "--sampling-mode", help="抽帧模式（auto|seek|keyframe|fps|scene），默认使用配置"
+    ),
 ):
     """处理单个视频文件 - 分析并生成命名候选."""
-    asyncio.run(_run_async(video, n, dry_run, styles, non_interactive))
+    asyncio.run(_run_async(video, n, dry_run, styles, non_interactive, sampling_mode))
 
 
 async def _run_async(
-    video: Path, n: int, dry_run: bool, styles: Optional[str], non_interactive: bool
+    video: Path,
+    n: int,
+    dry_run: bool,
+    styles: Optional[str],
+    non_interactive: bool,
+    sampling_mode: Optional[str] = None,
 ):
     """异步执行单视频处理."""
     # 加载配置
@@ -46,55 +54,57 @@ async def _run_async(
 
     # 创建服务
     llm_client = LLMClientFactory.create(config, logger)
-    video_processor = VideoProcessor(logger)
+    video_processor = VideoProcessor(logger, config.video)
     analysis_service = AnalysisService(llm_client, config, logger)
     naming_service = NamingService(llm_client, config, logger)
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        console=console,
-    ) as progress:
-        # 1. 抽帧
-        task1 = progress.add_task("抽帧中...", total=None)
-        frame_result = await video_processor.sample_frames(video)
-        progress.update(task1, completed=1)
-        console.print(f"✓ 抽取了 {len(frame_result.frames)} 帧")
-
-        # 2. 分析
-        task2 = progress.add_task("AI 分析中...", total=None)
-
-        def progress_callback(task_id, status, data):
-            if status == "batch_done":
-                console.print(
-                    f"  [{task_id}] 批次 {data['batch_idx']+1}/{data['total_batches']} 完成"
-                )
-
-        tags = await analysis_service.analyze_video(
-            frames=frame_result.frames, progress_callback=progress_callback
-        )
-        progress.update(task2, completed=1)
-        console.print(f"✓ 分析完成")
-
-        # 显示分析结果
-        console.print("\n[bold cyan]分析结果：[/]")
-        for task_id, labels in tags.items():
-            console.print(f"  {task_id}: {', '.join(labels)}")
-
-        # 3. 生成候选名称
-        task3 = progress.add_task("生成候选名称...", total=None)
-
-        # 解析风格
-        style_ids = None
-        if styles:
-            style_ids = [s.strip() for s in styles.split(",") if s.strip()]
-
-        candidates = await naming_service.generate_candidates(
-            analysis=tags, style_ids=style_ids
-        )
-        progress.update(task3, completed=1)
-        console.print(f"✓ 生成了 {len(candidates)} 个候选")
+    # 客户端持有一个长连接会话，分析和命名的所有请求复用连接，结束后关闭
+    async with llm_client:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            console=console,
+        ) as progress:
+            # 1. 抽帧
+            task1 = progress.add_task("抽帧中...", total=None)
+            frame_result = await video_processor.sample_frames(video, mode=sampling_mode)
+            progress.update(task1, completed=1)
+            console.print(f"✓ 抽取了 {len(frame_result.frames)} 帧")
+
+            # 2. 分析
+            task2 = progress.add_task("AI 分析中...", total=None)
+
+            def progress_callback(task_id, status, data):
+                if status == "batch_done":
+                    console.print(
+                        f"  [{task_id}] 批次 {data['batch_idx']+1}/{data['total_batches']} 完成"
+                    )
+
+            tags = await analysis_service.analyze_video(
+                frames=frame_result.frames, progress_callback=progress_callback
+            )
+            progress.update(task2, completed=1)
+            console.print(f"✓ 分析完成")
+
+            # 显示分析结果
+            console.print("\n[bold cyan]分析结果：[/]")
+            for task_id, labels in tags.items():
+                console.print(f"  {task_id}: {', '.join(labels)}")
+
+            # 3. 生成候选名称
+            task3 = progress.add_task("生成候选名称...", total=None)
+
+            # 解析风格
+            style_ids = None
+            if styles:
+                style_ids = [s.strip() for s in styles.split(",") if s.strip()]
+
+            candidates = await naming_service.generate_candidates(
+                analysis=tags, style_ids=style_ids
+            )
+            progress.update(task3, completed=1)
+            console.print(f"✓ 生成了 {len(candidates)} 个候选")
 
     # 显示候选名称
     table = Table(title="\n候选文件名")
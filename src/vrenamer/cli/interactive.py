@@ -15,10 +15,11 @@ from rich.prompt import Prompt
 from rich.table import Table
 
 from vrenamer.scanner import VideoScanner
+from vrenamer.services.dedup import shutdown_hash_pool
 from vrenamer.webui.settings import Settings
 from vrenamer.webui.services import pipeline
-from vrenamer.naming import NamingGenerator, NamingStyleConfig
-from vrenamer.llm.client import GeminiClient
+from vrenamer.webui.services.context import PipelineContext
+from vrenamer.webui.services.prompting import compose_task_prompts
 
 
 console = Console()
@@ -39,9 +40,22 @@ class InteractiveCLI:
         self.scanner = VideoScanner(scan_dir)
         self.processed_count = 0
         self.skipped_count = 0
+        # 整个会话共用一个事件循环和上下文，客户端连接池、风格配置和提示词模板跨视频复用
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.context: Optional[PipelineContext] = None
 
     def run(self):
         """运行交互式流程."""
+        self._loop = asyncio.new_event_loop()
+        self.context = PipelineContext(self.settings)
+        try:
+            self._run()
+        finally:
+            self._loop.run_until_complete(self.context.close())
+            self._loop.close()
+            shutdown_hash_pool()
+
+    def _run(self):
         console.print(
             Panel.fit(
                 f"[bold cyan]🎬 视频智能重命名助手[/]\n\n扫描目录：{self.scan_dir}",
@@ -74,7 +88,7 @@ class InteractiveCLI:
             elif action == "manual":
                 self._manual_rename(video_path)
             elif action == "ai":
-                asyncio.run(self._ai_rename(video_path))
+                self._loop.run_until_complete(self._ai_rename(video_path))
             elif action == "quit":
                 console.print("\n[cyan]👋 退出程序[/]")
                 break
@@ -155,9 +169,10 @@ class InteractiveCLI:
         try:
             # 抽帧
             console.print("\n[bold yellow]━━━ 步骤 1/4: 视频抽帧 ━━━[/]")
-            frame_result = await pipeline.sample_frames(video_path)
+            frame_result = await pipeline.sample_frames(video_path, self.settings)
             console.print(f"  ✓ 抽取帧数: [green]{len(frame_result.frames)}[/] 帧")
-            console.print(f"  ✓ 保存位置: [dim]{frame_result.directory}[/]")
+            if frame_result.directory:
+                console.print(f"  ✓ 调试落盘: [dim]{frame_result.directory}[/]")
 
             # 显示部分帧文件名
             if frame_result.frames:
@@ -175,15 +190,18 @@ class InteractiveCLI:
             # AI 分析标签
             console.print("\n[bold yellow]━━━ 步骤 3/4: AI 多模态分析 ━━━[/]")
             console.print(f"  → 使用模型: [cyan]{self.settings.model_flash}[/]")
-            console.print(f"  → 并发数: [cyan]{self.settings.max_concurrency}[/]")
+            console.print(
+                f"  → 并发数: [cyan]{self.context.limiter.limit}[/] "
+                f"(自适应上限 {self.settings.max_concurrency})"
+            )
 
             # 生成任务提示词
-            from vrenamer.webui.services.prompting import compose_task_prompts
             task_prompts = compose_task_prompts(
                 frame_result.directory,
                 transcript,
                 "",  # user_prompt
                 frames=frame_result.frames,
+                templates=self.context.templates,
             )
             console.print(f"  → 分析任务数: [cyan]{len(task_prompts)}[/]")
 
@@ -204,7 +222,9 @@ class InteractiveCLI:
 
             # 调用真实 API
             console.print("\n  [cyan]正在调用 Gemini Flash API（并发处理）...[/]")
-            tags, batches = await pipeline.analyze_tasks(frame_result, task_prompts, self.settings, progress_callback)
+            tags, batches = await pipeline.analyze_tasks(
+                frame_result, task_prompts, self.settings, progress_callback, context=self.context
+            )
 
             # 显示最终汇总
             console.print("\n  [green]✓ 所有任务完成，最终结果：[/]")
@@ -260,43 +280,15 @@ class InteractiveCLI:
             console.print(f"[dim]{traceback.format_exc()}[/]")
 
     async def _generate_candidates(self, tags: dict) -> list:
-        """生成命名候选."""
-        # 加载风格配置
-        config_path = self.settings.get_style_config_path()
-        style_config = NamingStyleConfig.from_yaml(config_path)
-
-        # 创建生成器
-        client = GeminiClient(
-            base_url=self.settings.gemini_base_url,
-            api_key=self.settings.gemini_api_key,
-            transport=self.settings.llm_transport,
-            timeout=self.settings.request_timeout,
-        )
-
-        generator = NamingGenerator(
-            llm_client=client,
-            style_config=style_config,
-            model=self.settings.model_pro,
-        )
-
-        # 生成
-        style_ids = self.settings.get_style_ids()
-        candidates_obj = await generator.generate_candidates(
-            analysis=tags,
-            style_ids=style_ids,
+        """生成命名候选（生成器和风格配置由会话上下文持有）."""
+        return await pipeline.generate_names_with_styles(
+            tags,
+            self.settings,
+            style_ids=self.settings.get_style_ids(),
             n_per_style=1,
+            context=self.context,
         )
 
-        return [
-            {
-                "style_id": c.style_id,
-                "style_name": c.style_name,
-                "filename": c.filename,
-                "language": c.language,
-            }
-            for c in candidates_obj
-        ]
-
     def _display_candidates(self, candidates: list):
         """显示候选名称."""
         table = Table(title="🎯 AI 生成的候选名称", show_header=True)
@@ -28,14 +28,21 @@ def _short_hash(p: Path) -> str:
 
 @app.command("run", hidden=True)  # 隐藏，但保留兼容性
 def run_cli(
-    video: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True, help="视频文件路径"),
+    video: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, readable=True, help="视频文件路径"
+    ),
     n: int = typer.Option(5, "--n", min=1, max=10, help="候选数量"),
     dry_run: bool = typer.Option(False, help="是否跳过真实 LLM 调用（默认关闭）"),
     rename: bool = typer.Option(False, help="选择后立即改名"),
     custom_prompt: str = typer.Option("", help="可选的自定义提示词"),
     use_styles: bool = typer.Option(False, "--use-styles", help="使用命名风格系统"),
     styles: str = typer.Option("", "--styles", help="指定风格（逗号分隔），为空则用配置默认值"),
-    non_interactive: bool = typer.Option(False, "--non-interactive", help="测试模式：自动选择序号 1，无需交互"),
+    non_interactive: bool = typer.Option(
+        False, "--non-interactive", help="测试模式：自动选择序号 1，无需交互"
+    ),
+    sampling_mode: Optional[str] = typer.Option(
+        None, "--sampling-mode", help="抽帧模式（auto|seek|keyframe|fps|scene），默认使用配置"
+    ),
 ):
     """分析单个视频 -> 生成候选名 -> 用户选择 -> 可选改名。"""
     settings = Settings()
@@ -48,7 +55,7 @@ def run_cli(
         console=console,
     ) as progress:
         t1 = progress.add_task("抽帧", total=None)
-        frame_result = asyncio.run(pipeline.sample_frames(video))
+        frame_result = asyncio.run(pipeline.sample_frames(video, settings, mode=sampling_mode))
         progress.update(t1, completed=1)
         progress.stop_task(t1)
 
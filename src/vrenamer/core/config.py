@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -16,11 +16,24 @@ class LLMBackendConfig(BaseSettings):
     base_url: str
     api_key: str
     timeout: int = 30
-    retry: int = 3
+    retry: int = 3  # 单个请求的最大重试次数（429 / 5xx / 连接断开；超时最多 1 次）
+    retry_base_delay: float = 0.5  # 退避下限（秒），按去相关抖动递增
+    retry_max_delay: float = 20.0  # 单次退避上限（秒）；Retry-After 优先
+    retry_budget_ratio: float = 0.2  # 重试预算：每个请求补充的重试令牌
+    retry_budget_reserve: int = 20  # 重试预算：令牌初始值与上限（允许的瞬时重试数）
     # Gemini 特有配置
     transport: str = "openai_compat"  # gemini_native | openai_compat
     # OpenAI 特有配置
     organization: str = ""
+    # HTTP 连接池（客户端持有一个长连接会话，所有请求复用连接）
+    pool_limit: int = 100  # 总连接数上限，0 表示不限
+    pool_limit_per_host: int = 64  # 单主机连接数上限，0 表示不限
+    keepalive_timeout: float = 30.0  # 空闲连接保持时间（秒）
+    dns_cache_ttl: int = 300  # DNS 缓存时间（秒）
+    # 请求追踪（JSONL）：off | spans（每次请求的耗时分解）| debug（另记脱敏后的请求 / 响应）
+    llm_trace: Literal["off", "spans", "debug"] = "off"
+    llm_trace_file: str = "logs/llm_trace.jsonl"
+    llm_stream: bool = False  # 分析请求走 SSE 流式，收到完整 JSON 对象即返回
 
 
 class ModelConfig(BaseSettings):
@@ -35,8 +48,12 @@ class ConcurrencyConfig(BaseSettings):
 
     # 第一层：子任务并发数
     task_concurrency: int = 4  # 同时执行的子任务数
-    # 第二层：每个子任务内的批次并发数
-    batch_concurrency: int = 16  # 每个子任务内同时执行的批次数
+    # 第二层：所有子任务共享的批次（请求）并发数
+    batch_concurrency: int = 16  # 同时执行的批次数（自适应并发时为初始值）
+    # 自适应并发（AIMD）：健康时逐步加并发，429 / 5xx / 延迟突增时减半
+    adaptive: bool = True
+    batch_concurrency_min: int = 2  # 自适应并发的下界
+    batch_concurrency_max: int = 64  # 自适应并发的上界
 
 
 class AnalysisConfig(BaseSettings):
@@ -47,6 +64,19 @@ class AnalysisConfig(BaseSettings):
     # 批次大小配置（基于 Free Tier 实测：50 张可用，建议默认 20）
     batch_size: int = 20  # 每批次的帧数（默认值，保守策略）
     batch_size_max: int = 50  # 最大批次大小（Free Tier 实测上限）
+    # 拼图模式：每 N×N 帧拼成一张带编号的宫格图，0 表示关闭（逐帧发送）
+    contact_sheet_grid: int = 0
+    contact_sheet_tile: int = 320  # 拼图单格长边像素
+    # 分批随机种子：同一种子 + 同一组帧得到相同批次；None 表示由帧内容生成
+    batch_seed: Optional[int] = None
+
+    @field_validator("contact_sheet_grid")
+    @classmethod
+    def validate_contact_sheet_grid(cls, v: int) -> int:
+        """验证宫格边长：0（关闭）或 2-4."""
+        if v != 0 and not 2 <= v <= 4:
+            raise ValueError(f"contact_sheet_grid ({v}) must be 0 or between 2 and 4")
+        return v
 
     @field_validator("batch_size")
     @classmethod
@@ -61,6 +91,41 @@ class AnalysisConfig(BaseSettings):
         return v
 
 
+class VideoConfig(BaseSettings):
+    """视频抽帧配置."""
+
+    # 抽帧模式：auto（按编码和关键帧间隔自动选择，默认）| seek（按时间点定位抽帧）
+    # | keyframe（仅解码关键帧）| fps（全量解码，回退模式）| scene（场景切换处取帧）
+    sampling_mode: Literal["auto", "seek", "keyframe", "fps", "scene"] = "auto"
+    # scene 模式的场景分数阈值（0-1，越小取帧越多）
+    scene_threshold: float = 0.3
+    # seek 模式下同时运行的 ffmpeg 进程数
+    seek_concurrency: int = 8
+    # keyframe / fps 模式分段并行解码：超过该时长（秒）的视频切分为多段并发解码
+    segment_threshold: float = 600.0
+    # 分段数，0 表示按 CPU 核数自动决定
+    segment_count: int = 0
+    # 单个 ffmpeg 进程的超时时间（秒），超时或取消时子进程会被杀掉
+    ffmpeg_timeout: float = 600.0
+    # ffprobe 超时时间（秒）
+    probe_timeout: float = 30.0
+    # 最终帧选择：diverse（时间覆盖 + 多样性）| uniform（均匀抽样）
+    frame_selection: Literal["diverse", "uniform"] = "diverse"
+    # diverse 模式：剩余帧与已选帧的最小差异（0-1）低于该值时不再加帧，0 表示总是取满
+    selection_min_distance: float = 0.08
+    # ffmpeg 同时输出 32×32 灰度缩略图，去重时直接计算 pHash（不解码 JPEG，仅 POSIX）
+    gray_thumbnails: bool = True
+    # 去重哈希计算的工作进程数，0 表示按 CPU 核数自动决定，1 表示在线程中计算
+    dedup_workers: int = 0
+    # 调试落盘：帧默认只在内存中流转，开启后写入 <视频目录>/frames/<文件名>/
+    persist_frames: bool = False
+    # 帧缓存：以视频指纹 + 抽帧参数为键，重复分析同一视频时跳过 ffmpeg
+    cache_enabled: bool = True
+    cache_dir: Path = Path(".cache/frames")
+    # 帧缓存容量上限（MB），超出后按最近访问时间淘汰
+    cache_max_mb: int = 2048
+
+
 class TranscriptConfig(BaseSettings):
     """字幕/音频转写配置."""
 
@@ -102,6 +167,9 @@ class AppConfig(BaseSettings):
     # 分析配置
     analysis: AnalysisConfig = AnalysisConfig()
 
+    # 视频抽帧配置
+    video: VideoConfig = VideoConfig()
+
     # 字幕/音频转写配置
     transcript: TranscriptConfig = TranscriptConfig()
 
@@ -18,17 +18,25 @@ class ConfigError(VRenamerError):
 class APIError(VRenamerError):
     """API 调用错误 - LLM API 调用失败、超时、响应格式错误等."""
 
-    def __init__(self, message: str, status_code: int = None, response: str = None):
+    def __init__(
+        self,
+        message: str,
+        status_code: int = None,
+        response: str = None,
+        retry_after: float = None,
+    ):
         """初始化 API 错误.
 
         Args:
             message: 错误消息
             status_code: HTTP 状态码（可选）
             response: 原始响应内容（可选）
+            retry_after: 服务端要求的重试等待秒数（Retry-After 头，可选）
         """
         super().__init__(message)
         self.status_code = status_code
         self.response = response
+        self.retry_after = retry_after
 
 
 class VideoProcessingError(VRenamerError):
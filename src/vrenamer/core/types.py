@@ -5,27 +5,77 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 
 @dataclass
 class VideoInfo:
-    """视频信息."""
+    """视频信息（由一次 ffprobe JSON 探测填充）."""
 
     path: Path
     duration: float  # 秒
     size_bytes: int
     format: str  # 文件格式（如 mp4, mkv）
+    codec: Optional[str] = None  # 视频流编码（如 h264, hevc）
+    width: int = 0  # 编码宽度（未旋转）
+    height: int = 0  # 编码高度（未旋转）
+    fps: float = 0.0  # 平均帧率
+    rotation: int = 0  # 显示旋转角度（0/90/180/270）
+    keyframe_interval: Optional[float] = None  # 关键帧平均间隔（秒），未知时为 None
+
+    @property
+    def display_size(self) -> Tuple[int, int]:
+        """显示尺寸（宽, 高），已考虑旋转."""
+        if self.rotation % 180 == 90:
+            return self.height, self.width
+        return self.width, self.height
+
+
+@dataclass(eq=False)
+class Frame:
+    """内存中的视频帧（编码后的图片字节）.
+
+    ffmpeg 通过管道输出帧，去重、限帧和请求构建都直接使用 ``data``，
+    只有开启调试落盘时才会写入磁盘并设置 ``path``。
+    提供 ``name`` / ``read_bytes()``，与 Path 的用法保持一致。
+    """
+
+    index: int  # 抽帧序号（从 1 开始，按时间顺序）
+    data: bytes  # JPEG 字节
+    timestamp: Optional[float] = None  # 帧在视频中的时间点（秒），未知时为 None
+    path: Optional[Path] = None  # 调试落盘后的文件路径
+    mime_type: str = "image/jpeg"
+    gray: Optional[bytes] = None  # 32×32 灰度缩略图（ffmpeg 同时输出，供 pHash 使用；不缓存不落盘）
+    # 请求用 base64 载荷（ASCII 字节，编码一次，所有子任务的请求体按引用拼接；不缓存不落盘）
+    payload: Optional[bytes] = None
+
+    @property
+    def name(self) -> str:
+        """帧文件名（与落盘文件名一致）."""
+        if self.path:
+            return self.path.name
+        ext = "webp" if self.mime_type == "image/webp" else "jpg"
+        return f"frame_{self.index:05d}.{ext}"
+
+    def read_bytes(self) -> bytes:
+        """返回帧字节（兼容 Path.read_bytes）."""
+        return self.data
+
+
+# LLM 层接受的图片输入：内存帧或磁盘上的图片文件
+FrameLike = Union[Frame, Path]
 
 
 @dataclass
 class FrameSampleResult:
     """视频抽帧结果."""
 
-    directory: Path  # 帧保存目录
-    frames: List[Path]  # 帧文件路径列表
+    directory: Optional[Path]  # 帧落盘目录（未开启调试落盘时为 None）
+    frames: List[Frame]  # 内存帧列表
     duration: float  # 视频时长
     fps: float  # 抽帧帧率
+    mode: str = "fps"  # 实际使用的抽帧模式（seek | keyframe | scene | fps；auto 解析为其中之一）
+    extract_seconds: float = 0.0  # ffmpeg 抽帧耗时（不含去重）
 
 
 @dataclass
@@ -2,10 +2,33 @@
 
 from __future__ import annotations
 
+import base64
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import List, Optional
 
+from vrenamer.core.types import Frame
+
+
+def image_payload(image) -> bytes:
+    """返回图片的 base64 载荷（ASCII 字节）.
+
+    帧的载荷只编码一次并缓存在 ``Frame.payload`` 上（批次规划器已编码过时直接
+    复用），之后每个请求按引用拼入请求体；图片路径每次读取编码。
+    """
+    payload = getattr(image, "payload", None)
+    if payload is not None:
+        return payload
+    payload = base64.b64encode(image.read_bytes())
+    if isinstance(image, Frame):
+        image.payload = payload
+    return payload
+
+
+def image_mime_type(image) -> str:
+    """返回图片的 MIME 类型（图片路径按 JPEG 处理）."""
+    return getattr(image, "mime_type", "image/jpeg")
+
 
 class BaseLLMClient(ABC):
     """LLM 客户端抽象基类.
@@ -62,3 +85,12 @@ class BaseLLMClient(ABC):
             APIError: API 调用失败
         """
         pass
+
+    async def close(self) -> None:
+        """释放客户端持有的连接（默认无操作）."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
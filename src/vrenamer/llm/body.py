@@ -0,0 +1,134 @@
+"""请求体构建 - 预编码的 base64 帧载荷 + 分块拼接的 JSON 请求体.
+
+此前请求体是普通 dict，图片以 base64 字符串嵌入，再交给 aiohttp 的
+``json=`` 序列化：每次请求都要把几 MB 的 base64 扫描转义一遍，生成完整的
+JSON 字符串，再编码成同样大小的 bytes，50 帧的请求体在内存里同时存在
+好几份。
+
+``JsonBody`` 只序列化请求体的骨架（模型、提示词、参数等小字段），图片
+位置放 ``EncodedImage``，其 base64 ASCII 字节（``Frame.payload``，每帧编码
+一次）作为独立的块原样拼接：
+
+- base64 字符不需要 JSON 转义，直接写入；
+- 不生成完整请求体的副本，``BodyPayload`` 逐块写入连接（Content-Length
+  预先算好）；
+- 同一个 ``JsonBody`` 在重试和换 Key 时重复使用，不再重新序列化。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterator, List
+
+from aiohttp import payload as aiohttp_payload
+
+from vrenamer.core.types import FrameLike
+from vrenamer.llm.base import image_mime_type, image_payload
+
+
+class EncodedImage:
+    """请求体中的一张图片（base64 ASCII 字节，不拷贝）."""
+
+    __slots__ = ("data", "mime_type", "data_url")
+
+    def __init__(self, data: bytes, mime_type: str = "image/jpeg", data_url: bool = False):
+        """初始化.
+
+        Args:
+            data: base64 载荷（ASCII 字节）
+            mime_type: 图片 MIME 类型
+            data_url: True 时序列化为 ``data:<mime>;base64,...``（OpenAI 兼容格式），
+                否则为纯 base64 字符串（Gemini 原生 inline_data）
+        """
+        self.data = data
+        self.mime_type = mime_type
+        self.data_url = data_url
+
+    @classmethod
+    def of(cls, image: FrameLike, data_url: bool = False) -> "EncodedImage":
+        """由帧（或图片路径）创建；帧的 base64 载荷只编码一次并缓存在帧上."""
+        return cls(image_payload(image), image_mime_type(image), data_url)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def prefix(self) -> bytes:
+        """载荷前的 JSON 片段（左引号和 data URL 头）."""
+        if self.data_url:
+            return f'"data:{self.mime_type};base64,'.encode("ascii")
+        return b'"'
+
+
+class JsonBody:
+    """分块的 JSON 请求体：骨架序列化一次，图片载荷按引用拼接."""
+
+    def __init__(self, obj: Any):
+        """序列化请求体.
+
+        Args:
+            obj: 请求体（dict / list / 标量，图片位置为 EncodedImage）
+        """
+        self.obj = obj
+        self.chunks: List[bytes] = []
+        self._pending: List[str] = []
+        self._encode(obj)
+        self._flush()
+        del self._pending
+        self.size = sum(len(chunk) for chunk in self.chunks)
+
+    def _flush(self) -> None:
+        if self._pending:
+            self.chunks.append("".join(self._pending).encode("utf-8"))
+            self._pending.clear()
+
+    def _encode(self, obj: Any) -> None:
+        if isinstance(obj, EncodedImage):
+            self._flush()
+            self.chunks.append(obj.prefix())
+            self.chunks.append(obj.data)
+            self.chunks.append(b'"')
+        elif isinstance(obj, dict):
+            self._pending.append("{")
+            for i, (key, value) in enumerate(obj.items()):
+                if i:
+                    self._pending.append(",")
+                self._pending.append(json.dumps(str(key), ensure_ascii=False))
+                self._pending.append(":")
+                self._encode(value)
+            self._pending.append("}")
+        elif isinstance(obj, (list, tuple)):
+            self._pending.append("[")
+            for i, value in enumerate(obj):
+                if i:
+                    self._pending.append(",")
+                self._encode(value)
+            self._pending.append("]")
+        else:
+            self._pending.append(json.dumps(obj, ensure_ascii=False))
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.chunks)
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def payload(self) -> "BodyPayload":
+        """aiohttp 请求体（每次发送新建，块本身复用）."""
+        return BodyPayload(self)
+
+
+class BodyPayload(aiohttp_payload.Payload):
+    """逐块写入 ``JsonBody`` 的 aiohttp 载荷（Content-Length 已知，不合并块）."""
+
+    _autoclose = True
+
+    def __init__(self, body: JsonBody):
+        super().__init__(body, content_type="application/json")
+        self._size = body.size
+
+    async def write(self, writer: Any) -> None:
+        for chunk in self._value.chunks:
+            await writer.write(chunk)
+
+    def decode(self, encoding: str = "utf-8", errors: str = "strict") -> str:
+        return bytes(self._value).decode(encoding, errors)
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-import base64
 import json
+import logging
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import aiohttp
 
+from vrenamer.core.types import Frame, FrameLike
+from vrenamer.llm.body import EncodedImage, JsonBody
+from vrenamer.llm.key_pool import KeyPool, estimate_tokens
+from vrenamer.llm.retry import RetryPolicy
+from vrenamer.llm.streaming import read_json_stream
+from vrenamer.llm.tracing import PREVIEW_CHARS, Tracer, redact, redact_headers
+from vrenamer.llm.transport import HttpTransport
+
 
 class GeminiClient:
     """Thin client over GPT-Load proxy for Gemini.
@@ -15,17 +23,90 @@ class GeminiClient:
     Supports two transports:
     - openai_compat:   {base}/v1beta/openai/chat/completions (messages)
     - gemini_native:   {base}/v1beta/models/{model}:generateContent (parts)
+
+    With a ``key_pool`` each request is routed to the least-loaded healthy key
+    (per-key RPM/TPM buckets, 429 cooldown); ``base_url`` / ``api_key`` are then
+    only used to build request paths and logs.
+
+    With ``stream=True`` ``classify_json`` uses SSE (``stream: true`` /
+    ``streamGenerateContent?alt=sse``) and returns as soon as the first complete
+    top-level JSON object has arrived, dropping the rest of the stream.
+
+    Request/response debugging goes through ``tracer`` (off by default): per
+    request spans at ``spans`` level, redacted bodies and previews at ``debug``.
+    Unparseable or empty responses are reported through ``logger``; the full
+    (redacted) response is only written as a tracer event at ``debug`` level.
     """
 
-    def __init__(self, base_url: str, api_key: str, transport: str = "openai_compat", timeout: int = 30):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        transport: str = "openai_compat",
+        timeout: int = 30,
+        http: Optional[HttpTransport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        key_pool: Optional[KeyPool] = None,
+        stream: bool = False,
+        tracer: Optional[Tracer] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.transport = transport
         self.timeout = timeout
-
-    def _headers(self) -> Dict[str, str]:
+        # 长连接会话：所有请求复用连接池；禁用自动解压缩（GPT-Load 的 gzip 头有问题）
+        self.http = http or HttpTransport(auto_decompress=False, tracer=tracer)
+        # 请求追踪（默认关闭）：spans 级别记录每次请求的耗时分解，debug 级别另记脱敏后的请求 / 响应
+        self.tracer = tracer or self.http.tracer
+        # 429 / 5xx / 超时按退避重试，所有请求共享一个重试预算
+        self.retry_policy = retry_policy or RetryPolicy()
+        # 多 Key 池：每次请求（包括重试）重新分配 Key，429 的 Key 冷却后再用
+        self.key_pool = key_pool
+        # 流式解析：classify_json 收到完整 JSON 对象即返回（可按调用覆盖）
+        self.stream = stream
+        self.logger = logger or logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(
+        cls, config: Any, logger: Optional[logging.Logger] = None, **kwargs: Any
+    ) -> "GeminiClient":
+        """Build a client from an ``LLMBackendConfig`` (CLI / AnalysisService path).
+
+        Connection pool, retry and tracing settings come from the config; any
+        keyword argument (``http``, ``retry_policy``, ``tracer``, ``key_pool``,
+        ``stream``) overrides the corresponding default.
+        """
+        tracer = kwargs.pop("tracer", None) or Tracer.from_config(config, logger=logger)
+        http = kwargs.pop("http", None) or HttpTransport.from_config(
+            config, logger=logger, tracer=tracer, auto_decompress=False
+        )
+        kwargs.setdefault("retry_policy", RetryPolicy.from_config(config, logger=logger))
+        kwargs.setdefault("stream", getattr(config, "llm_stream", False))
+        return cls(
+            base_url=config.base_url,
+            api_key=config.api_key,
+            transport=config.transport,
+            timeout=config.timeout,
+            http=http,
+            tracer=tracer,
+            logger=logger,
+            **kwargs,
+        )
+
+    async def close(self) -> None:
+        await self.http.close()
+        self.tracer.close()
+
+    async def __aenter__(self) -> "GeminiClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _headers(self, api_key: Optional[str] = None) -> Dict[str, str]:
         return {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {api_key or self.api_key}",
             "Content-Type": "application/json",
             "Accept-Encoding": "identity",  # 明确禁用压缩
         }
@@ -35,11 +116,13 @@ class GeminiClient:
         model: str,
         system_prompt: str,
         user_text: str,
-        images: List[Path],
+        images: List[FrameLike],
         response_json: bool = True,
         temperature: float = 0.2,
         extra: Optional[Dict[str, Any]] = None,
+        stream: Optional[bool] = None,
     ) -> str:
+        stream = self.stream if stream is None else stream
         if self.transport == "openai_compat":
             url = f"{self.base_url}/v1beta/openai/chat/completions"
             msgs = self._make_messages(user_text, images, system_prompt)
@@ -59,95 +142,47 @@ class GeminiClient:
                 "contents": [{"role": "user", "parts": parts}],
                 "generation_config": {"temperature": temperature, **({} if not extra else extra)},
             }
-        # 使用 aiohttp，禁用自动解压缩（GPT-Load 的 gzip 头有问题）
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
-        # 打印请求详情（URL、Headers、Body）
-        try:
-            _hdr = dict(self._headers())
-            if "Authorization" in _hdr:
-                _hdr["Authorization"] = "Bearer ***REDACTED***"
-            def _sanitize_body(b):
-                try:
-                    b_copy = json.loads(json.dumps(b))  # deep copy
-                except Exception:
-                    return b
-                # OpenAI 兼容：messages[].content[*].image_url.url
-                if isinstance(b_copy, dict) and "messages" in b_copy:
-                    for m in b_copy.get("messages", []):
-                        c = m.get("content")
-                        if isinstance(c, list):
-                            for item in c:
-                                if isinstance(item, dict) and item.get("type") == "image_url":
-                                    urlv = ((item.get("image_url") or {}).get("url") or "")
-                                    if isinstance(urlv, str) and urlv.startswith("data:image"):
-                                        item["image_url"]["url"] = f"data:image/jpeg;base64,<BASE64_LENGTH:{len(urlv.split(',')[-1])}>"
-                # Gemini 原生：contents[].parts[*].inline_data.data
-                if isinstance(b_copy, dict) and "contents" in b_copy:
-                    for c in b_copy.get("contents", []):
-                        parts = c.get("parts") or []
-                        for p in parts:
-                            if isinstance(p, dict) and "inline_data" in p:
-                                data = (p["inline_data"] or {}).get("data")
-                                if isinstance(data, str):
-                                    p["inline_data"]["data"] = f"<BASE64_LENGTH:{len(data)}>"
-                return b_copy
-            print(f"[DEBUG] classify_json - Request URL: {url}")
-            print(f"[DEBUG] classify_json - Request Headers: {_hdr}")
-            print(f"[DEBUG] classify_json - Request Body: {json.dumps(_sanitize_body(body))[:2000]}")
-        except Exception as _e:
-            print(f"[WARN] classify_json - Failed to log request: {_e}")
-        async with aiohttp.ClientSession(timeout=timeout, auto_decompress=False) as session:
-            async with session.post(url, headers=self._headers(), json=body) as resp:
-                # [DEBUG] HTTP 响应状态
-                print(f"[DEBUG] classify_json - HTTP Status: {resp.status}")
-                print(f"[DEBUG] classify_json - Response Headers: {dict(resp.headers)}")
-
-                resp.raise_for_status()
-
-                # 读取原始字节，手动解码
-                raw_bytes = await resp.read()
-                print(f"[DEBUG] classify_json - Raw Bytes Length: {len(raw_bytes)}")
-
-                try:
-                    data = json.loads(raw_bytes.decode("utf-8"))
-                    print(f"[DEBUG] classify_json - JSON Keys: {list(data.keys())}")
-                except json.JSONDecodeError as e:
-                    print(f"[ERROR] classify_json - JSON 解析失败: {e}")
-                    print(f"[ERROR] classify_json - Raw Content (first 500): {raw_bytes[:500]}")
-                    raise
-
+        max_output = (extra or {}).get("max_tokens") or (extra or {}).get("max_output_tokens") or 0
+        tokens = estimate_tokens(system_prompt + user_text, len(images), max_output)
+        if stream:
             if self.transport == "openai_compat":
-                # OpenAI-compatible: choices[0].message.content
-                choices = data.get("choices", [])
-                print(f"[DEBUG] classify_json - Choices count: {len(choices)}")
-
-                if not choices:
-                    print(f"[ERROR] classify_json - 空 choices 数组！完整响应: {json.dumps(data, indent=2, ensure_ascii=False)[:1000]}")
-                    return ""
-
-                message = choices[0].get("message", {})
-                print(f"[DEBUG] classify_json - Message keys: {list(message.keys())}")
-
-                content = message.get("content") or ""
-                print(f"[DEBUG] classify_json - Content length: {len(content)}")
-                print(f"[DEBUG] classify_json - Content preview: {content[:200]}")
-
-                return content
+                body["stream"] = True
             else:
-                # Gemini native: candidates[0].content.parts[].text
-                cands = data.get("candidates", [])
-                print(f"[DEBUG] classify_json - Candidates count: {len(cands)}")
-
-                if not cands:
-                    print(f"[ERROR] classify_json - 空 candidates 数组！完整响应: {json.dumps(data, indent=2, ensure_ascii=False)[:1000]}")
-                    return ""
-
-                parts = cands[0].get("content", {}).get("parts", [])
-                texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
-                result = "\n".join([t for t in texts if t])
-                print(f"[DEBUG] classify_json - Result length: {len(result)}")
-
-                return result
+                url = url.replace(":generateContent", ":streamGenerateContent?alt=sse")
+        # 使用 aiohttp，禁用自动解压缩（GPT-Load 的 gzip 头有问题）
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        if self.tracer.debug:
+            self._trace_request("classify_json", url, body)
+        # 请求体只序列化一次，重试和换 Key 时复用
+        payload = JsonBody(body)
+        if stream:
+            result = await self.retry_policy.call(
+                lambda: self._post(
+                    url,
+                    payload,
+                    timeout,
+                    "classify_json",
+                    tokens,
+                    read=lambda resp: read_json_stream(resp, self.transport),
+                ),
+                label="classify_json",
+            )
+            if self.tracer.debug:
+                self.tracer.event(
+                    "classify_json",
+                    "stream",
+                    events=result.events,
+                    early_exit=result.early,
+                    length=len(result.text),
+                    preview=result.text[:PREVIEW_CHARS],
+                )
+            return result.text
+
+        raw_bytes = await self.retry_policy.call(
+            lambda: self._post(url, payload, timeout, "classify_json", tokens),
+            label="classify_json",
+        )
+        return self._extract_text("classify_json", raw_bytes)
 
     async def name_candidates(
         self,
@@ -176,95 +211,139 @@ class GeminiClient:
                 "contents": [{"role": "user", "parts": [{"text": user_text}]}],
                 "generation_config": {"temperature": temperature},
             }
+        tokens = estimate_tokens(system_prompt + user_text)
         # 使用 aiohttp，禁用自动解压缩（GPT-Load 的 gzip 头有问题）
         timeout = aiohttp.ClientTimeout(total=self.timeout)
-        # 打印请求详情（URL、Headers、Body）
+        if self.tracer.debug:
+            self._trace_request("name_candidates", url, body)
+        payload = JsonBody(body)
+        raw_bytes = await self.retry_policy.call(
+            lambda: self._post(url, payload, timeout, "name_candidates", tokens),
+            label="name_candidates",
+        )
+        return self._extract_text("name_candidates", raw_bytes)
+
+    def _trace_request(self, op: str, url: str, body: Dict[str, Any]) -> None:
+        # 调试级别才调用：请求头和请求体在这里才脱敏，不拷贝图片数据
+        self.tracer.event(
+            op, "request", url=url, headers=redact_headers(self._headers()), body=redact(body)
+        )
+
+    def _extract_text(self, op: str, raw_bytes: bytes) -> str:
+        # 解析响应 JSON 并取出模型输出文本；choices / candidates 为空时返回空字符串
         try:
-            _hdr = dict(self._headers())
-            if "Authorization" in _hdr:
-                _hdr["Authorization"] = "Bearer ***REDACTED***"
-            def _sanitize_body_nc(b):
-                try:
-                    b_copy = json.loads(json.dumps(b))
-                except Exception:
-                    return b
-                if isinstance(b_copy, dict) and "messages" in b_copy:
-                    # OpenAI 兼容
-                    pass  # name 生成的 body 不含图片，仅文本
-                if isinstance(b_copy, dict) and "contents" in b_copy:
-                    # Gemini 原生
-                    for c in b_copy.get("contents", []):
-                        parts = c.get("parts") or []
-                        for p in parts:
-                            if isinstance(p, dict) and "inline_data" in p:
-                                data = (p["inline_data"] or {}).get("data")
-                                if isinstance(data, str):
-                                    p["inline_data"]["data"] = f"<BASE64_LENGTH:{len(data)}>"
-                return b_copy
-            print(f"[DEBUG] name_candidates - Request URL: {url}")
-            print(f"[DEBUG] name_candidates - Request Headers: {_hdr}")
-            print(f"[DEBUG] name_candidates - Request Body: {json.dumps(_sanitize_body_nc(body))[:2000]}")
-        except Exception as _e:
-            print(f"[WARN] name_candidates - Failed to log request: {_e}")
-        async with aiohttp.ClientSession(timeout=timeout, auto_decompress=False) as session:
-            async with session.post(url, headers=self._headers(), json=body) as resp:
-                # [DEBUG] HTTP 响应状态
-                print(f"[DEBUG] name_candidates - HTTP Status: {resp.status}")
-                print(f"[DEBUG] name_candidates - Response Headers: {dict(resp.headers)}")
-
-                resp.raise_for_status()
-
-                # 读取原始字节，手动解码
-                raw_bytes = await resp.read()
-                print(f"[DEBUG] name_candidates - Raw Bytes Length: {len(raw_bytes)}")
-
-                try:
-                    data = json.loads(raw_bytes.decode("utf-8"))
-                    print(f"[DEBUG] name_candidates - JSON Keys: {list(data.keys())}")
-                except json.JSONDecodeError as e:
-                    print(f"[ERROR] name_candidates - JSON 解析失败: {e}")
-                    print(f"[ERROR] name_candidates - Raw Content (first 500): {raw_bytes[:500]}")
-                    raise
+            data = json.loads(raw_bytes.decode("utf-8"))
+        except json.JSONDecodeError as e:
+            self.logger.error(f"{op} - JSON 解析失败: {e}（响应 {len(raw_bytes)} 字节）")
+            if self.tracer.debug:
+                self.tracer.event(
+                    op,
+                    "invalid_json",
+                    error=str(e),
+                    bytes=len(raw_bytes),
+                    preview=raw_bytes[:PREVIEW_CHARS].decode("utf-8", errors="replace"),
+                )
+            raise
 
-            if self.transport == "openai_compat":
-                choices = data.get("choices", [])
-                print(f"[DEBUG] name_candidates - Choices count: {len(choices)}")
-
-                if not choices:
-                    print(f"[ERROR] name_candidates - 空 choices 数组！完整响应: {json.dumps(data, indent=2, ensure_ascii=False)[:1000]}")
-                    return ""
-
-                content = choices[0].get("message", {}).get("content") or ""
-                print(f"[DEBUG] name_candidates - Content length: {len(content)}")
-                print(f"[DEBUG] name_candidates - Content preview: {content[:200]}")
-
-                return content
-            else:
-                cands = data.get("candidates", [])
-                print(f"[DEBUG] name_candidates - Candidates count: {len(cands)}")
-
-                if not cands:
-                    print(f"[ERROR] name_candidates - 空 candidates 数组！完整响应: {json.dumps(data, indent=2, ensure_ascii=False)[:1000]}")
-                    return ""
-
-                parts = cands[0].get("content", {}).get("parts", [])
-                texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
-                result = "\n".join([t for t in texts if t])
-                print(f"[DEBUG] name_candidates - Result length: {len(result)}")
-
-                return result
-
-    def _make_messages(self, user_text: str, images: List[Path], system_prompt: str) -> list:
-        content = [{"type": "text", "text": user_text}]
+        if self.transport == "openai_compat":
+            # OpenAI-compatible: choices[0].message.content
+            choices = data.get("choices", [])
+            if not choices:
+                self._report_empty(op, "choices", data)
+                return ""
+            content = choices[0].get("message", {}).get("content") or ""
+        else:
+            # Gemini native: candidates[0].content.parts[].text
+            cands = data.get("candidates", [])
+            if not cands:
+                self._report_empty(op, "candidates", data)
+                return ""
+            parts = cands[0].get("content", {}).get("parts", [])
+            texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
+            content = "\n".join([t for t in texts if t])
+
+        if self.tracer.debug:
+            self.tracer.event(
+                op,
+                "response",
+                bytes=len(raw_bytes),
+                length=len(content),
+                preview=content[:PREVIEW_CHARS],
+            )
+        return content
+
+    def _report_empty(self, op: str, field: str, data: Dict[str, Any]) -> None:
+        # 只记录响应的顶层字段（如 promptFeedback / error）；完整响应在调试级别才脱敏写入追踪
+        self.logger.error(
+            f"{op} - 空 {field} 数组（响应字段: {', '.join(map(str, data)) or '无'}）"
+        )
+        if self.tracer.debug:
+            self.tracer.event(op, "empty_response", field=field, response=redact(data))
+
+    async def _post(
+        self,
+        url: str,
+        body: JsonBody,
+        timeout: aiohttp.ClientTimeout,
+        op: str,
+        tokens: int = 0,
+        read: Optional[Callable[[aiohttp.ClientResponse], Awaitable[Any]]] = None,
+    ) -> Any:
+        # 发送一次请求，返回原始响应字节（或 read 的结果）；
+        # 非 2xx 抛 ClientResponseError（带 Retry-After 头）
+        span = self.tracer.span(op, url=url)
+
+        async def _read(resp: aiohttp.ClientResponse) -> Any:
+            resp.raise_for_status()
+            # 默认读取原始字节，手动解码
+            return await (read(resp) if read is not None else resp.read())
+
+        def _send(url: str, headers: Dict[str, str]) -> Awaitable[Any]:
+            # 单次请求耗时（分配到 Key 之后）上报给重试策略，供自适应并发判断延迟突增
+            return self.http.post(
+                url,
+                body,
+                headers,
+                timeout,
+                _read,
+                op=op,
+                span=span,
+                on_latency=self.retry_policy.record_latency,
+            )
+
+        if self.key_pool is None:
+            return await _send(url, self._headers())
+        lease = await self.key_pool.acquire(tokens)
+        # 同一路径发往分配到的 Key 所在的代理分组
+        url = lease.base_url + url[len(self.base_url) :]
+        if span is not None:
+            span.record_wait()
+            span.fields.update(url=url, key=lease.name)
+        try:
+            raw = await _send(url, self._headers(lease.api_key))
+        except BaseException as exc:
+            lease.release(exc)
+            raise
+        lease.release()
+        return raw
+
+    def _make_messages(self, user_text: str, images: List[FrameLike], system_prompt: str) -> list:
+        content: List[Dict[str, Any]] = [{"type": "text", "text": user_text}]
         for p in images:
-            data = base64.b64encode(Path(p).read_bytes()).decode("ascii")
-            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{data}"}})
+            content.append(
+                {"type": "image_url", "image_url": {"url": self._image(p, data_url=True)}}
+            )
         return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": content},
         ]
 
+    @classmethod
+    def _img_part(cls, p: FrameLike) -> Dict[str, Any]:
+        image = cls._image(p)
+        return {"inline_data": {"mime_type": image.mime_type, "data": image}}
+
     @staticmethod
-    def _img_part(p: Path) -> Dict[str, Any]:
-        data = base64.b64encode(Path(p).read_bytes()).decode("ascii")
-        return {"inline_data": {"mime_type": "image/jpeg", "data": data}}
+    def _image(p: FrameLike, data_url: bool = False) -> EncodedImage:
+        # 内存帧直接取缓存的 base64 字节（每帧只编码一次），按引用拼入请求体；仍兼容传入文件路径
+        return EncodedImage.of(p if isinstance(p, Frame) else Path(p), data_url=data_url)
@@ -34,7 +34,9 @@ class LLMClientFactory:
             raise ConfigError(f"Failed to get LLM backend config: {e}")
 
         if backend_config.type == "gemini":
-            return GeminiClient(backend_config, logger)
+            return GeminiClient(
+                backend_config, logger, model_flash=config.model.flash, model_pro=config.model.pro
+            )
         elif backend_config.type == "openai":
             return OpenAIClient(backend_config, logger)
         else:
@@ -1,37 +1,90 @@
-"""Gemini 客户端实现 - 支持两种传输格式."""
+"""Gemini 客户端实现 - BaseLLMClient 接口，请求统一走 ``llm.client`` 传输层.
+
+此前这里自带一套会话管理、请求体构建和响应解析，与 WebUI 使用的
+``vrenamer.llm.client.GeminiClient`` 各自维护，WebUI 命名再通过
+``GeminiLLMAdapter`` 桥接。现在只保留一个传输层（``llm.client.GeminiClient``：
+长连接池、重试、多 Key 池、流式解析、追踪、预编码请求体），本类只负责把
+``classify`` / ``generate`` 映射到它的 ``classify_json`` / ``name_candidates``：
+
+- CLI（``LLMClientFactory`` → AnalysisService / NamingService）按 LLMBackendConfig
+  创建自己的传输层；
+- WebUI 管线把共享上下文中的传输层直接传入，分析和命名复用同一个连接池。
+"""
 
 from __future__ import annotations
 
-import base64
 import json
 import logging
 from pathlib import Path
-from typing import List
+from typing import Any, List, Optional
 
 import aiohttp
 
-from vrenamer.core.config import LLMBackendConfig
+from vrenamer.core.config import LLMBackendConfig, ModelConfig
 from vrenamer.core.exceptions import APIError
+from vrenamer.llm import client as transport_client
 from vrenamer.llm.base import BaseLLMClient
+from vrenamer.llm.retry import parse_retry_after
+
+CLASSIFY_SYSTEM_PROMPT = "仅输出JSON对象，禁止额外文本。"
+GENERATE_SYSTEM_PROMPT = "仅输出JSON对象，字段 names 为字符串数组。"
 
 
 class GeminiClient(BaseLLMClient):
     """Gemini 客户端（支持 openai_compat 和 gemini_native 两种格式）."""
 
-    def __init__(self, config: LLMBackendConfig, logger: logging.Logger = None):
+    def __init__(
+        self,
+        config: Optional[LLMBackendConfig] = None,
+        logger: Optional[logging.Logger] = None,
+        client: Optional[transport_client.GeminiClient] = None,
+        model_flash: Optional[str] = None,
+        model_pro: Optional[str] = None,
+        **transport_kwargs: Any,
+    ):
         """初始化 Gemini 客户端.
 
         Args:
-            config: LLM 后端配置
+            config: LLM 后端配置（未提供 client 时用于创建传输层）
             logger: 日志器（可选）
+            client: 已有的传输层（可选，如 WebUI 管线上下文中的客户端）
+            model_flash: 分析任务使用的模型（默认取 ModelConfig）
+            model_pro: 命名生成使用的模型（默认取 ModelConfig）
+            **transport_kwargs: 创建传输层时的额外参数（http / retry_policy / tracer / key_pool）
+
+        Raises:
+            ValueError: config 和 client 都未提供
         """
-        self.base_url = config.base_url.rstrip("/")
-        self.api_key = config.api_key
-        self.transport = config.transport  # openai_compat | gemini_native
-        self.timeout = config.timeout
-        self.retry = config.retry
+        if client is None:
+            if config is None:
+                raise ValueError(
+                    "GeminiClient requires either a backend config or a transport client"
+                )
+            client = transport_client.GeminiClient.from_config(
+                config, logger=logger, **transport_kwargs
+            )
+        self.client = client
+        defaults = ModelConfig()
+        self.model_flash = model_flash or defaults.flash
+        self.model_pro = model_pro or defaults.pro
         self.logger = logger or logging.getLogger(__name__)
 
+    @property
+    def transport(self) -> str:
+        return self.client.transport
+
+    @property
+    def http(self):
+        return self.client.http
+
+    @property
+    def retry_policy(self):
+        return self.client.retry_policy
+
+    @property
+    def tracer(self):
+        return self.client.tracer
+
     async def classify(
         self,
         prompt: str,
@@ -41,185 +94,21 @@ class GeminiClient(BaseLLMClient):
         max_tokens: int = 512,
     ) -> str:
         """分类任务（多模态）."""
-        if self.transport == "openai_compat":
-            return await self._classify_openai_format(
-                prompt, images, response_format, temperature, max_tokens
-            )
-        else:
-            return await self._classify_gemini_format(
-                prompt, images, response_format, temperature, max_tokens
-            )
-
-    async def _classify_openai_format(
-        self, prompt: str, images: List[Path], response_format: str, temperature: float, max_tokens: int
-    ) -> str:
-        """OpenAI 兼容格式."""
-        url = f"{self.base_url}/v1beta/openai/chat/completions"
-
-        # 构建消息
-        content = [{"type": "text", "text": prompt}]
-        for img_path in images:
-            img_data = base64.b64encode(img_path.read_bytes()).decode("ascii")
-            content.append(
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_data}"}}
-            )
-
-        body = {
-            "model": "gemini-flash-latest",
-            "messages": [{"role": "user", "content": content}],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
-
-        if response_format == "json":
-            body["response_format"] = {"type": "json_object"}
-
-        # 发送请求
-        self.logger.debug(f"Calling Gemini API (OpenAI format): {url}")
-        try:
-            _hdr = dict(self._headers())
-            if "Authorization" in _hdr:
-                _hdr["Authorization"] = "Bearer ***REDACTED***"
-            self.logger.debug(f"Request headers: {_hdr}")
-            # Redact base64 data for logs
-            def _redact(b):
-                try:
-                    b_copy = json.loads(json.dumps(b))
-                except Exception:
-                    return b
-                if "messages" in b_copy:
-                    for m in b_copy["messages"]:
-                        c = m.get("content")
-                        if isinstance(c, list):
-                            for item in c:
-                                if isinstance(item, dict) and item.get("type") == "image_url":
-                                    urlv = ((item.get("image_url") or {}).get("url") or "")
-                                    if isinstance(urlv, str) and urlv.startswith("data:image"):
-                                        item["image_url"]["url"] = f"data:image/jpeg;base64,<BASE64_LENGTH:{len(urlv.split(',')[-1])}>"
-                return b_copy
-            self.logger.debug(f"Request body (sanitized): {json.dumps(_redact(body))[:2000]}")
-        except Exception as _e:
-            self.logger.debug(f"Request logging failed: {_e}")
-        self.logger.debug(f"Request body: model={body['model']}, temperature={temperature}, images={len(images)}")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                headers=self._headers(),
-                json=body,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as resp:
-                self.logger.debug(f"HTTP Status: {resp.status}")
-                self.logger.debug(f"Response Headers: {dict(resp.headers)}")
-
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    self.logger.error(f"API Error: {error_text}")
-                    raise APIError(
-                        f"Gemini API returned status {resp.status}",
-                        status_code=resp.status,
-                        response=error_text,
-                    )
-
-                # 读取原始字节
-                raw_bytes = await resp.read()
-                self.logger.debug(f"Raw response length: {len(raw_bytes)} bytes")
-
-                try:
-                    data = json.loads(raw_bytes.decode("utf-8"))
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"JSON decode failed: {e}")
-                    self.logger.error(f"Raw content (first 500): {raw_bytes[:500]}")
-                    raise APIError(f"Failed to decode JSON response: {e}", response=raw_bytes[:500].decode("utf-8", errors="ignore"))
-
-                # 提取内容
-                choices = data.get("choices", [])
-                if not choices:
-                    self.logger.error(f"Empty choices array. Full response: {json.dumps(data, indent=2, ensure_ascii=False)[:1000]}")
-                    raise APIError("Empty choices array in response", response=json.dumps(data)[:500])
-
-                content = choices[0].get("message", {}).get("content") or ""
-                self.logger.debug(f"Response content length: {len(content)} chars")
-                self.logger.debug(f"Response preview: {content[:200]}")
-
-                return content
-
-    async def _classify_gemini_format(
-        self, prompt: str, images: List[Path], response_format: str, temperature: float, max_tokens: int
-    ) -> str:
-        """Gemini 原生格式."""
-        url = f"{self.base_url}/v1beta/models/gemini-flash-latest:generateContent"
-
-        # 构建 parts
-        parts = [{"text": prompt}]
-        for img_path in images:
-            img_data = base64.b64encode(img_path.read_bytes()).decode("ascii")
-            parts.append({"inline_data": {"mime_type": "image/jpeg", "data": img_data}})
-
-        body = {
-            "contents": [{"role": "user", "parts": parts}],
-            "generation_config": {"temperature": temperature, "max_output_tokens": max_tokens},
-        }
-
-        # 发送请求
-        self.logger.debug(f"Calling Gemini API (native format): {url}")
-        try:
-            _hdr = dict(self._headers())
-            if "Authorization" in _hdr:
-                _hdr["Authorization"] = "Bearer ***REDACTED***"
-            self.logger.debug(f"Request headers: {_hdr}")
-            # Redact base64 data for logs
-            def _redact(b):
-                try:
-                    b_copy = json.loads(json.dumps(b))
-                except Exception:
-                    return b
-                if "contents" in b_copy:
-                    for c in b_copy.get("contents", []):
-                        parts = c.get("parts") or []
-                        for p in parts:
-                            if isinstance(p, dict) and "inline_data" in p:
-                                data = (p["inline_data"] or {}).get("data")
-                                if isinstance(data, str):
-                                    p["inline_data"]["data"] = f"<BASE64_LENGTH:{len(data)}>"
-                return b_copy
-            self.logger.debug(f"Request body (sanitized): {json.dumps(_redact(body))[:2000]}")
-        except Exception as _e:
-            self.logger.debug(f"Request logging failed: {_e}")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                headers=self._headers(),
-                json=body,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as resp:
-                self.logger.debug(f"HTTP Status: {resp.status}")
-
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    self.logger.error(f"API Error: {error_text}")
-                    raise APIError(
-                        f"Gemini API returned status {resp.status}",
-                        status_code=resp.status,
-                        response=error_text,
-                    )
-
-                raw_bytes = await resp.read()
-                data = json.loads(raw_bytes.decode("utf-8"))
-
-                # 提取内容
-                candidates = data.get("candidates", [])
-                if not candidates:
-                    self.logger.error(f"Empty candidates array. Full response: {json.dumps(data)[:1000]}")
-                    raise APIError("Empty candidates array in response")
-
-                parts = candidates[0].get("content", {}).get("parts", [])
-                texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
-                result = "\n".join([t for t in texts if t])
-
-                self.logger.debug(f"Response length: {len(result)} chars")
-                return result
+        extra = None
+        if max_tokens:
+            key = "max_tokens" if self.transport == "openai_compat" else "max_output_tokens"
+            extra = {key: max_tokens}
+        return await self._call(
+            self.client.classify_json(
+                model=self.model_flash,
+                system_prompt=CLASSIFY_SYSTEM_PROMPT,
+                user_text=prompt,
+                images=images,
+                response_json=response_format == "json",
+                temperature=temperature,
+                extra=extra,
+            ),
+        )
 
     async def generate(
         self,
@@ -228,68 +117,43 @@ class GeminiClient(BaseLLMClient):
         temperature: float = 0.7,
         max_tokens: int = 2048,
     ) -> str:
-        """生成任务（纯文本）."""
-        if self.transport == "openai_compat":
-            url = f"{self.base_url}/v1beta/openai/chat/completions"
-            body = {
-                "model": "gemini-2.5-pro",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-            }
-            if response_format == "json":
-                body["response_format"] = {"type": "json_object"}
-        else:
-            url = f"{self.base_url}/v1beta/models/gemini-2.5-pro:generateContent"
-            body = {
-                "contents": [{"role": "user", "parts": [{"text": prompt}]}],
-                "generation_config": {"temperature": temperature, "max_output_tokens": max_tokens},
-            }
+        """生成任务（纯文本）.
 
-        self.logger.debug(f"Calling Gemini API for generation: {url}")
+        不向传输层传 max_tokens：推理模型的思考 token 也计入输出上限，限制过小
+        会得到空响应；命名输出很短，不需要上限。
+        """
+        return await self._call(
+            self.client.name_candidates(
+                model=self.model_pro,
+                system_prompt=GENERATE_SYSTEM_PROMPT,
+                user_text=prompt,
+                temperature=temperature,
+                json_array=response_format == "json",
+            ),
+        )
+
+    async def _call(self, request) -> str:
+        """等待传输层请求，错误统一转换为 APIError.
+
+        模型输出为空时返回空字符串（传输层已记录错误），由调用方按无结果处理：
+        命名时该风格没有候选，不影响其他风格。
+
+        Raises:
+            APIError: 非 2xx 响应（重试用尽后）或响应不是合法 JSON
+        """
         try:
-            _hdr = dict(self._headers())
-            if "Authorization" in _hdr:
-                _hdr["Authorization"] = "Bearer ***REDACTED***"
-            self.logger.debug(f"Request headers: {_hdr}")
-            self.logger.debug(f"Request body preview: {json.dumps(body)[:2000]}")
-        except Exception as _e:
-            self.logger.debug(f"Request logging failed: {_e}")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                headers=self._headers(),
-                json=body,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    raise APIError(
-                        f"Gemini API returned status {resp.status}",
-                        status_code=resp.status,
-                        response=error_text,
-                    )
-
-                raw_bytes = await resp.read()
-                data = json.loads(raw_bytes.decode("utf-8"))
-
-                if self.transport == "openai_compat":
-                    choices = data.get("choices", [])
-                    if not choices:
-                        raise APIError("Empty choices array in response")
-                    return choices[0].get("message", {}).get("content") or ""
-                else:
-                    candidates = data.get("candidates", [])
-                    if not candidates:
-                        raise APIError("Empty candidates array in response")
-                    parts = candidates[0].get("content", {}).get("parts", [])
-                    texts = [p.get("text", "") for p in parts if isinstance(p, dict)]
-                    return "\n".join([t for t in texts if t])
-
-    def _headers(self) -> dict:
-        """构建请求头."""
-        return {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+            text = await request
+        except aiohttp.ClientResponseError as e:
+            retry_after = parse_retry_after((e.headers or {}).get("Retry-After"))
+            raise APIError(
+                f"Gemini API returned status {e.status}",
+                status_code=e.status,
+                retry_after=retry_after,
+            ) from e
+        except json.JSONDecodeError as e:
+            raise APIError(f"Failed to decode JSON response: {e}") from e
+        return text
+
+    async def close(self) -> None:
+        """关闭传输层（连接池和追踪输出）."""
+        await self.client.close()
@@ -0,0 +1,244 @@
+"""多 Key 客户端池 - 每个 Key 独立的 RPM / TPM 令牌桶 + 429 冷却.
+
+GPT-Load 背后是一组 Free Tier Key，但客户端只持有一个 ``api_key``，
+吞吐被单个 Key 的配额卡住。``KeyPool`` 管理多个 Key（或多个代理分组
+的 base_url）：
+
+- 每个 Key 各有一个 RPM 令牌桶和一个 TPM 令牌桶（按提示词长度和图片数
+  估算 token），配额用尽的 Key 暂不参与分配；
+- 每个请求分配给在途请求最少的可用 Key，负载相同时轮询；
+- 返回 429 的 Key 冷却 ``cooldown`` 秒（响应带 Retry-After 且更长时以其为准），
+  期间请求分配给其他 Key；
+- 所有 Key 都不可用时等待最早恢复的那一个。
+
+总吞吐因此随 Key 数量线性增长。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from vrenamer.llm.retry import classify_error
+
+DEFAULT_COOLDOWN = 60.0  # 429 后的冷却时间（秒）
+
+# token 估算：文本约 4 字符 / token，每张图片按 Gemini 的 258 token 计
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 258
+
+
+def estimate_tokens(text: str, images: int = 0, max_output: int = 0) -> int:
+    """粗略估算一次请求消耗的 token 数（用于 TPM 限流）."""
+    return len(text) // CHARS_PER_TOKEN + images * TOKENS_PER_IMAGE + max_output
+
+
+@dataclass(frozen=True)
+class KeyEndpoint:
+    """一个 Key（或一个代理分组）."""
+
+    base_url: str
+    api_key: str
+    name: str = ""
+
+
+class TokenBucket:
+    """按分钟配额的令牌桶（容量为一分钟的配额，匀速补充）."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        """初始化令牌桶.
+
+        Args:
+            per_minute: 每分钟配额，0 表示不限
+            clock: 时钟（可选，测试时替换）
+        """
+        self.capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float = 1.0) -> float:
+        """距离可取出 amount 个令牌还需等待的秒数（超过容量的请求按容量计）."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self._rate
+
+    def take(self, amount: float = 1.0) -> None:
+        """取出令牌（调用前应确认 wait_time 为 0）."""
+        if self.unlimited:
+            return
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class _KeyState:
+    def __init__(self, endpoint: KeyEndpoint, rpm: int, tpm: int, clock: Callable[[], float]):
+        self.endpoint = endpoint
+        self.rpm = TokenBucket(rpm, clock)
+        self.tpm = TokenBucket(tpm, clock)
+        self.inflight = 0
+        self.cooldown_until = float("-inf")
+        # 统计
+        self.requests = 0
+        self.rate_limited = 0
+
+    def wait_time(self, now: float, tokens: int) -> float:
+        return max(self.cooldown_until - now, self.rpm.wait_time(1), self.tpm.wait_time(tokens))
+
+
+class KeyLease:
+    """一次请求占用的 Key；请求结束后必须 release."""
+
+    def __init__(self, pool: "KeyPool", state: _KeyState):
+        self._pool = pool
+        self._state = state
+        self._released = False
+
+    @property
+    def base_url(self) -> str:
+        return self._state.endpoint.base_url
+
+    @property
+    def api_key(self) -> str:
+        return self._state.endpoint.api_key
+
+    @property
+    def name(self) -> str:
+        return self._state.endpoint.name
+
+    def release(self, exc: Optional[BaseException] = None) -> None:
+        """归还 Key；请求以 429 结束时让该 Key 冷却."""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._state, exc)
+
+
+class KeyPool:
+    """多 Key 轮询池（单事件循环内使用）."""
+
+    def __init__(
+        self,
+        endpoints: Sequence[KeyEndpoint],
+        rpm: int = 0,
+        tpm: int = 0,
+        cooldown: float = DEFAULT_COOLDOWN,
+        logger: Optional[logging.Logger] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        """初始化 Key 池.
+
+        Args:
+            endpoints: Key 列表（至少一个）
+            rpm: 每个 Key 的每分钟请求数上限，0 表示不限
+            tpm: 每个 Key 的每分钟 token 上限（估算值），0 表示不限
+            cooldown: 429 后的冷却时间（秒）
+            logger: 日志器（可选）
+            clock: 时钟（可选，测试时替换）
+            sleep: 等待函数（可选，测试时替换）
+
+        Raises:
+            ValueError: Key 列表为空
+        """
+        if not endpoints:
+            raise ValueError("KeyPool requires at least one endpoint")
+        self.cooldown = cooldown
+        self.logger = logger or logging.getLogger(__name__)
+        self._clock = clock
+        self._sleep = sleep
+        self._keys: List[_KeyState] = [
+            _KeyState(
+                KeyEndpoint(e.base_url.rstrip("/"), e.api_key, e.name or f"key#{i + 1}"),
+                rpm,
+                tpm,
+                clock,
+            )
+            for i, e in enumerate(endpoints)
+        ]
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def acquire(self, tokens: int = 0) -> KeyLease:
+        """分配一个 Key：在途请求最少的可用 Key，负载相同时轮询.
+
+        Args:
+            tokens: 本次请求的估算 token 数（用于 TPM 限流）
+
+        Returns:
+            Key 租约（请求结束后调用 release）
+        """
+        n = len(self._keys)
+        while True:
+            now = self._clock()
+            best: Optional[int] = None
+            wait: Optional[float] = None
+            for offset in range(n):
+                idx = (self._cursor + offset) % n
+                state = self._keys[idx]
+                ready_in = state.wait_time(now, tokens)
+                if ready_in > 0:
+                    wait = ready_in if wait is None else min(wait, ready_in)
+                elif best is None or state.inflight < self._keys[best].inflight:
+                    best = idx
+            if best is not None:
+                state = self._keys[best]
+                state.rpm.take(1)
+                state.tpm.take(tokens)
+                state.inflight += 1
+                state.requests += 1
+                self._cursor = (best + 1) % n
+                return KeyLease(self, state)
+            await self._sleep(wait)
+
+    def _release(self, state: _KeyState, exc: Optional[BaseException]) -> None:
+        state.inflight -= 1
+        if exc is None or getattr(exc, "status", getattr(exc, "status_code", None)) != 429:
+            return
+        _, retry_after = classify_error(exc)
+        cooldown = max(self.cooldown, retry_after or 0.0)
+        state.cooldown_until = self._clock() + cooldown
+        state.rate_limited += 1
+        self.logger.warning(f"{state.endpoint.name} 返回 429，冷却 {cooldown:.0f}s")
+
+    def snapshot(self) -> List[dict]:
+        """各 Key 的状态（用于日志 / 指标）."""
+        now = self._clock()
+        return [
+            {
+                "name": s.endpoint.name,
+                "requests": s.requests,
+                "rate_limited": s.rate_limited,
+                "inflight": s.inflight,
+                "cooling": s.cooldown_until > now,
+            }
+            for s in self._keys
+        ]
+
+    def summary(self) -> str:
+        """一行统计摘要."""
+        parts = [
+            f"{s['name']} {s['requests']} 次"
+            + (f"（429 {s['rate_limited']} 次）" if s["rate_limited"] else "")
+            for s in self.snapshot()
+        ]
+        return f"Key 池 ({len(self)} 个): " + "，".join(parts)
@@ -0,0 +1,227 @@
+"""自适应并发控制 - AIMD（加性增、乘性减）.
+
+``max_concurrency = 64``、``batch_concurrency = 16`` 都是固定的猜测值：
+GPT-Load 的可用 Key 多时并发不够用，Key 被限流时又会成片 429。
+``AdaptiveLimiter`` 取代静态的 ``asyncio.Semaphore``，根据请求结果动态调整
+同时在途的请求数：
+
+- 请求成功：上限加性增长，每个成功请求 +increase/上限，即每轮（上限个
+  请求）约 +increase；
+- 429 / 5xx，或单次 HTTP 请求的延迟超过基线的 ``latency_tolerance``
+  倍：上限乘以 ``decrease``。超时不算过载（大图批次本身就慢，重试策略只
+  短暂等待后重试一次），不下调上限。同一轮内的多次过载只减一次，避免一次限流把
+  上限打到底；
+- 上限始终在 [min_limit, max_limit] 之间，下调后多出的在途请求自然结束，
+  不会被中断。
+
+延迟由传输层按每次 HTTP 请求上报（``record_latency``，经重试策略的
+``on_latency`` 回调），不包含槽位内的重试退避、Retry-After 等待、Key 池冷却
+和拼图等本地耗时。突增的样本同样计入基线，延迟整体变化（批次变大、合并
+模式、代理变慢）后基线会跟上，不会把每个请求都判为突增。
+
+重试策略在每次重试前也会上报过载（429 被重试吸收时并发仍需下调）。
+当前上限通过 ``limit`` / ``snapshot()`` 暴露，便于观察代理 Key 池的实际吞吐。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from vrenamer.llm.retry import classify_error
+
+DEFAULT_INITIAL_LIMIT = 16
+DEFAULT_MIN_LIMIT = 2
+DEFAULT_MAX_LIMIT = 64
+DEFAULT_INCREASE = 1.0  # 每轮加性增长量
+DEFAULT_DECREASE = 0.5  # 过载时的乘性系数
+DEFAULT_LATENCY_TOLERANCE = 2.0  # 延迟超过基线该倍数视为过载
+DEFAULT_SMOOTHING = 0.1  # 基线延迟的指数平滑系数
+WARMUP_SAMPLES = 5  # 积累足够样本后才按延迟判断过载
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器（单事件循环内使用）."""
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL_LIMIT,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        increase: float = DEFAULT_INCREASE,
+        decrease: float = DEFAULT_DECREASE,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+        smoothing: float = DEFAULT_SMOOTHING,
+        logger: Optional[logging.Logger] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化限制器.
+
+        Args:
+            initial: 初始并发上限
+            min_limit: 并发上限下界
+            max_limit: 并发上限上界
+            increase: 每轮（上限个成功请求）加性增长量
+            decrease: 过载时的乘性系数（0-1）
+            latency_tolerance: 延迟超过基线该倍数视为过载，0 表示不按延迟判断
+            smoothing: 基线延迟的指数平滑系数（0-1）
+            logger: 日志器（可选）
+            clock: 时钟（可选，测试时替换）
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.logger = logger or logging.getLogger(__name__)
+        self._clock = clock
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._inflight = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._baseline: Optional[float] = None  # 成功请求的平滑延迟（秒）
+        self._samples = 0
+        self._epoch = 0  # 每次下调加一；同一轮内开始的请求只触发一次下调
+        self._last_decrease = float("-inf")
+        # 统计
+        self.successes = 0
+        self.overloads = 0
+        self.latency_spikes = 0
+        self.peak_limit = int(self._limit)
+
+    @classmethod
+    def fixed(cls, limit: int) -> "AdaptiveLimiter":
+        """固定上限（关闭自适应时使用，等价于 Semaphore）."""
+        limit = max(1, limit)
+        return cls(initial=limit, min_limit=limit, max_limit=limit)
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限."""
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        """当前在途请求数."""
+        return self._inflight
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态（用于日志 / 指标）."""
+        return {
+            "limit": self.limit,
+            "inflight": self._inflight,
+            "peak_limit": self.peak_limit,
+            "latency_ms": round(self._baseline * 1000) if self._baseline is not None else None,
+            "successes": self.successes,
+            "overloads": self.overloads,
+            "latency_spikes": self.latency_spikes,
+        }
+
+    def summary(self) -> str:
+        """一行统计摘要."""
+        snap = self.snapshot()
+        latency = f"{snap['latency_ms']} ms" if snap["latency_ms"] is not None else "-"
+        return (
+            f"自适应并发: 当前上限 {snap['limit']}（峰值 {snap['peak_limit']}，"
+            f"范围 {self.min_limit}-{self.max_limit}），基线延迟 {latency}，"
+            f"过载 {snap['overloads']} 次，延迟突增 {snap['latency_spikes']} 次"
+        )
+
+    def slot(self) -> "_Slot":
+        """获取一个并发槽位：``async with limiter.slot(): ...``."""
+        return _Slot(self)
+
+    def record_overload(self) -> None:
+        """上报过载（429 / 5xx），乘性下调上限.
+
+        由重试策略在每次重试前调用；距上次下调不足一个基线延迟时只计数不下调，
+        避免同一波 429 连续下调多次。
+        """
+        self.overloads += 1
+        self._decrease_after_cooldown()
+
+    def record_latency(self, latency: float) -> None:
+        """上报一次成功 HTTP 请求的延迟（秒），更新基线并判断是否突增.
+
+        由传输层在每次请求（包括每次重试）完成后调用，经重试策略的
+        ``on_latency`` 回调接入。突增样本也计入基线，持续的延迟变化只会
+        触发有限次下调。
+        """
+        baseline = self._baseline
+        spike = (
+            self.latency_tolerance > 0
+            and baseline is not None
+            and self._samples >= WARMUP_SAMPLES
+            and latency > baseline * self.latency_tolerance
+        )
+        self._baseline = (
+            latency if baseline is None else baseline + self.smoothing * (latency - baseline)
+        )
+        self._samples += 1
+        if spike:
+            self.latency_spikes += 1
+            self._decrease_after_cooldown()
+
+    def _decrease_after_cooldown(self) -> None:
+        # 距上次下调不足一个基线延迟时不再下调
+        cooldown = self._baseline if self._baseline is not None else 1.0
+        if self._clock() - self._last_decrease < cooldown:
+            return
+        self._decrease(self._epoch)
+
+    async def _acquire(self) -> int:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._inflight < self.limit)
+            self._inflight += 1
+        return self._epoch
+
+    async def _release(self) -> None:
+        async with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self, epoch: int) -> None:
+        self.successes += 1
+        if epoch < self._epoch:
+            # 请求期间发生过下调，不据此增长
+            return
+        self._limit = min(
+            float(self.max_limit), self._limit + self.increase / max(self._limit, 1.0)
+        )
+        self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _decrease(self, epoch: int) -> None:
+        # 同一轮（上次下调之后开始的请求）只下调一次
+        if epoch < self._epoch:
+            return
+        old = self.limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease)
+        self._epoch += 1
+        self._last_decrease = self._clock()
+        if self.limit != old:
+            self.logger.info(f"自适应并发: 上限 {old} → {self.limit}")
+
+
+class _Slot:
+    """一个并发槽位；退出时按结果调整上限."""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self._limiter = limiter
+        self._epoch = 0
+
+    async def __aenter__(self) -> "_Slot":
+        self._epoch = await self._limiter._acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        limiter = self._limiter
+        if exc is None:
+            limiter._on_success(self._epoch)
+        elif classify_error(exc)[0] == "status":  # 429 / 5xx；超时不算过载
+            limiter.overloads += 1
+            limiter._decrease(self._epoch)
+        await limiter._release()
@@ -2,28 +2,41 @@
 
 from __future__ import annotations
 
-import base64
 import json
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import aiohttp
 
 from vrenamer.core.config import LLMBackendConfig
 from vrenamer.core.exceptions import APIError
 from vrenamer.llm.base import BaseLLMClient
+from vrenamer.llm.body import EncodedImage, JsonBody
+from vrenamer.llm.retry import RetryPolicy, parse_retry_after
+from vrenamer.llm.tracing import Tracer
+from vrenamer.llm.transport import HttpTransport
 
 
 class OpenAIClient(BaseLLMClient):
     """OpenAI 客户端."""
 
-    def __init__(self, config: LLMBackendConfig, logger: logging.Logger = None):
+    def __init__(
+        self,
+        config: LLMBackendConfig,
+        logger: logging.Logger = None,
+        http: Optional[HttpTransport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        tracer: Optional[Tracer] = None,
+    ):
         """初始化 OpenAI 客户端.
 
         Args:
             config: LLM 后端配置
             logger: 日志器（可选）
+            http: 共享的 HTTP 传输层（可选，未提供时按配置创建并由客户端持有）
+            retry_policy: 重试策略（可选，未提供时按配置创建；重试预算由所有请求共享）
+            tracer: 请求追踪器（可选，未提供时按配置创建，默认关闭）
         """
         self.base_url = config.base_url.rstrip("/")
         self.api_key = config.api_key
@@ -31,6 +44,11 @@ class OpenAIClient(BaseLLMClient):
         self.timeout = config.timeout
         self.retry = config.retry
         self.logger = logger or logging.getLogger(__name__)
+        self.tracer = tracer or Tracer.from_config(config, logger=self.logger)
+        self.http = http or HttpTransport.from_config(
+            config, logger=self.logger, tracer=self.tracer
+        )
+        self.retry_policy = retry_policy or RetryPolicy.from_config(config, logger=self.logger)
 
     async def classify(
         self,
@@ -46,9 +64,12 @@ class OpenAIClient(BaseLLMClient):
         # 构建消息
         content = [{"type": "text", "text": prompt}]
         for img_path in images:
-            img_data = base64.b64encode(img_path.read_bytes()).decode("ascii")
+            # base64 载荷按引用拼入请求体（帧只编码一次）
             content.append(
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_data}"}}
+                {
+                    "type": "image_url",
+                    "image_url": {"url": EncodedImage.of(img_path, data_url=True)},
+                }
             )
 
         body = {
@@ -64,32 +85,14 @@ class OpenAIClient(BaseLLMClient):
         self.logger.debug(f"Calling OpenAI API: {url}")
         self.logger.debug(f"Request: model={body['model']}, images={len(images)}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                headers=self._headers(),
-                json=body,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as resp:
-                self.logger.debug(f"HTTP Status: {resp.status}")
-
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    self.logger.error(f"API Error: {error_text}")
-                    raise APIError(
-                        f"OpenAI API returned status {resp.status}",
-                        status_code=resp.status,
-                        response=error_text,
-                    )
-
-                data = await resp.json()
-                choices = data.get("choices", [])
-                if not choices:
-                    raise APIError("Empty choices array in response")
-
-                content = choices[0].get("message", {}).get("content") or ""
-                self.logger.debug(f"Response length: {len(content)} chars")
-                return content
+        data = await self._post_json(url, body, "classify")
+        choices = data.get("choices", [])
+        if not choices:
+            raise APIError("Empty choices array in response")
+
+        content = choices[0].get("message", {}).get("content") or ""
+        self.logger.debug(f"Response length: {len(content)} chars")
+        return content
 
     async def generate(
         self,
@@ -113,27 +116,55 @@ class OpenAIClient(BaseLLMClient):
 
         self.logger.debug(f"Calling OpenAI API for generation: {url}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
+        data = await self._post_json(url, body, "generate")
+        choices = data.get("choices", [])
+        if not choices:
+            raise APIError("Empty choices array in response")
+
+        return choices[0].get("message", {}).get("content") or ""
+
+    async def _post_json(self, url: str, body: dict, op: str = "request") -> dict:
+        """发送请求并解析 JSON 响应（429 / 5xx / 超时按重试策略重试）.
+
+        Raises:
+            APIError: 非 200 响应（重试用尽后）
+        """
+
+        # 请求体只序列化一次，重试时复用
+        payload = JsonBody(body)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async def _read(resp: aiohttp.ClientResponse) -> dict:
+            self.logger.debug(f"HTTP Status: {resp.status}")
+            if resp.status != 200:
+                error_text = await resp.text()
+                self.logger.error(f"API Error: {error_text}")
+                raise APIError(
+                    f"OpenAI API returned status {resp.status}",
+                    status_code=resp.status,
+                    response=error_text,
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            return await resp.json()
+
+        return await self.retry_policy.call(
+            lambda: self.http.post(
                 url,
-                headers=self._headers(),
-                json=body,
-                timeout=aiohttp.ClientTimeout(total=self.timeout),
-            ) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    raise APIError(
-                        f"OpenAI API returned status {resp.status}",
-                        status_code=resp.status,
-                        response=error_text,
-                    )
-
-                data = await resp.json()
-                choices = data.get("choices", [])
-                if not choices:
-                    raise APIError("Empty choices array in response")
-
-                return choices[0].get("message", {}).get("content") or ""
+                payload,
+                self._headers(),
+                timeout,
+                _read,
+                op=op,
+                span=self.tracer.span(op, url=url),
+                on_latency=self.retry_policy.record_latency,
+            ),
+            label=f"OpenAI {url.rsplit('/', 1)[-1]}",
+        )
+
+    async def close(self) -> None:
+        """关闭连接池和追踪输出."""
+        await self.http.close()
+        self.tracer.close()
 
     def _headers(self) -> dict:
         """构建请求头."""
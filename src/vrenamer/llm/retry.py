@@ -0,0 +1,256 @@
+"""重试策略 - 指数退避 + 去相关抖动 + Retry-After + 重试预算.
+
+GPT-Load 在 Key 限流或上游过载时返回 429 / 503，此前任何一次失败都会让
+整批帧记为空标签。``RetryPolicy`` 包在每个 HTTP 请求外层，按错误类型区分：
+
+- 可重试状态码（408 / 429 / 500 / 502 / 503 / 504）与连接断开：按去相关抖动
+  （``min(上限, uniform(基础间隔, 上次间隔 × 3))``）退避，服务端给出
+  ``Retry-After`` 时至少等待该时长，超过 ``max_retry_after`` 则直接放弃；
+- 超时：大图批次再次超时的可能性很大，只重试 ``timeout_retries`` 次，
+  且不做长时间退避；
+- 其他错误（4xx、JSON 解析失败等）：不重试。
+
+所有重试从同一个 ``RetryBudget`` 中扣减。预算以令牌桶方式维护：初始和上限
+均为 ``reserve`` 个令牌，每次首发请求补充 ``ratio`` 个，每次重试消耗 1 个。
+64 路并发同时遇到 429 时，只有预算内的请求会重试，其余立即失败，不会把
+限流放大成重试风暴；请求恢复成功后预算逐步回补。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple, TypeVar
+
+import aiohttp
+
+from vrenamer.core.exceptions import APIError
+
+T = TypeVar("T")
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# 默认值
+DEFAULT_RETRIES = 3
+DEFAULT_BASE_DELAY = 0.5  # 首次退避下限（秒）
+DEFAULT_MAX_DELAY = 20.0  # 单次退避上限（秒）
+DEFAULT_MAX_RETRY_AFTER = 60.0  # Retry-After 超过该值时放弃重试（秒）
+DEFAULT_TIMEOUT_RETRIES = 1  # 超时最多重试次数
+DEFAULT_BUDGET_RATIO = 0.2  # 每次首发请求补充的重试令牌
+DEFAULT_BUDGET_RESERVE = 20  # 重试令牌初始值与上限
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）.
+
+    Args:
+        value: 头部原始值
+
+    Returns:
+        需要等待的秒数；缺失或无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def classify_error(exc: BaseException) -> Tuple[Optional[str], Optional[float]]:
+    """判断异常是否可重试.
+
+    Args:
+        exc: 请求抛出的异常
+
+    Returns:
+        (类别, Retry-After 秒数)；类别为 "status" / "connection" / "timeout"，
+        不可重试时为 None
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout", None
+    if isinstance(exc, aiohttp.ClientResponseError):
+        if exc.status in RETRYABLE_STATUSES:
+            headers = exc.headers or {}
+            return "status", parse_retry_after(headers.get("Retry-After"))
+        return None, None
+    if isinstance(exc, APIError):
+        if exc.status_code in RETRYABLE_STATUSES:
+            return "status", exc.retry_after
+        return None, None
+    if isinstance(exc, aiohttp.ClientConnectionError):
+        return "connection", None
+    return None, None
+
+
+class RetryBudget:
+    """重试预算（令牌桶），同一客户端的所有请求共享."""
+
+    def __init__(self, ratio: float = DEFAULT_BUDGET_RATIO, reserve: int = DEFAULT_BUDGET_RESERVE):
+        """初始化重试预算.
+
+        Args:
+            ratio: 每次首发请求补充的令牌数（长期重试量约为请求量的 ratio 倍）
+            reserve: 令牌初始值与上限（允许的瞬时重试数）
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        # 统计：发放的重试数 / 因预算耗尽被拒绝的重试数
+        self.spent = 0
+        self.denied = 0
+
+    @property
+    def tokens(self) -> float:
+        """当前可用令牌数."""
+        return self._tokens
+
+    def record_request(self) -> None:
+        """记录一次首发请求，补充令牌."""
+        self._tokens = min(float(self.reserve), self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试为一次重试扣减令牌；预算耗尽时返回 False."""
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.spent += 1
+            return True
+        self.denied += 1
+        return False
+
+
+class RetryPolicy:
+    """LLM 请求的重试策略."""
+
+    def __init__(
+        self,
+        retries: int = DEFAULT_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+        timeout_retries: int = DEFAULT_TIMEOUT_RETRIES,
+        budget: Optional[RetryBudget] = None,
+        logger: Optional[logging.Logger] = None,
+        rng: Optional[random.Random] = None,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        """初始化重试策略.
+
+        Args:
+            retries: 单个请求的最大重试次数（不含首发），0 表示不重试
+            base_delay: 退避下限（秒）
+            max_delay: 单次退避上限（秒）
+            max_retry_after: 可接受的 Retry-After 上限（秒），超过则放弃
+            timeout_retries: 超时的最大重试次数（不超过 retries）
+            budget: 重试预算（None 则创建默认预算）
+            logger: 日志器（可选）
+            rng: 随机数生成器（可选，测试时固定抖动）
+            sleep: 等待函数（可选，测试时替换）
+        """
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.timeout_retries = min(self.retries, max(0, timeout_retries))
+        self.budget = budget or RetryBudget()
+        self.logger = logger or logging.getLogger(__name__)
+        self._rng = rng or random.Random()
+        self._sleep = sleep
+        # 过载回调（429 / 5xx 被重试吸收时通知自适应并发限制器下调；超时和连接断开不通知）
+        self.on_overload: Optional[Callable[[], None]] = None
+        # 延迟回调（传输层每次 HTTP 请求成功后上报耗时，供自适应并发限制器判断延迟突增）
+        self.on_latency: Optional[Callable[[float], None]] = None
+
+    def record_latency(self, seconds: float) -> None:
+        """上报单次 HTTP 请求的耗时（不含重试退避和 Key 池排队）."""
+        if self.on_latency is not None:
+            self.on_latency(seconds)
+
+    @classmethod
+    def from_config(cls, config: Any, **kwargs: Any) -> "RetryPolicy":
+        """从带重试字段的配置（LLMBackendConfig）创建."""
+        return cls(
+            retries=config.retry,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+            budget=RetryBudget(config.retry_budget_ratio, config.retry_budget_reserve),
+            **kwargs,
+        )
+
+    def next_delay(self, previous: float) -> float:
+        """去相关抖动：在 [基础间隔, 上次间隔 × 3] 内均匀取值，不超过上限."""
+        upper = max(self.base_delay, previous * 3)
+        return min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+
+    async def call(self, send: Callable[[], Awaitable[T]], label: str = "request") -> T:
+        """执行请求，按策略重试.
+
+        Args:
+            send: 发送一次请求的协程函数（每次重试重新调用）
+            label: 日志中的请求名称
+
+        Returns:
+            请求结果
+
+        Raises:
+            最后一次请求的异常（不可重试、次数用尽、预算耗尽或 Retry-After 过长）
+        """
+        self.budget.record_request()
+        delay = self.base_delay
+        attempt = 0
+        timeouts = 0
+        while True:
+            try:
+                return await send()
+            except Exception as exc:
+                kind, retry_after = classify_error(exc)
+                if kind is None or attempt >= self.retries:
+                    raise
+                if kind == "timeout":
+                    timeouts += 1
+                    if timeouts > self.timeout_retries:
+                        raise
+                    # 超时不是过载信号，短暂等待即可
+                    wait = self._rng.uniform(0, self.base_delay)
+                else:
+                    delay = self.next_delay(delay)
+                    wait = delay
+                    if retry_after is not None:
+                        if retry_after > self.max_retry_after:
+                            self.logger.warning(
+                                f"{label}: Retry-After {retry_after:.0f}s 超过上限 "
+                                f"{self.max_retry_after:.0f}s，放弃重试"
+                            )
+                            raise
+                        wait = max(wait, retry_after)
+                if kind == "status" and self.on_overload is not None:
+                    self.on_overload()
+                if not self.budget.try_spend():
+                    self.logger.warning(f"{label}: 重试预算耗尽，放弃重试（{exc!r}）")
+                    raise
+                attempt += 1
+                self.logger.warning(
+                    f"{label}: {_describe(exc)}，{wait:.2f}s 后第 {attempt}/{self.retries} 次重试"
+                )
+                await self._sleep(wait)
+
+
+def _describe(exc: BaseException) -> str:
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    if status:
+        return f"HTTP {status}"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "请求超时"
+    return type(exc).__name__
@@ -0,0 +1,156 @@
+"""流式响应解析 - SSE 增量解析 + 完整 JSON 对象到达即提前结束.
+
+非流式请求要等模型生成完所有 token、整个响应体下载完才能解析。分析子任务
+只需要一个 ``{"labels": [...], "confidence": x}`` 对象，模型在对象之后往往
+还会输出解释文字或收尾事件。流式模式（openai_compat 的 ``stream=true``、
+原生接口的 ``streamGenerateContent?alt=sse``）边接收边解析：第一个顶层 JSON
+对象闭合且能解析时立即返回，并关闭响应，放弃剩余的流，降低慢生成的尾延迟。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, Optional
+
+import aiohttp
+
+
+class JsonObjectScanner:
+    """增量扫描文本，找出第一个完整的顶层 JSON 对象.
+
+    跟踪括号深度和字符串 / 转义状态，每个字符只扫描一次；对象前的
+    代码块标记或说明文字被忽略。
+    """
+
+    def __init__(self):
+        self._buf: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+
+    def feed(self, text: str) -> Optional[str]:
+        """追加一段文本.
+
+        Args:
+            text: 新到达的文本片段
+
+        Returns:
+            顶层对象闭合时返回其完整文本，否则返回 None
+        """
+        for ch in text:
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = "".join(self._buf)
+                    try:
+                        json.loads(candidate)
+                    except json.JSONDecodeError:
+                        # 括号配平但不是合法 JSON（如 {labels} 之类的文字），继续找下一个对象
+                        self._buf.clear()
+                        self._started = False
+                        continue
+                    return candidate
+        return None
+
+
+async def iter_sse_data(resp: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """逐个产出 SSE 事件的 data 字段（多行 data 以换行拼接），遇到 [DONE] 结束."""
+    data_lines: list[str] = []
+    async for raw in resp.content:
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data.strip() == "[DONE]":
+                    return
+                yield data
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data.strip() != "[DONE]":
+            yield data
+
+
+def delta_text(event: Any, transport: str) -> str:
+    """提取一个流式事件中新增的文本.
+
+    Args:
+        event: 解析后的事件 JSON
+        transport: openai_compat | gemini_native
+
+    Returns:
+        新增文本（没有文本时为空字符串）
+    """
+    if not isinstance(event, dict):
+        return ""
+    if transport == "openai_compat":
+        choices = event.get("choices") or []
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+    cands = event.get("candidates") or []
+    if not cands:
+        return ""
+    parts = (cands[0].get("content") or {}).get("parts") or []
+    return "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+
+
+class StreamResult:
+    """流式读取结果."""
+
+    def __init__(self, text: str, events: int, early: bool):
+        self.text = text  # 完整 JSON 对象（提前结束时）或全部文本
+        self.events = events  # 收到的 SSE 事件数
+        self.early = early  # 是否在流结束前返回
+
+
+async def read_json_stream(resp: aiohttp.ClientResponse, transport: str) -> StreamResult:
+    """读取 SSE 流，第一个完整的顶层 JSON 对象到达即返回.
+
+    提前返回时关闭响应（连接不再复用），放弃剩余的流。
+
+    Args:
+        resp: 流式响应
+        transport: openai_compat | gemini_native
+
+    Returns:
+        StreamResult；流结束仍未出现完整对象时 text 为全部文本
+    """
+    scanner = JsonObjectScanner()
+    chunks: list[str] = []
+    events = 0
+    async for data in iter_sse_data(resp):
+        events += 1
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        text = delta_text(event, transport)
+        if not text:
+            continue
+        chunks.append(text)
+        complete = scanner.feed(text)
+        if complete is not None:
+            resp.close()
+            return StreamResult(complete, events, early=True)
+    return StreamResult("".join(chunks), events, early=False)
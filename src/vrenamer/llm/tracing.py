@@ -0,0 +1,236 @@
+"""请求追踪 - 分级的结构化 JSONL 追踪，默认关闭.
+
+此前客户端每次请求都 ``print`` URL、请求头、请求体和响应预览；为了脱敏，
+先 ``json.loads(json.dumps(body))`` 深拷贝整个请求体（包括几 MB 的 base64
+图片），调试输出的 CPU 开销比构建请求本身还大，而且生产环境也无法关闭。
+
+``Tracer`` 按级别输出：
+
+- ``off``（默认）：不记录，调用方只做一次属性判断；
+- ``spans``：每次 HTTP 请求（包括每次重试）写一条 span：排队等待（Key 池 +
+  连接池）、建连、上传字节数、首字节时间（TTFB）、总耗时、状态码；
+- ``debug``：另外写请求 / 响应事件（脱敏后的请求头和请求体、响应预览）。
+
+脱敏在输出时才进行（``redact``），只重建容器结构，base64 字符串替换为长度
+占位符，不拷贝、不序列化图片数据。所有记录按行写入 JSONL 文件。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from vrenamer.llm.body import EncodedImage
+
+TRACE_OFF = 0
+TRACE_SPANS = 1
+TRACE_DEBUG = 2
+TRACE_LEVELS = {"off": TRACE_OFF, "spans": TRACE_SPANS, "debug": TRACE_DEBUG}
+
+DEFAULT_TRACE_FILE = "logs/llm_trace.jsonl"
+PREVIEW_CHARS = 200  # 响应预览长度
+
+_BASE64_MARK = ";base64,"
+
+
+def redact(obj: Any) -> Any:
+    """返回适合写日志的视图：base64 图片替换为长度占位符.
+
+    只重建 dict / list 容器，字符串按引用保留；预编码的 ``EncodedImage``、
+    ``data:...;base64,`` URL 和 ``inline_data.data`` 只计算长度，不切片、不拷贝。
+    """
+    if isinstance(obj, EncodedImage):
+        placeholder = f"<BASE64_LENGTH:{len(obj)}>"
+        return f"data:{obj.mime_type};base64,{placeholder}" if obj.data_url else placeholder
+    if isinstance(obj, dict):
+        out = {}
+        for key, value in obj.items():
+            if (
+                key == "inline_data"
+                and isinstance(value, dict)
+                and isinstance(value.get("data"), (str, bytes))
+            ):
+                out[key] = {**value, "data": f"<BASE64_LENGTH:{len(value['data'])}>"}
+            else:
+                out[key] = redact(value)
+        return out
+    if isinstance(obj, list):
+        return [redact(item) for item in obj]
+    if isinstance(obj, str) and obj.startswith("data:"):
+        # 只在开头几十个字符里找标记，避免扫描整段 base64
+        idx = obj.find(_BASE64_MARK, 0, 128)
+        if idx >= 0:
+            return f"{obj[:idx]}{_BASE64_MARK}<BASE64_LENGTH:{len(obj) - idx - len(_BASE64_MARK)}>"
+    return obj
+
+
+def redact_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """请求头脱敏（隐藏 Authorization / API Key）."""
+    hidden = {"authorization", "x-goog-api-key", "api-key"}
+    return {k: ("***REDACTED***" if k.lower() in hidden else v) for k, v in headers.items()}
+
+
+class JsonlSink:
+    """按行追加写入的 JSONL 文件（首次写入时创建目录和文件）."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RequestSpan:
+    """一次 HTTP 请求的耗时分解（由传输层的 aiohttp 追踪钩子填充）."""
+
+    __slots__ = (
+        "_tracer",
+        "_clock",
+        "fields",
+        "started",
+        "request_started",
+        "queue",
+        "connect",
+        "upload_bytes",
+        "ttfb",
+        "reused",
+        "_marks",
+    )
+
+    def __init__(self, tracer: "Tracer", op: str, fields: Dict[str, Any]):
+        self._tracer = tracer
+        self._clock = tracer.clock
+        self.fields = {"op": op, **fields}
+        self.started = self._clock()
+        self.request_started: Optional[float] = None
+        self.queue = 0.0  # Key 池 + 连接池的排队时间（秒）
+        self.connect = 0.0  # 新建连接耗时（秒），复用连接时为 0
+        self.upload_bytes = 0
+        self.ttfb: Optional[float] = None  # 请求开始到收到响应头（秒）
+        self.reused = True
+        self._marks: Dict[str, float] = {}
+
+    def record_wait(self) -> None:
+        """把 span 开始至今的时间计入排队（分配到 Key 后调用）."""
+        self.queue += self._clock() - self.started
+
+    def begin(self, name: str) -> None:
+        """开始一个计时阶段."""
+        self._marks[name] = self._clock()
+
+    def end(self, name: str) -> float:
+        """结束计时阶段，返回其耗时（秒）."""
+        started = self._marks.pop(name, None)
+        return 0.0 if started is None else self._clock() - started
+
+    def finish(
+        self, status: Optional[int] = None, error: Optional[BaseException] = None, **fields: Any
+    ) -> None:
+        """写出 span 记录."""
+        record = {
+            "type": "span",
+            "ts": round(time.time(), 3),
+            **self.fields,
+            **fields,
+            "status": status,
+            "queue_ms": _ms(self.queue),
+            "connect_ms": _ms(self.connect),
+            "reused": self.reused,
+            "upload_bytes": self.upload_bytes,
+            "ttfb_ms": _ms(self.ttfb) if self.ttfb is not None else None,
+            "total_ms": _ms(self._clock() - self.started),
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        self._tracer.write(record)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class Tracer:
+    """分级的请求追踪器."""
+
+    def __init__(
+        self,
+        level: Union[str, int] = "off",
+        path: Union[str, Path, None] = DEFAULT_TRACE_FILE,
+        sink: Optional[Any] = None,
+        logger: Optional[logging.Logger] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """初始化追踪器.
+
+        Args:
+            level: off | spans | debug（或对应的整数级别）
+            path: JSONL 输出文件（未提供 sink 时使用）
+            sink: 记录输出目标（可选，需提供 write(record) / close()）
+            logger: 日志器（可选，写入失败时记录警告）
+            clock: 计时时钟（可选，测试时替换）
+
+        Raises:
+            ValueError: 未知的追踪级别
+        """
+        if isinstance(level, str):
+            if level.lower() not in TRACE_LEVELS:
+                raise ValueError(
+                    f"Unknown trace level: {level}. Must be one of {list(TRACE_LEVELS)}"
+                )
+            level = TRACE_LEVELS[level.lower()]
+        self.level = level
+        self.clock = clock
+        self.logger = logger or logging.getLogger(__name__)
+        if sink is None and level > TRACE_OFF and path:
+            sink = JsonlSink(path)
+        self.sink = sink
+        # 调用方只读这两个属性判断是否记录，关闭时没有其他开销
+        self.spans = level >= TRACE_SPANS and sink is not None
+        self.debug = level >= TRACE_DEBUG and sink is not None
+
+    @classmethod
+    def from_config(cls, config: Any, **kwargs: Any) -> "Tracer":
+        """从带追踪字段的配置（Settings / LLMBackendConfig）创建."""
+        return cls(
+            level=getattr(config, "llm_trace", "off"),
+            path=getattr(config, "llm_trace_file", DEFAULT_TRACE_FILE),
+            **kwargs,
+        )
+
+    def span(self, op: str, **fields: Any) -> Optional[RequestSpan]:
+        """开始一个请求 span；未开启 spans 级别时返回 None."""
+        if not self.spans:
+            return None
+        return RequestSpan(self, op, fields)
+
+    def event(self, op: str, name: str, **fields: Any) -> None:
+        """写一条调试事件（调用方应先判断 ``tracer.debug``，避免构建字段）."""
+        if not self.debug:
+            return
+        self.write(
+            {"type": "event", "ts": round(time.time(), 3), "op": op, "event": name, **fields}
+        )
+
+    def write(self, record: Dict[str, Any]) -> None:
+        try:
+            self.sink.write(record)
+        except Exception as e:  # 追踪失败不影响请求
+            self.logger.warning(f"写入追踪记录失败: {e}")
+
+    def close(self) -> None:
+        """关闭输出文件."""
+        if self.sink is not None:
+            self.sink.close()
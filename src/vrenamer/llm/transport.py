@@ -0,0 +1,245 @@
+"""HTTP 传输层 - 客户端持有的长连接 aiohttp 会话.
+
+此前每次 classify / generate 调用都新建一个 ``aiohttp.ClientSession``，
+64 个并发请求各自建立 TCP（以及可能的 TLS）连接，请求结束后连接随会话
+一起关闭，从不复用。``HttpTransport`` 在首次请求时创建一个会话，之后
+所有请求共享同一个连接池：
+
+- ``TCPConnector`` 的总连接数和单主机连接数可配置；
+- 空闲连接保持 keep-alive，后续请求直接复用；
+- DNS 解析结果缓存，避免每个请求都查询一次；
+- 通过 ``close()`` 或 ``async with`` 释放连接。
+
+追踪器开启 spans 级别时，会话额外注册 aiohttp 追踪钩子，把连接池排队、
+建连、上传字节数和首字节时间记入请求传入的 ``RequestSpan``
+（``trace_request_ctx``）；关闭时不注册。
+
+``post()`` 是所有 LLM 后端共用的单次请求：发送预编码的 ``JsonBody``、
+收尾 span、上报单次请求耗时（供自适应并发判断延迟突增）；后端只需提供
+请求头和响应读取函数，并把它包在 ``RetryPolicy.call`` 中。
+
+会话绑定创建它的事件循环；在新的事件循环中使用时（如 CLI 多次
+``asyncio.run``）自动重建。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from vrenamer.llm.body import JsonBody
+from vrenamer.llm.tracing import RequestSpan, Tracer
+
+T = TypeVar("T")
+
+# 连接池默认值（与 WebUI 默认并发 64 匹配）
+DEFAULT_POOL_LIMIT = 100
+DEFAULT_POOL_LIMIT_PER_HOST = 64
+DEFAULT_KEEPALIVE_TIMEOUT = 30.0  # 空闲连接保持时间（秒）
+DEFAULT_DNS_CACHE_TTL = 300  # DNS 缓存时间（秒）
+
+
+class HttpTransport:
+    """共享连接池的 aiohttp 会话."""
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_POOL_LIMIT,
+        limit_per_host: int = DEFAULT_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+        auto_decompress: bool = True,
+        logger: Optional[logging.Logger] = None,
+        tracer: Optional[Tracer] = None,
+    ):
+        """初始化传输层（会话延迟到首次请求时创建）.
+
+        Args:
+            limit: 连接池总连接数上限，0 表示不限
+            limit_per_host: 单个主机的连接数上限，0 表示不限
+            keepalive_timeout: 空闲连接保持时间（秒）
+            dns_cache_ttl: DNS 缓存时间（秒）
+            auto_decompress: 是否自动解压响应（GPT-Load 的 gzip 头有问题时关闭）
+            logger: 日志器（可选）
+            tracer: 请求追踪器（可选，默认关闭）
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.auto_decompress = auto_decompress
+        self.logger = logger or logging.getLogger(__name__)
+        self.tracer = tracer or Tracer()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 统计：请求数 / 新建连接数（二者之差即连接复用次数）
+        self.requests = 0
+        self.connections = 0
+
+    @classmethod
+    def from_config(cls, config: Any, **kwargs: Any) -> "HttpTransport":
+        """从带连接池字段的配置（LLMBackendConfig）创建."""
+        return cls(
+            limit=config.pool_limit,
+            limit_per_host=config.pool_limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            dns_cache_ttl=config.dns_cache_ttl,
+            **kwargs,
+        )
+
+    @property
+    def reused(self) -> int:
+        """复用已有连接的请求数."""
+        return max(0, self.requests - self.connections)
+
+    def session(self) -> aiohttp.ClientSession:
+        """返回共享会话（必须在事件循环中调用）."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                # 旧会话属于已结束的事件循环，无法再关闭，直接丢弃
+                self.logger.debug("事件循环已切换，重建 HTTP 会话")
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    async def post(
+        self,
+        url: str,
+        body: JsonBody,
+        headers: Dict[str, str],
+        timeout: aiohttp.ClientTimeout,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        op: str = "request",
+        span: Optional[RequestSpan] = None,
+        on_latency: Optional[Callable[[float], None]] = None,
+    ) -> T:
+        """发送一次 POST 请求（不重试，由调用方包在 ``RetryPolicy.call`` 中）.
+
+        Args:
+            url: 请求地址
+            body: 预编码的请求体（重试时复用，每次发送新建载荷）
+            headers: 请求头
+            timeout: 超时设置
+            read: 读取响应的协程函数（负责检查状态码并解析响应体）
+            op: 追踪记录中的操作名称
+            span: 请求 span（可选，由 ``tracer.span()`` 创建）
+            on_latency: 成功后上报本次请求耗时（秒）的回调（可选）
+
+        Returns:
+            read 的返回值
+        """
+        session = self.session()
+        status: Optional[int] = None
+        started = time.monotonic()
+        try:
+            async with session.post(
+                url, headers=headers, data=body.payload(), timeout=timeout, trace_request_ctx=span
+            ) as resp:
+                status = resp.status
+                if self.tracer.debug:
+                    self.tracer.event(
+                        op, "response_headers", status=resp.status, headers=dict(resp.headers)
+                    )
+                result = await read(resp)
+        except BaseException as exc:
+            if span is not None:
+                span.finish(status, error=exc)
+            raise
+        if span is not None:
+            span.finish(status)
+        if on_latency is not None:
+            on_latency(time.monotonic() - started)
+        return result
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(self._on_connection_create)
+        if self.tracer.spans:
+            trace.on_request_start.append(self._span_request_start)
+            trace.on_connection_queued_start.append(self._span_queued_start)
+            trace.on_connection_queued_end.append(self._span_queued_end)
+            trace.on_connection_create_start.append(self._span_connect_start)
+            trace.on_connection_create_end.append(self._span_connect_end)
+            trace.on_request_chunk_sent.append(self._span_chunk_sent)
+            trace.on_request_end.append(self._span_request_end)
+        return aiohttp.ClientSession(
+            connector=connector,
+            auto_decompress=self.auto_decompress,
+            trace_configs=[trace],
+        )
+
+    async def _on_request_start(self, session, ctx, params) -> None:
+        self.requests += 1
+
+    async def _on_connection_create(self, session, ctx, params) -> None:
+        self.connections += 1
+
+    # 以下钩子只在开启 spans 时注册；请求未传入 span（trace_request_ctx）时忽略
+
+    async def _span_request_start(self, session, ctx, params) -> None:
+        span = ctx.trace_request_ctx
+        if isinstance(span, RequestSpan):
+            span.request_started = span._clock()
+
+    async def _span_queued_start(self, session, ctx, params) -> None:
+        if isinstance(ctx.trace_request_ctx, RequestSpan):
+            ctx.trace_request_ctx.begin("queue")
+
+    async def _span_queued_end(self, session, ctx, params) -> None:
+        span = ctx.trace_request_ctx
+        if isinstance(span, RequestSpan):
+            span.queue += span.end("queue")
+
+    async def _span_connect_start(self, session, ctx, params) -> None:
+        if isinstance(ctx.trace_request_ctx, RequestSpan):
+            ctx.trace_request_ctx.begin("connect")
+
+    async def _span_connect_end(self, session, ctx, params) -> None:
+        span = ctx.trace_request_ctx
+        if isinstance(span, RequestSpan):
+            span.connect += span.end("connect")
+            span.reused = False
+
+    async def _span_chunk_sent(self, session, ctx, params) -> None:
+        span = ctx.trace_request_ctx
+        if isinstance(span, RequestSpan):
+            span.upload_bytes += len(params.chunk)
+
+    async def _span_request_end(self, session, ctx, params) -> None:
+        span = ctx.trace_request_ctx
+        if isinstance(span, RequestSpan) and span.request_started is not None:
+            span.ttfb = span._clock() - span.request_started
+
+    async def close(self) -> None:
+        """关闭会话并释放所有连接."""
+        session, self._session = self._session, None
+        if session is None or session.closed:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            # 会话属于已结束的事件循环，无法在当前循环中关闭
+            return
+        await session.close()
+        if self.requests:
+            self.logger.debug(
+                f"HTTP 会话关闭: {self.requests} 次请求，新建 {self.connections} 个连接，"
+                f"复用 {self.reused} 次"
+            )
+
+    async def __aenter__(self) -> "HttpTransport":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import random
 from collections import Counter
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional
@@ -13,10 +12,23 @@ import yaml
 
 from vrenamer.core.config import AppConfig
 from vrenamer.core.exceptions import APIError, ConfigError
-from vrenamer.core.types import FrameSampleResult
+from vrenamer.core.types import FrameLike, FrameSampleResult
 from vrenamer.llm.base import BaseLLMClient
 from vrenamer.llm.json_utils import parse_json_loose
+from vrenamer.llm.limiter import AdaptiveLimiter
 from vrenamer.llm.prompts import PromptLoader
+from vrenamer.services.batching import BatchPlanner
+from vrenamer.services.contact_sheet import contact_sheet_hint, tile_frames_async
+from vrenamer.services.frame_encoding import FrameEncoder, FrameProfile, load_frame_profiles
+from vrenamer.services.merged_analysis import (
+    MERGED_MAX_TOKENS,
+    MERGED_TASK_KEY,
+    MergedOptions,
+    build_merged_prompt,
+    load_merged_options,
+    merged_task_results,
+    split_merged_response,
+)
 
 
 class AnalysisService:
@@ -47,8 +59,22 @@ class AnalysisService:
         # 第一层并发：控制子任务并发数
         self.task_semaphore = asyncio.Semaphore(config.concurrency.task_concurrency)
 
-        # 第二层并发：控制每个子任务内的批次并发数
-        self.batch_semaphore = asyncio.Semaphore(config.concurrency.batch_concurrency)
+        # 第二层并发：所有子任务的批次请求共享一个自适应并发限制器
+        concurrency = config.concurrency
+        if concurrency.adaptive:
+            self.batch_limiter = AdaptiveLimiter(
+                initial=concurrency.batch_concurrency,
+                min_limit=concurrency.batch_concurrency_min,
+                max_limit=concurrency.batch_concurrency_max,
+                logger=logger,
+            )
+        else:
+            self.batch_limiter = AdaptiveLimiter.fixed(concurrency.batch_concurrency)
+        # 被重试吸收的 429 / 5xx 同样通知限制器下调；延迟按单次 HTTP 请求上报
+        retry_policy = getattr(llm_client, "retry_policy", None)
+        if retry_policy is not None:
+            retry_policy.on_overload = self.batch_limiter.record_overload
+            retry_policy.on_latency = self.batch_limiter.record_latency
 
     async def analyze_video(
         self,
@@ -69,13 +95,28 @@ class AnalysisService:
         self.logger.info(f"开始分析视频，共 {len(frames)} 帧")
 
         # 加载子任务配置
-        tasks_config = self._load_tasks_config()
+        tasks_file = self._load_tasks_file()
+        tasks_config = tasks_file["tasks"]
+        frame_profiles = load_frame_profiles(tasks_file)
+        merged = load_merged_options(tasks_file)
         self.logger.info(f"加载了 {len(tasks_config)} 个分析任务")
 
-        # 第一层并发：并发执行所有子任务
-        task_results = await self._execute_tasks_concurrent(
-            frames=frames, tasks_config=tasks_config, progress_callback=progress_callback
-        )
+        if merged:
+            # 合并模式：一个请求同时回答所有子任务
+            task_results = await self._execute_tasks_merged(
+                frames=frames,
+                tasks_config=tasks_config,
+                progress_callback=progress_callback,
+                merged=merged,
+            )
+        else:
+            # 第一层并发：并发执行所有子任务
+            task_results = await self._execute_tasks_concurrent(
+                frames=frames,
+                tasks_config=tasks_config,
+                progress_callback=progress_callback,
+                frame_profiles=frame_profiles,
+            )
 
         # 汇总结果
         final_result = self._aggregate_task_results(task_results)
@@ -84,55 +125,165 @@ class AnalysisService:
         if transcript:
             final_result["transcript"] = transcript
 
+        self.logger.info(self.batch_limiter.summary())
         self.logger.info("视频分析完成")
         return final_result
 
     async def _execute_tasks_concurrent(
         self,
-        frames: List[Path],
+        frames: List[FrameLike],
         tasks_config: Dict[str, Any],
         progress_callback: Optional[Callable],
+        frame_profiles: Optional[Dict[str, FrameProfile]] = None,
     ) -> Dict[str, Any]:
         """第一层并发：并发执行所有子任务."""
+        enabled = {
+            task_id: task_cfg
+            for task_id, task_cfg in tasks_config.items()
+            if task_cfg.get("enabled", True)
+        }
+
+        # 按任务的帧编码档位预先编码，每个档位每帧只编码一次
+        frame_profiles = frame_profiles or {}
+        profile_of = {task_id: frame_profiles.get(task_id, FrameProfile()) for task_id in enabled}
+        encoded = await FrameEncoder(self.logger).prepare(frames, list(profile_of.values()))
+
+        # 所有子任务共享一个批次规划器：确定性分批，每帧的 base64 载荷只编码一次
+        planner = BatchPlanner(frames, self.config.analysis.batch_seed)
 
         async def _execute_one_task(task_id: str, task_cfg: Dict[str, Any]):
             async with self.task_semaphore:
                 return await self._execute_single_task(
                     task_id=task_id,
                     task_cfg=task_cfg,
-                    frames=frames,
+                    frames=encoded[profile_of[task_id]],
                     progress_callback=progress_callback,
+                    planner=planner,
                 )
 
         # 创建所有子任务
-        tasks = [
-            _execute_one_task(task_id, task_cfg)
-            for task_id, task_cfg in tasks_config.items()
-            if task_cfg.get("enabled", True)
-        ]
+        tasks = [_execute_one_task(task_id, task_cfg) for task_id, task_cfg in enabled.items()]
 
         # 并发执行
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        if planner.stats.uses:
+            self.logger.info(planner.stats.summary())
 
         # 组装结果
-        task_ids = [
-            task_id
-            for task_id, task_cfg in tasks_config.items()
-            if task_cfg.get("enabled", True)
-        ]
-
         return {
             task_id: result
-            for task_id, result in zip(task_ids, results)
+            for task_id, result in zip(enabled, results)
             if not isinstance(result, Exception)
         }
 
+    async def _execute_tasks_merged(
+        self,
+        frames: List[FrameLike],
+        tasks_config: Dict[str, Any],
+        progress_callback: Optional[Callable],
+        merged: MergedOptions,
+    ) -> Dict[str, Any]:
+        """合并模式：每批帧只发送一次，组合提示词同时回答所有子任务.
+
+        Args:
+            frames: 所有可用帧
+            tasks_config: 子任务配置
+            progress_callback: 进度回调
+            merged: 合并模式配置
+
+        Returns:
+            各子任务的分析结果（格式与逐任务模式一致）
+        """
+        task_ids = [
+            task_id for task_id, task_cfg in tasks_config.items() if task_cfg.get("enabled", True)
+        ]
+        prompt = build_merged_prompt(
+            {task_id: self._load_prompt(task_id, tasks_config[task_id]) for task_id in task_ids}
+        )
+
+        encoded = await FrameEncoder(self.logger).prepare(frames, [merged.frame_profile])
+        frames = encoded[merged.frame_profile]
+
+        batch_size = merged.batch_size or self.config.analysis.batch_size
+        grid = self.config.analysis.contact_sheet_grid
+        frames_per_batch = batch_size * grid * grid if grid else batch_size
+        planner = BatchPlanner(frames, self.config.analysis.batch_seed)
+        batches = planner.plan(frames, frames_per_batch, MERGED_TASK_KEY)
+        if not grid:
+            batches = planner.attach_payloads(batches)
+
+        self.logger.info(
+            f"合并模式: {len(task_ids)} 个子任务共用 {len(batches)} 个请求 "
+            f"({len(frames)} 帧，每批 {frames_per_batch} 帧)"
+        )
+
+        async def _execute_one_batch(batch_idx: int, batch_frames: List[FrameLike]):
+            try:
+                async with self.batch_limiter.slot():
+                    response = await self._classify_batch(
+                        prompt, batch_frames, max_tokens=MERGED_MAX_TOKENS
+                    )
+                result = split_merged_response(parse_json_loose(response), task_ids)
+            except Exception as e:
+                self.logger.error(f"合并请求批次 {batch_idx} 失败: {e}")
+                if progress_callback:
+                    for task_id in task_ids:
+                        progress_callback(
+                            task_id, "error", {"batch_idx": batch_idx, "error": str(e)}
+                        )
+                return {}
+
+            if progress_callback:
+                for task_id in task_ids:
+                    progress_callback(
+                        task_id,
+                        "batch_done",
+                        {
+                            "batch_idx": batch_idx,
+                            "total_batches": len(batches),
+                            "labels": result[task_id]["labels"],
+                        },
+                    )
+            return result
+
+        batch_results = await asyncio.gather(
+            *[_execute_one_batch(i, batch) for i, batch in enumerate(batches)]
+        )
+        if planner.stats.uses:
+            self.logger.info(planner.stats.summary())
+
+        # 按子任务沿用逐批标签频率汇总
+        task_results = {}
+        for task_id, results in merged_task_results(batch_results, task_ids).items():
+            task_results[task_id] = {
+                "labels": self._aggregate_batch_results(results),
+                "num_batches": len(batches),
+                "num_frames": len(frames),
+            }
+            self.logger.info(f"任务 {task_id} 完成: {task_results[task_id]['labels']}")
+        return task_results
+
+    async def _classify_batch(
+        self, prompt: str, batch_frames: List[FrameLike], max_tokens: int = 512
+    ) -> str:
+        """发送一个批次；拼图模式下先按时间顺序拼成带编号的宫格图."""
+        grid = self.config.analysis.contact_sheet_grid
+        if grid:
+            batch_frames = await tile_frames_async(
+                batch_frames, grid, self.config.analysis.contact_sheet_tile, self.logger
+            )
+            prompt += contact_sheet_hint(grid)
+        return await self.llm.classify(
+            prompt=prompt, images=batch_frames, response_format="json", max_tokens=max_tokens
+        )
+
     async def _execute_single_task(
         self,
         task_id: str,
         task_cfg: Dict[str, Any],
         frames: List[Path],
         progress_callback: Optional[Callable],
+        planner: Optional[BatchPlanner] = None,
     ) -> Dict[str, Any]:
         """执行单个子任务（第二层并发）.
 
@@ -141,25 +292,26 @@ class AnalysisService:
             task_cfg: 任务配置
             frames: 所有可用帧
             progress_callback: 进度回调
+            planner: 共享的批次规划器（可选，未提供时按本任务的帧新建）
 
         Returns:
             该任务的分析结果
         """
         self.logger.info(f"开始执行任务: {task_id}")
 
-        # 随机打乱帧顺序（每个子任务独立打乱）
-        shuffled_frames = frames.copy()
-        random.shuffle(shuffled_frames)
-
-        # 分批：每批 batch_size 帧（默认 5 帧，Gemini 限制）
+        # 分批：每批 batch_size 张图片（Free Tier 限制）；拼图模式下每张图含 N×N 帧
         batch_size = task_cfg.get("batch_size", self.config.analysis.batch_size)
-        batches = [
-            shuffled_frames[i : i + batch_size]
-            for i in range(0, len(shuffled_frames), batch_size)
-        ]
+        grid = self.config.analysis.contact_sheet_grid
+        frames_per_batch = batch_size * grid * grid if grid else batch_size
+        # 按种子确定性打乱（每个子任务的顺序不同），逐帧发送时预先附带 base64 载荷
+        planner = planner or BatchPlanner(frames, self.config.analysis.batch_seed)
+        batches = planner.plan(frames, frames_per_batch, task_id)
+        if not grid:
+            batches = planner.attach_payloads(batches)
 
         self.logger.info(
-            f"任务 {task_id}: {len(frames)} 帧 → {len(batches)} 批次 (每批 {batch_size} 帧)"
+            f"任务 {task_id}: {len(frames)} 帧 → {len(batches)} 批次 (每批 {frames_per_batch} 帧"
+            + (f"，拼成 {grid}×{grid} 宫格图)" if grid else ")")
         )
 
         # 第二层并发：并发执行所有批次
@@ -185,60 +337,56 @@ class AnalysisService:
         self,
         task_id: str,
         task_cfg: Dict[str, Any],
-        batches: List[List[Path]],
+        batches: List[List[FrameLike]],
         progress_callback: Optional[Callable],
     ) -> List[Dict[str, Any]]:
         """第二层并发：并发执行一个子任务的所有批次."""
 
-        async def _execute_one_batch(batch_idx: int, batch_frames: List[Path]):
-            async with self.batch_semaphore:
-                try:
-                    # 加载提示词
-                    prompt = self._load_prompt(task_id, task_cfg)
-
-                    # 调用 LLM
-                    response = await self.llm.classify(
-                        prompt=prompt, images=batch_frames, response_format="json"
+        async def _execute_one_batch(batch_idx: int, batch_frames: List[FrameLike]):
+            try:
+                # 加载提示词
+                prompt = self._load_prompt(task_id, task_cfg)
+
+                # 调用 LLM（拼图模式下按时间顺序拼成带编号的宫格图）
+                async with self.batch_limiter.slot():
+                    response = await self._classify_batch(prompt, batch_frames)
+
+                # 解析结果
+                parsed = parse_json_loose(response)
+                if not parsed:
+                    self.logger.warning(f"任务 {task_id} 批次 {batch_idx} 解析失败，返回空结果")
+                    return {"labels": [], "confidence": 0.0}
+
+                # 提取标签
+                if isinstance(parsed, dict):
+                    labels = parsed.get("labels", [])
+                    confidence = parsed.get("confidence", 0.0)
+                else:
+                    labels = []
+                    confidence = 0.0
+
+                if progress_callback:
+                    progress_callback(
+                        task_id,
+                        "batch_done",
+                        {
+                            "batch_idx": batch_idx,
+                            "total_batches": len(batches),
+                            "labels": labels,
+                        },
                     )
 
-                    # 解析结果
-                    parsed = parse_json_loose(response)
-                    if not parsed:
-                        self.logger.warning(
-                            f"任务 {task_id} 批次 {batch_idx} 解析失败，返回空结果"
-                        )
-                        return {"labels": [], "confidence": 0.0}
-
-                    # 提取标签
-                    if isinstance(parsed, dict):
-                        labels = parsed.get("labels", [])
-                        confidence = parsed.get("confidence", 0.0)
-                    else:
-                        labels = []
-                        confidence = 0.0
+                return {"labels": labels, "confidence": confidence}
 
-                    if progress_callback:
-                        progress_callback(
-                            task_id,
-                            "batch_done",
-                            {
-                                "batch_idx": batch_idx,
-                                "total_batches": len(batches),
-                                "labels": labels,
-                            },
-                        )
-
-                    return {"labels": labels, "confidence": confidence}
-
-                except Exception as e:
-                    self.logger.error(f"批次 {batch_idx} of task {task_id} 失败: {e}")
-                    if progress_callback:
-                        progress_callback(
-                            task_id,
-                            "error",
-                            {"batch_idx": batch_idx, "error": str(e)},
-                        )
-                    return {"labels": [], "confidence": 0.0, "error": str(e)}
+            except Exception as e:
+                self.logger.error(f"批次 {batch_idx} of task {task_id} 失败: {e}")
+                if progress_callback:
+                    progress_callback(
+                        task_id,
+                        "error",
+                        {"batch_idx": batch_idx, "error": str(e)},
+                    )
+                return {"labels": [], "confidence": 0.0, "error": str(e)}
 
         # 并发执行所有批次
         results = await asyncio.gather(
@@ -285,11 +433,11 @@ class AnalysisService:
             for task_id, result in task_results.items()
         }
 
-    def _load_tasks_config(self) -> Dict[str, Any]:
-        """从配置文件加载子任务定义.
+    def _load_tasks_file(self) -> Dict[str, Any]:
+        """加载完整的子任务配置文件（任务定义、帧编码档位等）.
 
         Returns:
-            任务配置字典
+            配置文件内容
 
         Raises:
             ConfigError: 配置文件不存在或格式错误
@@ -306,7 +454,7 @@ class AnalysisService:
             if not isinstance(config, dict) or "tasks" not in config:
                 raise ConfigError(f"Invalid tasks config format in {config_path}")
 
-            return config["tasks"]
+            return config
         except yaml.YAMLError as e:
             raise ConfigError(f"Failed to parse YAML in {config_path}: {e}")
         except Exception as e:
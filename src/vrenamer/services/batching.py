@@ -0,0 +1,141 @@
+"""批次规划 - 共享帧池的确定性分批与请求载荷缓存.
+
+此前每个子任务各自 ``random.shuffle`` 后再切批，同一帧的 base64 在每个
+任务的请求里都要重新编码一次，两次运行的批次也不一样，无法复现。
+
+``BatchPlanner`` 为同一视频的所有子任务服务：
+
+- 分批使用确定性随机数：种子默认由帧内容生成（同一视频每次得到相同的
+  批次），也可以显式指定；每个子任务在种子上叠加任务 ID，不同任务的
+  批次仍然不同，保留原来的多样性。
+- 每帧的 base64 载荷只编码一次（ASCII 字节），写入 ``Frame.payload``，所有任务、所有
+  批次的请求按引用拼入请求体；统计节省的编码耗时和实际发送的载荷字节。
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from vrenamer.core.types import Frame, FrameLike
+
+# 生成内容种子时每帧参与哈希的字节数（JPEG 头部 + 部分扫描数据已足够区分）
+_SEED_SAMPLE_BYTES = 4096
+
+
+def content_seed(frames: Sequence[FrameLike]) -> int:
+    """由帧内容生成 64 位种子（同一组帧总是得到同一个种子）."""
+    digest = hashlib.blake2b(digest_size=8)
+    for frame in frames:
+        if isinstance(frame, Frame):
+            digest.update(frame.data[:_SEED_SAMPLE_BYTES])
+        else:
+            digest.update(str(frame).encode("utf-8"))
+    return int.from_bytes(digest.digest(), "big")
+
+
+@dataclass
+class BatchPlanStats:
+    """载荷编码统计."""
+
+    frames: int = 0  # 编码过载荷的不同帧数
+    uses: int = 0  # 所有请求中帧出现的总次数
+    encoded_bytes: int = 0  # 不同帧的 base64 载荷总字节
+    payload_bytes: int = 0  # 所有请求实际发送的 base64 载荷总字节
+    encode_seconds: float = 0.0
+
+    @property
+    def reused(self) -> int:
+        return self.uses - self.frames
+
+    @property
+    def saved_seconds(self) -> float:
+        """复用载荷节省的编码耗时（按平均每帧编码耗时估算）."""
+        if not self.frames:
+            return 0.0
+        return self.encode_seconds / self.frames * self.reused
+
+    def summary(self) -> str:
+        return (
+            f"载荷缓存: {self.frames} 帧编码一次，复用 {self.reused} 次；"
+            f"编码 {self.encoded_bytes / 1024:.0f} KB，发送 {self.payload_bytes / 1024:.0f} KB；"
+            f"编码耗时 {self.encode_seconds * 1000:.1f}ms，节省约 {self.saved_seconds * 1000:.1f}ms"
+        )
+
+
+class BatchPlanner:
+    """同一视频所有子任务共享的批次规划器."""
+
+    def __init__(self, frames: Sequence[FrameLike], seed: Optional[int] = None):
+        """初始化规划器.
+
+        Args:
+            frames: 该视频的全部候选帧（用于生成内容种子）
+            seed: 分批随机种子；None 表示由帧内容生成
+        """
+        self.seed = content_seed(frames) if seed is None else seed
+        self.stats = BatchPlanStats()
+        self._sizes: Dict[Frame, int] = {}
+        self._paths: Dict[Path, Frame] = {}
+
+    def rng(self, key: str) -> random.Random:
+        """返回某个子任务（或分配阶段）专用的确定性随机数生成器."""
+        return random.Random(f"{self.seed}:{key}")
+
+    def plan(self, frames: Sequence[FrameLike], per_batch: int, key: str) -> List[List[FrameLike]]:
+        """确定性打乱后按 per_batch 切批.
+
+        Args:
+            frames: 子任务可用的帧
+            per_batch: 每批帧数
+            key: 子任务 ID（参与种子，不同任务批次不同）
+
+        Returns:
+            批次列表
+        """
+        ordered = list(frames)
+        self.rng(key).shuffle(ordered)
+        per_batch = max(1, per_batch)
+        return [ordered[i : i + per_batch] for i in range(0, len(ordered), per_batch)]
+
+    def attach_payloads(self, batches: Sequence[Sequence[FrameLike]]) -> List[List[FrameLike]]:
+        """为批次中的帧准备 base64 载荷，每帧只编码一次.
+
+        磁盘帧（Path）读入后转换为内存帧，以便缓存载荷。
+
+        Args:
+            batches: 即将发送的批次
+
+        Returns:
+            帧已附带载荷的批次
+        """
+        prepared: List[List[FrameLike]] = []
+        for batch in batches:
+            items: List[FrameLike] = []
+            for frame in batch:
+                if isinstance(frame, Path):
+                    frame = self._load_path(frame)
+                if frame not in self._sizes:
+                    started = time.perf_counter()
+                    if frame.payload is None:
+                        frame.payload = base64.b64encode(frame.data)
+                    self.stats.encode_seconds += time.perf_counter() - started
+                    self._sizes[frame] = len(frame.payload)
+                    self.stats.frames += 1
+                    self.stats.encoded_bytes += len(frame.payload)
+                self.stats.uses += 1
+                self.stats.payload_bytes += self._sizes[frame]
+                items.append(frame)
+            prepared.append(items)
+        return prepared
+
+    def _load_path(self, path: Path) -> Frame:
+        # 同一路径只读取一次，保证多个任务拿到同一个 Frame 对象
+        if path not in self._paths:
+            self._paths[path] = Frame(index=len(self._paths) + 1, data=path.read_bytes(), path=path)
+        return self._paths[path]
@@ -0,0 +1,164 @@
+"""拼图模式 - 把多帧缩小后拼成一张带编号的宫格图.
+
+Free Tier 每个请求的图片数量有上限（batch_size_max = 50）。开启拼图后，
+每 N×N 帧按时间顺序拼成一张图，左上角标注 1..N² 编号，一个请求即可覆盖
+4-9 倍的帧数，图片分片数和请求数相应减少。
+
+拼图在线程中生成，不阻塞事件循环。Pillow 是可选依赖，未安装时原样
+返回单帧。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from typing import Any, List, Optional, Sequence
+
+from vrenamer.core.types import Frame, FrameLike
+
+# 单格长边像素
+DEFAULT_TILE_EDGE = 320
+
+# 允许的宫格边长（2×2 ~ 4×4）
+MIN_GRID = 2
+MAX_GRID = 4
+
+# 拼图 JPEG 质量
+SHEET_QUALITY = 85
+
+logger = logging.getLogger(__name__)
+
+
+def contact_sheet_hint(grid: int) -> str:
+    """拼图模式下追加到提示词末尾的说明."""
+    return (
+        f"\n\n注意：每张图片是由最多 {grid * grid} 个视频帧拼成的 {grid}×{grid} 宫格图，"
+        "每格左上角的编号表示时间顺序（从左到右、从上到下）。"
+        "请把所有格子当作同一视频的不同画面综合判断。"
+    )
+
+
+def _time_order(frames: Sequence[FrameLike]) -> List[FrameLike]:
+    """按时间戳排序；无时间戳（磁盘帧）保持原有顺序."""
+    indexed = list(enumerate(frames))
+
+    def _key(item):
+        pos, frame = item
+        timestamp = getattr(frame, "timestamp", None)
+        return (timestamp is None, timestamp or 0.0, pos)
+
+    return [frame for _, frame in sorted(indexed, key=_key)]
+
+
+def build_contact_sheet(
+    frames: Sequence[FrameLike],
+    grid: int,
+    tile_edge: int = DEFAULT_TILE_EDGE,
+    quality: int = SHEET_QUALITY,
+) -> Frame:
+    """把一组帧拼成一张带编号的宫格图.
+
+    Args:
+        frames: 帧列表（最多 grid² 个，按给定顺序编号）
+        grid: 宫格列数
+        tile_edge: 单格长边像素
+        quality: JPEG 质量
+
+    Returns:
+        拼图帧（索引和时间戳取第一帧）
+
+    Raises:
+        ImportError: 未安装 Pillow
+        ValueError: 帧数量为空或超过 grid²
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    if not frames or len(frames) > grid * grid:
+        raise ValueError(f"拼图帧数必须在 1-{grid * grid} 之间: {len(frames)}")
+
+    tiles = []
+    for frame in frames:
+        img = Image.open(io.BytesIO(frame.read_bytes()))
+        img.draft("RGB", (tile_edge, tile_edge))
+        img = img.convert("RGB")
+        img.thumbnail((tile_edge, tile_edge), Image.BILINEAR)
+        tiles.append(img)
+
+    cell_w = max(t.width for t in tiles)
+    cell_h = max(t.height for t in tiles)
+    cols = min(grid, len(tiles))
+    rows = -(-len(tiles) // grid)
+    sheet = Image.new("RGB", (cell_w * cols, cell_h * rows))
+    draw = ImageDraw.Draw(sheet)
+    try:
+        font = ImageFont.load_default(size=max(12, tile_edge // 12))
+    except TypeError:  # Pillow < 10.1 不支持 size
+        font = ImageFont.load_default()
+
+    for number, tile in enumerate(tiles, 1):
+        row, col = divmod(number - 1, grid)
+        x = col * cell_w + (cell_w - tile.width) // 2
+        y = row * cell_h + (cell_h - tile.height) // 2
+        sheet.paste(tile, (x, y))
+        label = str(number)
+        left, top, right, bottom = draw.textbbox((x + 4, y + 4), label, font=font)
+        draw.rectangle((left - 3, top - 3, right + 3, bottom + 3), fill=(0, 0, 0))
+        draw.text((x + 4, y + 4), label, fill=(255, 255, 0), font=font)
+
+    buf = io.BytesIO()
+    sheet.save(buf, format="JPEG", quality=quality)
+    first = frames[0]
+    return Frame(
+        index=getattr(first, "index", 0),
+        data=buf.getvalue(),
+        timestamp=getattr(first, "timestamp", None),
+    )
+
+
+def tile_frames(
+    frames: Sequence[FrameLike],
+    grid: int,
+    tile_edge: int = DEFAULT_TILE_EDGE,
+    log: Optional[Any] = None,
+) -> List[FrameLike]:
+    """按时间顺序每 grid² 帧拼成一张图.
+
+    只剩一帧的分组原样保留；未安装 Pillow 或拼图失败时返回原始帧。
+
+    Args:
+        frames: 一个请求要发送的全部帧
+        grid: 宫格列数
+        tile_edge: 单格长边像素
+        log: 日志器（可选）
+
+    Returns:
+        拼图列表（顺序与时间顺序一致）
+    """
+    log = log or logger
+    per_sheet = grid * grid
+    ordered = _time_order(frames)
+    sheets: List[FrameLike] = []
+    try:
+        for start in range(0, len(ordered), per_sheet):
+            group = ordered[start : start + per_sheet]
+            sheets.append(
+                group[0] if len(group) == 1 else build_contact_sheet(group, grid, tile_edge)
+            )
+    except ImportError:
+        log.warning("Pillow 未安装，拼图模式不生效，逐帧发送")
+        return list(frames)
+    except Exception as e:
+        log.warning(f"拼图失败: {e}，逐帧发送")
+        return list(frames)
+    return sheets
+
+
+async def tile_frames_async(
+    frames: Sequence[FrameLike],
+    grid: int,
+    tile_edge: int = DEFAULT_TILE_EDGE,
+    log: Optional[Any] = None,
+) -> List[FrameLike]:
+    """在线程中拼图，避免阻塞事件循环."""
+    return await asyncio.to_thread(tile_frames, frames, grid, tile_edge, log)
@@ -0,0 +1,386 @@
+"""帧去重 - MD5 完全相同 + pHash 内容相似.
+
+已保留帧的 64 位 pHash 存放在 uint64 数组中，新帧与全部已保留帧的
+汉明距离由一次向量化 popcount 计算得出，不再逐个把十六进制字符串
+解析回哈希对象比较。分段并行抽帧产生数千候选帧时，去重不再是 O(n²)
+的 Python 循环。
+
+MD5 / pHash 的计算（每帧一次 JPEG 解码）可以分块交给进程池，
+相似度过滤仍在主进程按时间顺序执行，结果与串行计算一致。
+
+若 ffmpeg 同时输出了 32×32 灰度缩略图（``Frame.gray``），pHash 直接对
+(N, 32, 32) 数组做一次批量 DCT 得出，完全不需要解码 JPEG，也不需要 Pillow。
+
+imagehash / Pillow 属于 image 可选依赖（numpy 随 imagehash 安装）；
+未安装 imagehash 时仅做 MD5 去重，未安装 numpy 时退回纯 Python 计算。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from vrenamer.core.types import Frame
+from vrenamer.services.extractor import GRAY_SIZE, cpu_count
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 随 imagehash 安装
+    np = None
+
+# 汉明距离不超过该值认为内容相似
+PHASH_THRESHOLD = 5
+
+# pHash 取 DCT 左上角 8×8 低频系数
+_PHASH_SIZE = 8
+
+if np is not None:
+    if not hasattr(np, "bitwise_count"):
+        # numpy < 2.0 没有 bitwise_count，按字节查表
+        _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    # DCT-II 基矩阵的前 8 行（与 scipy.fftpack.dct 默认归一化一致）
+    _n = np.arange(GRAY_SIZE)
+    _DCT_LOW = 2 * np.cos(np.pi * np.arange(_PHASH_SIZE)[:, None] * (2 * _n + 1) / (2 * GRAY_SIZE))
+
+
+def phash_available() -> bool:
+    """是否可以计算 pHash（需要 imagehash 和 Pillow）."""
+    try:
+        import imagehash  # noqa: F401
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def phash_int(data: bytes) -> int:
+    """计算图片字节的 64 位 pHash，以整数表示."""
+    import imagehash
+    from PIL import Image
+
+    return int(str(imagehash.phash(Image.open(io.BytesIO(data)))), 16)
+
+
+def phash_from_gray(grays: Sequence[bytes]) -> List[int]:
+    """由 32×32 灰度缩略图批量计算 64 位 pHash（算法与 imagehash.phash 一致）.
+
+    Args:
+        grays: 每帧 1024 字节的灰度像素
+
+    Returns:
+        与输入顺序一致的 pHash 整数列表
+    """
+    pixels = np.frombuffer(b"".join(grays), dtype=np.uint8)
+    pixels = pixels.reshape(-1, GRAY_SIZE, GRAY_SIZE).astype(np.float64)
+    # 二维 DCT 只算低频部分：C · X · Cᵀ → (N, 8, 8)
+    low = (_DCT_LOW @ pixels @ _DCT_LOW.T).reshape(len(grays), -1)
+    bits = low > np.median(low, axis=1, keepdims=True)
+    return [int.from_bytes(row.tobytes(), "big") for row in np.packbits(bits, axis=1)]
+
+
+def _gray_hashes(frames: Sequence[Frame]) -> Optional[List["FrameHash"]]:
+    """所有帧都带灰度缩略图时，批量计算哈希；否则返回 None."""
+    if np is None or not frames or any(f.gray is None for f in frames):
+        return None
+    values = phash_from_gray([f.gray for f in frames])
+    return [(hashlib.md5(f.data).digest(), value) for f, value in zip(frames, values)]
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class HammingIndex:
+    """64 位哈希的汉明距离索引（uint64 数组 + 向量化 popcount）."""
+
+    def __init__(self, capacity: int = 256):
+        self._size = 0
+        if np is not None:
+            self._hashes = np.zeros(max(1, capacity), dtype=np.uint64)
+        else:
+            self._hashes = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int) -> None:
+        """加入一个哈希."""
+        if np is None:
+            self._hashes.append(value)
+            self._size += 1
+            return
+        if self._size == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[self._size] = value
+        self._size += 1
+
+    def min_distance(self, value: int) -> Optional[int]:
+        """与索引中所有哈希的最小汉明距离，索引为空时返回 None."""
+        if not self._size:
+            return None
+        if np is None:
+            return min(bin(value ^ h).count("1") for h in self._hashes)
+        distances = _popcount(self._hashes[: self._size] ^ np.uint64(value))
+        return int(distances.min())
+
+    def contains_within(self, value: int, threshold: int) -> bool:
+        """是否存在汉明距离不超过 threshold 的哈希."""
+        distance = self.min_distance(value)
+        return distance is not None and distance <= threshold
+
+
+@dataclass
+class DedupStats:
+    """去重统计."""
+
+    total: int = 0
+    kept: int = 0
+    exact: int = 0  # MD5 完全相同
+    similar: int = 0  # pHash 相似
+    failed: int = 0  # pHash 计算失败（按 MD5 保留）
+    seconds: float = 0.0
+    use_phash: bool = True
+    from_gray: bool = False  # pHash 来自 ffmpeg 灰度缩略图（未解码 JPEG）
+
+    @property
+    def removed(self) -> int:
+        return self.exact + self.similar
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.total / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        algo = f"MD5 + pHash (汉明距离 ≤ {PHASH_THRESHOLD})" if self.use_phash else "MD5"
+        if self.from_gray:
+            algo += "，灰度缩略图"
+        text = (
+            f"去重结果 [{algo}]: 原始 {self.total} 帧 → 保留 {self.kept} 帧 "
+            f"(完全相同 {self.exact}，相似 {self.similar})，"
+            f"耗时 {self.seconds:.3f}s ({self.frames_per_second:.0f} 帧/秒)"
+        )
+        if self.failed:
+            text += f"，{self.failed} 帧 pHash 计算失败"
+        return text
+
+
+# 哈希结果：(MD5 摘要, pHash)；pHash 为 None 表示未计算或计算失败
+FrameHash = Tuple[bytes, Optional[int]]
+
+# 帧数少于该值时在线程中计算哈希（进程间传输帧字节的开销不划算）
+MIN_POOL_FRAMES = 64
+
+# 每个工作进程一次处理的最少帧数
+MIN_CHUNK_FRAMES = 16
+
+# 按工作进程数复用的进程池（整个进程共享，多个视频可能同时在用）
+_POOLS: Dict[int, ProcessPoolExecutor] = {}
+
+
+def hash_frames(datas: Sequence[bytes], use_phash: bool = True) -> List[FrameHash]:
+    """计算一组图片字节的 MD5 和 pHash（可在工作进程中执行）.
+
+    Args:
+        datas: 图片字节列表
+        use_phash: 是否计算 pHash
+
+    Returns:
+        与输入顺序一致的 (MD5 摘要, pHash) 列表
+    """
+    results: List[FrameHash] = []
+    for data in datas:
+        value = None
+        if use_phash:
+            try:
+                value = phash_int(data)
+            except Exception:
+                value = None
+        results.append((hashlib.md5(data).digest(), value))
+    return results
+
+
+def filter_frames(
+    frames: Sequence[Frame],
+    hashes: Sequence[FrameHash],
+    threshold: int = PHASH_THRESHOLD,
+    use_phash: bool = True,
+) -> Tuple[List[Frame], DedupStats]:
+    """按顺序过滤：保留首次出现的帧，移除完全相同或 pHash 相似的后续帧.
+
+    Args:
+        frames: 内存帧列表（按时间顺序）
+        hashes: 与帧一一对应的哈希（见 :func:`hash_frames`）
+        threshold: pHash 汉明距离阈值
+        use_phash: 哈希中是否包含 pHash
+
+    Returns:
+        (去重后的帧列表, 去重统计，不含耗时)
+    """
+    stats = DedupStats(total=len(frames), use_phash=use_phash)
+    seen_md5 = set()
+    index = HammingIndex(capacity=len(frames))
+    unique: List[Frame] = []
+
+    for frame, (digest, value) in zip(frames, hashes):
+        # 1. MD5 完全去重
+        if digest in seen_md5:
+            stats.exact += 1
+            continue
+
+        # 2. pHash 相似度去重（可选）
+        if use_phash:
+            if value is None:
+                stats.failed += 1
+            elif index.contains_within(value, threshold):
+                stats.similar += 1
+                continue
+            else:
+                index.add(value)
+
+        seen_md5.add(digest)
+        unique.append(frame)
+
+    stats.kept = len(unique)
+    return unique, stats
+
+
+def deduplicate_frames(
+    frames: Sequence[Frame],
+    threshold: int = PHASH_THRESHOLD,
+) -> Tuple[List[Frame], DedupStats]:
+    """在当前线程中去重.
+
+    Args:
+        frames: 内存帧列表（按时间顺序）
+        threshold: pHash 汉明距离阈值
+
+    Returns:
+        (去重后的帧列表, 去重统计)
+    """
+    started = time.perf_counter()
+    hashes = _gray_hashes(frames)
+    from_gray = hashes is not None
+    use_phash = from_gray or phash_available()
+    if hashes is None:
+        hashes = hash_frames([f.data for f in frames], use_phash)
+    unique, stats = filter_frames(frames, hashes, threshold, use_phash)
+    stats.from_gray = from_gray
+    stats.seconds = time.perf_counter() - started
+    return unique, stats
+
+
+async def deduplicate_frames_async(
+    frames: Sequence[Frame],
+    threshold: int = PHASH_THRESHOLD,
+    workers: int = 0,
+) -> Tuple[List[Frame], DedupStats]:
+    """去重的异步版本：哈希计算分块交给进程池，相似度过滤在主进程按顺序执行.
+
+    哈希计算期间事件循环保持空闲，下一个视频的抽帧可以与之重叠。
+    帧数较少、workers 为 1 或进程池不可用时改在线程中计算；所有帧都带
+    灰度缩略图时直接批量计算，不解码 JPEG。
+
+    Args:
+        frames: 内存帧列表（按时间顺序）
+        threshold: pHash 汉明距离阈值
+        workers: 工作进程数，0 表示按 CPU 核数自动决定
+
+    Returns:
+        (去重后的帧列表, 去重统计)
+    """
+    started = time.perf_counter()
+    hashes = await asyncio.to_thread(_gray_hashes, frames)
+    from_gray = hashes is not None
+    use_phash = from_gray or phash_available()
+    workers = workers or cpu_count()
+    datas = [f.data for f in frames]
+
+    if hashes is None and workers > 1 and len(datas) >= MIN_POOL_FRAMES:
+        size = max(MIN_CHUNK_FRAMES, -(-len(datas) // (workers * 2)))
+        chunks = [datas[i : i + size] for i in range(0, len(datas), size)]
+        hashes = await _hash_in_pool(workers, chunks, use_phash)
+    if hashes is None:
+        hashes = await asyncio.to_thread(hash_frames, datas, use_phash)
+
+    unique, stats = filter_frames(frames, hashes, threshold, use_phash)
+    stats.from_gray = from_gray
+    stats.seconds = time.perf_counter() - started
+    return unique, stats
+
+
+async def _hash_in_pool(
+    workers: int, chunks: Sequence[Sequence[bytes]], use_phash: bool
+) -> Optional[List[FrameHash]]:
+    """在进程池中分块计算哈希；进程池不可用、已损坏或任务被取消时返回 None.
+
+    进程池由所有视频共享，这里出错只丢弃本次使用的进程池（不取消其他
+    调用方的任务）；被执行器取消的任务（如退出时关闭进程池）同样回退到
+    线程计算，只有调用方自身被取消时才向上抛出 CancelledError。
+    """
+    if not chunks:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = _get_pool(workers)
+    futures = []
+    try:
+        for chunk in chunks:
+            futures.append(loop.run_in_executor(pool, hash_frames, chunk, use_phash))
+    except (RuntimeError, OSError):  # 无法启动工作进程，或进程池已损坏 / 已关闭
+        for future in futures:
+            future.cancel()
+        _discard_pool(workers, pool)
+        return None
+
+    try:
+        await asyncio.wait(futures)
+    except asyncio.CancelledError:
+        for future in futures:
+            future.cancel()
+        raise
+
+    if any(future.cancelled() for future in futures):
+        return None
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if any(isinstance(error, (BrokenProcessPool, OSError)) for error in errors):
+        _discard_pool(workers, pool)
+        return None
+    if errors:
+        raise errors[0]
+    return [item for future in futures for item in future.result()]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """获取（按进程数复用的）哈希进程池."""
+    pool = _POOLS.get(workers)
+    if pool is None:
+        # spawn：避免在已有事件循环线程的进程中 fork
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        _POOLS[workers] = pool
+    return pool
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池（若尚未被其他调用方替换），下次使用时重建."""
+    if _POOLS.get(workers) is pool:
+        del _POOLS[workers]
+    # 损坏的进程池中未完成的任务已以 BrokenProcessPool 结束，不需要取消
+    pool.shutdown(wait=False)
+
+
+def shutdown_hash_pool() -> None:
+    """关闭所有哈希进程池（应用退出时调用）."""
+    pools = list(_POOLS.values())
+    _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
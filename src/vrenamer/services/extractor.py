@@ -0,0 +1,670 @@
+"""抽帧引擎 - 基于输入端 -ss 定位的并发抽帧.
+
+全量解码（fps 滤镜）需要把整部视频解码一遍，长视频在 NAS 上动辄数分钟。
+seek 模式先根据时长计算目标时间点，再对每个时间点单独执行一次
+``ffmpeg -ss <t> -i <video> -frames:v 1``，只解码定位点附近的一个 GOP，
+多个定位并发执行。keyframe 模式只解码关键帧（``-skip_frame nokey``），
+再由调用方均匀抽取，适合对帧精度不敏感的长视频。全量解码路径保留为
+fps 模式，作为回退。scene 模式同样全量解码，但只输出场景切换处的帧
+（``select='gt(scene,X)'``），静止镜头不再浪费帧，短镜头也不会被均匀采样漏掉。
+
+keyframe / fps / scene 模式需要顺序解码整段视频。超过阈值的长视频会被切成 N 段，
+每段用输入端 ``-ss/-t`` 限定范围，由 N 个 ffmpeg 进程并发解码，再按时间顺序
+合并；并发数和每个进程的解码线程数都按 CPU 核数计算，避免多核机器空转。
+
+所有模式都通过 ``image2pipe`` 把 MJPEG 写到 stdout，帧以字节形式留在内存中，
+只有开启调试落盘时才由 :func:`persist_frames` 写入磁盘。
+
+开启 ``gray`` 时，同一个 ffmpeg 进程用 ``split`` 再输出一路 32×32 灰度 rawvideo
+到额外的管道，挂到 ``Frame.gray`` 上；去重直接用它批量计算 pHash，不必再解码
+640px 的 JPEG（额外管道依赖 pass_fds，仅 POSIX 可用）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from asyncio.subprocess import PIPE, create_subprocess_exec
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from vrenamer.core.exceptions import VideoProcessingError
+from vrenamer.core.types import Frame, VideoInfo
+
+# 抽帧模式：seek（定位抽帧）| keyframe（仅解码关键帧）| fps（全量解码，回退）
+# | scene（场景切换处取帧）
+SAMPLING_MODES = ("seek", "keyframe", "fps", "scene")
+# auto：按 ffprobe 探测到的编码和关键帧间隔在 seek / keyframe 中选择（默认）
+AUTO_MODE = "auto"
+DEFAULT_SAMPLING_MODE = AUTO_MODE
+
+# 输出帧长边尺寸（短边按比例缩放，不放大）
+FRAME_WIDTH = 640
+DEFAULT_SCALE = f"scale={FRAME_WIDTH}:-1"
+
+# scene 模式：场景分数阈值（0-1，越小取帧越多）；取到的帧少于下限时回退到均匀抽帧
+DEFAULT_SCENE_THRESHOLD = 0.3
+SCENE_MIN_FRAMES = 8
+
+# 分段并行解码：超过该时长（秒）的视频才分段；自动分段数上限
+DEFAULT_SEGMENT_THRESHOLD = 600.0
+MAX_AUTO_SEGMENTS = 8
+
+# ffmpeg 输出到 stdout 的 MJPEG 流参数
+_PIPE_OUTPUT = ["-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"]
+_VFR = ["-vsync", "vfr"]
+
+# pHash 用灰度缩略图：边长与每帧字节数
+GRAY_SIZE = 32
+GRAY_FRAME_BYTES = GRAY_SIZE * GRAY_SIZE
+_GRAY_FILTER = f"scale={GRAY_SIZE}:{GRAY_SIZE}:flags=area,format=gray"
+# 灰度输出管道的占位符，执行时替换为实际的文件描述符
+_GRAY_PIPE = "pipe:{gray_fd}"
+
+_SOI = b"\xff\xd8"
+
+# showinfo 滤镜输出中的帧时间点
+_SHOWINFO_PTS = re.compile(r"Parsed_showinfo.*?pts_time:\s*(-?[0-9.]+)")
+
+logger = logging.getLogger(__name__)
+
+
+def plan_timestamps(duration: float, count: int) -> List[float]:
+    """计算均匀分布的抽帧时间点.
+
+    取每个等分区间的中点，避开片头黑场和结尾（结尾处定位常常取不到帧）。
+
+    Args:
+        duration: 视频时长（秒）
+        count: 目标帧数
+
+    Returns:
+        升序排列的时间点列表（秒）
+    """
+    if duration <= 0 or count <= 0:
+        return []
+    step = duration / count
+    return [round((i + 0.5) * step, 3) for i in range(count)]
+
+
+def cpu_count() -> int:
+    """可用 CPU 核数（优先取进程亲和性，容器内更准确）."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def decode_threads(parallel: int) -> int:
+    """多个 ffmpeg 进程并发时，每个进程分到的解码线程数."""
+    return max(1, cpu_count() // max(1, parallel))
+
+
+def plan_segments(
+    duration: float,
+    threshold: float = DEFAULT_SEGMENT_THRESHOLD,
+    count: int = 0,
+) -> List[Tuple[float, float]]:
+    """规划分段并行解码的区间.
+
+    Args:
+        duration: 视频时长（秒）
+        threshold: 分段阈值（秒），短于该时长不分段
+        count: 分段数，0 表示按 CPU 核数自动决定（每段约 2 个解码线程）
+
+    Returns:
+        (起点, 时长) 列表；不需要分段时返回空列表
+    """
+    if duration <= 0 or duration < threshold:
+        return []
+    if count <= 0:
+        count = min(MAX_AUTO_SEGMENTS, cpu_count() // 2)
+    if count < 2:
+        return []
+    step = duration / count
+    return [(round(i * step, 3), round(step, 3)) for i in range(count)]
+
+
+def scale_filter(info: Optional[VideoInfo]) -> Optional[str]:
+    """按显示尺寸（已考虑旋转）决定缩放滤镜.
+
+    长边缩放到 FRAME_WIDTH：竖屏视频按高度缩放，不再得到 640 宽的超长帧；
+    原始尺寸已不超过 FRAME_WIDTH 时不缩放（返回 None），省掉缩放开销。
+    尺寸未知时使用默认按宽度缩放。
+    """
+    if info is None or not info.width or not info.height:
+        return DEFAULT_SCALE
+    width, height = info.display_size
+    if max(width, height) <= FRAME_WIDTH:
+        return None
+    if height > width:
+        return f"scale=-2:{FRAME_WIDTH}"
+    return f"scale={FRAME_WIDTH}:-2"
+
+
+def gray_supported() -> bool:
+    """当前平台能否为 ffmpeg 传递额外的输出管道（需要 pass_fds）."""
+    return os.name == "posix"
+
+
+def _filter_args(*filters: Optional[str]) -> List[str]:
+    chain = ",".join(f for f in filters if f)
+    return ["-vf", chain] if chain else []
+
+
+def _output_args(
+    filters: Sequence[Optional[str]],
+    gray: bool = False,
+    per_output: Sequence[str] = (),
+) -> List[str]:
+    """输出端参数：MJPEG 到 stdout；gray 时再用 split 输出一路灰度缩略图."""
+    if not (gray and gray_supported()):
+        return [*_filter_args(*filters), *per_output, *_PIPE_OUTPUT]
+    chain = ",".join(f for f in filters if f) or "null"
+    graph = f"[0:v]{chain},split=2[jpg][g];[g]{_GRAY_FILTER}[gray]"
+    return [
+        "-filter_complex",
+        graph,
+        "-map",
+        "[jpg]",
+        *per_output,
+        *_PIPE_OUTPUT,
+        "-map",
+        "[gray]",
+        *per_output,
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "gray",
+        _GRAY_PIPE,
+    ]
+
+
+def _input_args(
+    video_path: Path,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+    threads: Optional[int] = None,
+) -> List[str]:
+    """输入端参数：分段范围和解码线程数都必须放在 -i 之前."""
+    args: List[str] = []
+    if threads:
+        args += ["-threads", str(threads)]
+    if start is not None:
+        args += ["-ss", f"{start:.3f}"]
+    if length is not None:
+        args += ["-t", f"{length:.3f}"]
+    return args + ["-i", str(video_path)]
+
+
+def frames_dir_for(video_path: Path) -> Path:
+    """调试落盘目录：<视频目录>/frames/<视频文件名>."""
+    return video_path.parent / "frames" / video_path.stem
+
+
+def build_fps_command(
+    ffmpeg: str,
+    video_path: Path,
+    fps: float,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+    threads: Optional[int] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    gray: bool = False,
+) -> List[str]:
+    """构建全量解码（fps 滤镜）抽帧命令，可用 start/length 限定分段."""
+    return [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        *_input_args(video_path, start, length, threads),
+        *_output_args((f"fps={fps:.4f}", scale), gray, _VFR),
+    ]
+
+
+def build_keyframe_command(
+    ffmpeg: str,
+    video_path: Path,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+    threads: Optional[int] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    gray: bool = False,
+) -> List[str]:
+    """构建仅解码关键帧的抽帧命令.
+
+    ``-skip_frame nokey`` 是输入端解码选项，必须放在 ``-i`` 之前；
+    解码器直接丢弃所有非 I 帧，几乎跳过全部解码工作。
+    """
+    return [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-skip_frame",
+        "nokey",
+        *_input_args(video_path, start, length, threads),
+        "-an",
+        *_output_args((scale,), gray, _VFR),
+    ]
+
+
+def build_seek_command(
+    ffmpeg: str,
+    video_path: Path,
+    timestamp: float,
+    threads: Optional[int] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    gray: bool = False,
+) -> List[str]:
+    """构建单帧定位抽帧命令（-ss 放在 -i 之前，走输入端快速定位）."""
+    return [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        *_input_args(video_path, start=timestamp, threads=threads),
+        *_output_args((scale,), gray, ["-frames:v", "1"]),
+    ]
+
+
+def build_scene_command(
+    ffmpeg: str,
+    video_path: Path,
+    threshold: float = DEFAULT_SCENE_THRESHOLD,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+    threads: Optional[int] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    gray: bool = False,
+) -> List[str]:
+    """构建场景切换抽帧命令.
+
+    先缩放再计算场景分数（在缩略尺寸上比较相邻帧，比原分辨率便宜得多），
+    第一帧总是保留；showinfo 把每个输出帧的 pts_time 写到 stderr，
+    因此日志级别需要是 info。
+    """
+    select = f"select='eq(n,0)+gt(scene,{threshold})'"
+    return [
+        ffmpeg,
+        "-hide_banner",
+        "-nostats",
+        "-loglevel",
+        "info",
+        *_input_args(video_path, start, length, threads),
+        "-an",
+        *_output_args((scale, select, "showinfo"), gray, _VFR),
+    ]
+
+
+def parse_showinfo_times(log: str) -> List[float]:
+    """从 showinfo 滤镜的 stderr 输出中解析帧时间点（秒）."""
+    return [round(float(m.group(1)), 3) for m in _SHOWINFO_PTS.finditer(log)]
+
+
+def split_mjpeg(stream: bytes) -> List[bytes]:
+    """把 image2pipe 输出的 MJPEG 流切分为单个 JPEG.
+
+    按 JPEG 段结构解析（而不是简单查找 FFD9），避免量化表等头部数据中
+    恰好出现 ``FF D9`` 时误切。末尾不完整的帧会被丢弃。
+    """
+    frames: List[bytes] = []
+    start = stream.find(_SOI)
+    while start != -1:
+        end = _find_jpeg_end(stream, start)
+        if end is None:
+            break
+        frames.append(stream[start:end])
+        start = stream.find(_SOI, end)
+    return frames
+
+
+def _find_jpeg_end(data: bytes, start: int) -> Optional[int]:
+    """返回从 start 开始的 JPEG 的结束位置（EOI 之后），不完整时返回 None."""
+    size = len(data)
+    i = start + 2
+    while i + 1 < size:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # 填充字节
+            i += 1
+            continue
+        if marker == 0xD9:  # EOI
+            return i + 2
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:  # 无长度字段的标记
+            i += 2
+            continue
+        if i + 4 > size:
+            return None
+        i += 2 + int.from_bytes(data[i + 2 : i + 4], "big")
+        if marker != 0xDA:
+            continue
+        # SOS 之后是熵编码数据：FF 00 为转义，FF D0-D7 为 RST，其余 FF xx 为下一个标记
+        while True:
+            j = data.find(b"\xff", i)
+            if j == -1 or j + 1 >= size:
+                return None
+            follower = data[j + 1]
+            if follower == 0x00 or 0xD0 <= follower <= 0xD7:
+                i = j + 2
+            elif follower == 0xFF:
+                i = j + 1
+            else:
+                i = j
+                break
+    return None
+
+
+async def run_process(
+    cmd: Sequence[str],
+    timeout: Optional[float] = None,
+    pass_fds: Sequence[int] = (),
+) -> Tuple[int, bytes, bytes]:
+    """异步执行子进程（ffmpeg / ffprobe），不阻塞事件循环.
+
+    超时或调用方取消时会杀掉子进程并回收，不会遗留孤儿 ffmpeg 进程。
+
+    Args:
+        cmd: 命令及参数
+        timeout: 超时时间（秒），None 表示不限制
+        pass_fds: 额外传给子进程的文件描述符（仅 POSIX）
+
+    Returns:
+        (退出码, stdout, stderr)
+
+    Raises:
+        VideoProcessingError: 执行超时
+    """
+    extra = {"pass_fds": tuple(pass_fds)} if pass_fds else {}
+    proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE, **extra)
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(proc)
+        raise VideoProcessingError(f"{Path(cmd[0]).name} 执行超时 ({timeout:.0f}s)") from None
+    except asyncio.CancelledError:
+        await _kill(proc)
+        raise
+    return proc.returncode, stdout, stderr
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    """杀掉并回收子进程."""
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        return
+    await proc.wait()
+
+
+async def run_ffmpeg_pipe(cmd: Sequence[str], timeout: Optional[float] = None) -> bytes:
+    """执行输出到 stdout 的 ffmpeg 命令，返回 stdout 字节.
+
+    Raises:
+        VideoProcessingError: ffmpeg 返回非零退出码或执行超时
+    """
+    stdout, _, _ = await _run_checked(cmd, timeout)
+    return stdout
+
+
+async def run_ffmpeg_gray(
+    cmd: Sequence[str],
+    timeout: Optional[float] = None,
+) -> Tuple[int, bytes, bytes, Optional[bytes]]:
+    """执行 ffmpeg 命令；命令带灰度输出占位符时同时读取灰度缩略图管道.
+
+    Args:
+        cmd: 命令及参数（见 :func:`_output_args`）
+        timeout: 超时时间（秒）
+
+    Returns:
+        (退出码, stdout, stderr, 灰度缩略图字节；命令不带灰度输出时为 None)
+    """
+    if _GRAY_PIPE not in cmd:
+        returncode, stdout, stderr = await run_process(cmd, timeout)
+        return returncode, stdout, stderr, None
+
+    read_fd, write_fd = os.pipe()
+    # 读端在线程中读到 EOF（子进程退出、父进程关闭写端之后）
+    reader = asyncio.ensure_future(asyncio.to_thread(_read_all, read_fd))
+    try:
+        cmd = [f"pipe:{write_fd}" if arg == _GRAY_PIPE else arg for arg in cmd]
+        returncode, stdout, stderr = await run_process(cmd, timeout, pass_fds=(write_fd,))
+    finally:
+        os.close(write_fd)
+    return returncode, stdout, stderr, await reader
+
+
+def _read_all(fd: int) -> bytes:
+    with os.fdopen(fd, "rb") as f:
+        return f.read()
+
+
+def _attach_gray(frames: Sequence[Frame], gray: Optional[bytes]) -> None:
+    """把灰度缩略图按顺序挂到帧上；数量对不上时全部放弃."""
+    if not gray or len(gray) != len(frames) * GRAY_FRAME_BYTES:
+        return
+    for i, frame in enumerate(frames):
+        frame.gray = gray[i * GRAY_FRAME_BYTES : (i + 1) * GRAY_FRAME_BYTES]
+
+
+async def _run_checked(
+    cmd: Sequence[str], timeout: Optional[float]
+) -> Tuple[bytes, bytes, Optional[bytes]]:
+    returncode, stdout, stderr, gray = await run_ffmpeg_gray(cmd, timeout)
+    if returncode != 0:
+        # info 日志级别下 stderr 可能很长，只保留末尾的错误信息
+        err_text = stderr.decode("utf-8", errors="ignore").strip()[-2000:]
+        raise VideoProcessingError(f"视频抽帧失败 (ffmpeg exit {returncode}): {err_text}")
+    return stdout, stderr, gray
+
+
+async def extract_stream_frames(
+    cmd: Sequence[str],
+    fps: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> List[Frame]:
+    """执行 keyframe / fps 模式的 ffmpeg 命令并切分为内存帧.
+
+    Args:
+        cmd: 输出 MJPEG 到 stdout 的 ffmpeg 命令
+        fps: 输出帧率（fps 模式下用于推算时间点；keyframe 模式为 None）
+        timeout: ffmpeg 超时时间（秒）
+
+    Returns:
+        内存帧列表（按时间顺序）
+    """
+    stream, _, gray = await _run_checked(cmd, timeout)
+    frames = [
+        Frame(index=i + 1, data=data, timestamp=round(i / fps, 3) if fps else None)
+        for i, data in enumerate(split_mjpeg(stream))
+    ]
+    _attach_gray(frames, gray)
+    return frames
+
+
+async def extract_scene_frames(cmd: Sequence[str], timeout: Optional[float] = None) -> List[Frame]:
+    """执行 scene 模式的 ffmpeg 命令，按 showinfo 输出回填帧时间点.
+
+    Args:
+        cmd: :func:`build_scene_command` 构建的命令
+        timeout: ffmpeg 超时时间（秒）
+
+    Returns:
+        内存帧列表（按时间顺序）
+    """
+    stdout, stderr, gray = await _run_checked(cmd, timeout)
+    times = parse_showinfo_times(stderr.decode("utf-8", errors="ignore"))
+    frames = [
+        Frame(index=i + 1, data=data, timestamp=times[i] if i < len(times) else None)
+        for i, data in enumerate(split_mjpeg(stdout))
+    ]
+    _attach_gray(frames, gray)
+    return frames
+
+
+async def extract_seek_frames(
+    ffmpeg: str,
+    video_path: Path,
+    timestamps: Sequence[float],
+    concurrency: int = 8,
+    timeout: Optional[float] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    gray: bool = False,
+    failures: Optional[List[str]] = None,
+) -> List[Frame]:
+    """按时间点并发定位抽帧.
+
+    单个时间点失败（如定位超出末尾）只会跳过该帧，不影响其它帧。超时或
+    进程启动失败会记录警告并追加到 ``failures``，调用方据此判断结果不完整
+    （例如不写入帧缓存）；ffmpeg 正常退出但没有输出帧属于确定性结果，不计入。
+
+    Args:
+        ffmpeg: ffmpeg 可执行文件路径
+        video_path: 视频文件路径
+        timestamps: 抽帧时间点（秒）
+        concurrency: 同时运行的 ffmpeg 进程数
+        timeout: 单个 ffmpeg 进程的超时时间（秒）
+        scale: 缩放滤镜（见 :func:`scale_filter`）
+        gray: 是否同时输出 pHash 用灰度缩略图
+        failures: 失败记录（可选），每个失败的时间点追加一条描述
+
+    Returns:
+        成功抽取的内存帧列表（按时间顺序）
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    threads = decode_threads(concurrency)
+
+    async def _one(idx: int, timestamp: float) -> Optional[Frame]:
+        cmd = build_seek_command(
+            ffmpeg, video_path, timestamp, threads=threads, scale=scale, gray=gray
+        )
+        async with semaphore:
+            try:
+                returncode, stdout, _, thumb = await run_ffmpeg_gray(cmd, timeout)
+            except VideoProcessingError as e:
+                logger.warning(f"定位抽帧失败: {timestamp:.3f}s ({e})")
+                if failures is not None:
+                    failures.append(f"seek {timestamp:.3f}s: {e}")
+                return None
+        if returncode != 0:
+            logger.debug(f"定位抽帧无输出: {timestamp:.3f}s (返回码 {returncode})")
+            return None
+        images = split_mjpeg(stdout)
+        if not images:
+            return None
+        frame = Frame(index=idx + 1, data=images[0], timestamp=timestamp)
+        _attach_gray([frame], thumb)
+        return frame
+
+    results = await asyncio.gather(*[_one(i, t) for i, t in enumerate(timestamps)])
+    return [frame for frame in results if frame is not None]
+
+
+async def extract_segmented_frames(
+    ffmpeg: str,
+    video_path: Path,
+    segments: Sequence[Tuple[float, float]],
+    fps: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    scene_threshold: Optional[float] = None,
+    gray: bool = False,
+    failures: Optional[List[str]] = None,
+) -> List[Frame]:
+    """分段并行解码（keyframe / fps / scene 模式），按时间顺序合并.
+
+    每段一个 ffmpeg 进程，用输入端 ``-ss/-t`` 限定范围；同时运行的进程数
+    不超过 CPU 核数，每个进程的解码线程数为 CPU 核数 / 并发数。单段失败
+    只跳过该段（记录警告并追加到 ``failures``），全部失败时抛出第一个错误。
+
+    Args:
+        ffmpeg: ffmpeg 可执行文件路径
+        video_path: 视频文件路径
+        segments: (起点, 时长) 列表，见 :func:`plan_segments`
+        fps: 输出帧率（fps 模式）；与 scene_threshold 均为 None 时按 keyframe 模式只解码关键帧
+        concurrency: 同时运行的 ffmpeg 进程数，默认 min(分段数, CPU 核数)
+        timeout: 单个分段 ffmpeg 进程的超时时间（秒）
+        scale: 缩放滤镜（见 :func:`scale_filter`）
+        scene_threshold: 场景分数阈值（scene 模式）
+        gray: 是否同时输出 pHash 用灰度缩略图
+        failures: 失败记录（可选），每个失败的分段追加一条描述
+
+    Returns:
+        内存帧列表（按时间顺序，index 重新连续编号）
+
+    Raises:
+        VideoProcessingError: 所有分段均失败
+    """
+    parallel = max(1, min(concurrency or len(segments), cpu_count()))
+    semaphore = asyncio.Semaphore(parallel)
+    threads = decode_threads(parallel)
+
+    async def _one(start: float, length: float) -> List[Frame]:
+        if scene_threshold is not None:
+            cmd = build_scene_command(
+                ffmpeg, video_path, scene_threshold, start, length, threads, scale, gray
+            )
+            async with semaphore:
+                frames = await extract_scene_frames(cmd, timeout=timeout)
+        else:
+            if fps:
+                cmd = build_fps_command(
+                    ffmpeg, video_path, fps, start, length, threads, scale, gray
+                )
+            else:
+                cmd = build_keyframe_command(
+                    ffmpeg, video_path, start, length, threads, scale, gray
+                )
+            async with semaphore:
+                frames = await extract_stream_frames(cmd, fps=fps, timeout=timeout)
+        # 分段内时间点从 0 开始，加上分段起点还原为全片时间
+        for frame in frames:
+            if frame.timestamp is not None:
+                frame.timestamp = round(start + frame.timestamp, 3)
+        return frames
+
+    results = await asyncio.gather(
+        *[_one(start, length) for start, length in segments],
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors and len(errors) == len(results):
+        raise errors[0]
+    for (start, length), result in zip(segments, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"分段解码失败，跳过 {start:.0f}s 起 {length:.0f}s: {result}")
+            if failures is not None:
+                failures.append(f"segment {start:.0f}s+{length:.0f}s: {result}")
+
+    merged: List[Frame] = []
+    for result in results:
+        if not isinstance(result, BaseException):
+            merged.extend(result)
+    for i, frame in enumerate(merged):
+        frame.index = i + 1
+    return merged
+
+
+def persist_frames(frames: Sequence[Frame], output_dir: Path) -> None:
+    """调试落盘：清理旧帧后把内存帧写入目录，并回填 Frame.path.
+
+    Args:
+        frames: 内存帧列表
+        output_dir: 落盘目录
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for existing in output_dir.glob("*.jpg"):
+        try:
+            existing.unlink()
+        except OSError:
+            continue
+    for frame in frames:
+        path = output_dir / frame.name
+        path.write_bytes(frame.data)
+        frame.path = path
@@ -0,0 +1,228 @@
+"""帧缓存 - 以视频指纹 + 抽帧参数为键的持久化内容寻址缓存.
+
+同一视频在调整提示词后重复分析时，直接从缓存读取最终帧，完全跳过
+ffprobe / ffmpeg / 去重。视频指纹只读取文件大小、修改时间以及首尾各
+1 MiB 内容，对 NAS 上的大文件也足够便宜。
+
+缓存目录结构::
+
+    <cache_dir>/<key>/meta.json
+    <cache_dir>/<key>/frame_00001.jpg
+    ...
+
+meta.json 的修改时间即最近访问时间，超出容量上限时按 LRU 淘汰整个条目。
+写入先落到唯一的 ``.<key>.*`` 临时目录再整体改名，多个视频（或同一视频）
+并发写入互不干扰；以 ``.`` 开头的目录不会被当作条目淘汰。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from vrenamer.core.types import Frame
+
+# 指纹读取的首尾字节数
+FINGERPRINT_CHUNK = 1024 * 1024
+
+# 缓存格式版本（格式变化时递增，使旧条目自然失效）
+CACHE_VERSION = 1
+
+_META_FILE = "meta.json"
+
+
+def video_fingerprint(video_path: Path) -> str:
+    """计算视频的廉价指纹：大小 + 修改时间 + 首尾各 1 MiB 内容的哈希.
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        十六进制指纹字符串
+    """
+    stat = video_path.stat()
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+    with open(video_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if stat.st_size > FINGERPRINT_CHUNK:
+            f.seek(max(FINGERPRINT_CHUNK, stat.st_size - FINGERPRINT_CHUNK))
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedFrames:
+    """缓存命中结果."""
+
+    frames: List[Frame]
+    meta: Dict[str, Any]  # 写入时附带的元数据（时长、帧率、模式、抽帧耗时等）
+
+
+class FrameCache:
+    """带 LRU 容量上限的持久化帧缓存."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """初始化帧缓存.
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存容量上限（字节），超出后按 LRU 淘汰
+            logger: 日志器（可选）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0  # 命中时省下的 ffmpeg 抽帧耗时
+
+    def make_key(self, fingerprint: str, params: Dict[str, Any]) -> str:
+        """由视频指纹（见 :func:`video_fingerprint`）和抽帧参数生成缓存键."""
+        payload = json.dumps(
+            {"v": CACHE_VERSION, "fingerprint": fingerprint, "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedFrames]:
+        """读取缓存条目，命中时刷新访问时间.
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            命中返回缓存帧，未命中或条目损坏返回 None
+        """
+        entry = self.cache_dir / key
+        meta_path = entry / _META_FILE
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            frames = [
+                Frame(
+                    index=item["index"],
+                    data=(entry / item["name"]).read_bytes(),
+                    timestamp=item.get("timestamp"),
+                    mime_type=item.get("mime_type", "image/jpeg"),
+                )
+                for item in meta["frames"]
+            ]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(meta_path)
+        except OSError:  # 读取后条目被并发淘汰，帧已在内存中
+            pass
+        self.hits += 1
+        self.saved_seconds += float(meta.get("extract_seconds", 0.0))
+        return CachedFrames(frames=frames, meta=meta)
+
+    def put(self, key: str, frames: Sequence[Frame], meta: Dict[str, Any]) -> None:
+        """写入缓存条目并按容量上限淘汰旧条目.
+
+        Args:
+            key: 缓存键
+            frames: 最终帧列表
+            meta: 附带的元数据
+
+        Raises:
+            OSError: 写入失败（磁盘已满、目录只读等）
+        """
+        entry = self.cache_dir / key
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 每次写入使用唯一的临时目录，并发写入同一个键也不会互相删除
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key}.", suffix=".tmp", dir=self.cache_dir))
+        try:
+            self._write_entry(tmp, frames, meta)
+            self._replace_entry(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    def _write_entry(self, tmp: Path, frames: Sequence[Frame], meta: Dict[str, Any]) -> None:
+        """把帧和 meta.json 写入临时目录."""
+
+        items = []
+        for frame in frames:
+            (tmp / frame.name).write_bytes(frame.data)
+            items.append(
+                {
+                    "index": frame.index,
+                    "name": frame.name,
+                    "timestamp": frame.timestamp,
+                    "mime_type": frame.mime_type,
+                }
+            )
+        record = {**meta, "frames": items, "created": time.time()}
+        (tmp / _META_FILE).write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+
+    def _replace_entry(self, tmp: Path, entry: Path) -> None:
+        """把写好的临时目录改名为正式条目.
+
+        旧条目（例如已损坏、读取未命中的条目）先改名移走再删除，读方不会看到
+        半删除的目录。改名时若条目已被另一个写入者抢先创建，说明同一内容已经
+        写入（键由内容决定），放弃本次写入即可。
+        """
+        if entry.exists():
+            stale = Path(
+                tempfile.mkdtemp(prefix=f".{entry.name}.", suffix=".old", dir=self.cache_dir)
+            )
+            try:
+                entry.replace(stale / entry.name)
+            except FileNotFoundError:  # 已被并发淘汰或替换
+                pass
+            finally:
+                shutil.rmtree(stale, ignore_errors=True)
+        try:
+            tmp.rename(entry)
+        except OSError:
+            if not entry.exists():
+                raise
+            self.logger.debug(f"帧缓存条目已由并发写入创建: {entry.name}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰条目，直到总大小不超过上限."""
+        entries = []
+        total = 0
+        for entry in self.cache_dir.iterdir():
+            # 跳过写入中的临时目录和待删除的旧条目
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                size = sum(p.stat().st_size for p in entry.iterdir())
+                accessed = (entry / _META_FILE).stat().st_mtime
+            except FileNotFoundError:  # 缺少 meta.json，或已被并发替换 / 淘汰
+                continue
+            entries.append((accessed, size, entry))
+            total += size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self.logger.debug(f"帧缓存淘汰: {entry.name} ({size / 1024:.0f} KB)")
@@ -0,0 +1,207 @@
+"""帧编码档位 - 按任务把内存帧重新编码为更小的缩略图.
+
+抽帧统一输出长边 640 的 JPEG；不是每个任务都需要这么大的图，例如
+脸部可见性用 384px 就足够。analysis_tasks.yaml 中定义命名档位
+（长边、JPEG 质量、可选 WebP），任务通过 ``frame_profile`` 引用。
+
+每个（帧, 档位）只编码一次，多个任务共享同一档位的结果；编码在
+线程中执行，不阻塞事件循环。Pillow 是可选依赖，未安装时所有档位
+都直接使用原始帧。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from vrenamer.core.exceptions import ConfigError
+from vrenamer.core.types import Frame, FrameLike
+from vrenamer.services.extractor import FRAME_WIDTH
+
+FRAME_FORMATS = ("jpeg", "webp")
+
+# 需要重新编码但未指定质量时使用的默认质量
+DEFAULT_QUALITY = 85
+
+# 未指定档位的任务使用的档位名（抽帧原图，不重新编码）
+DEFAULT_PROFILE_NAME = "full"
+
+_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class FrameProfile:
+    """帧编码档位."""
+
+    max_edge: int = FRAME_WIDTH  # 长边像素上限（不放大）
+    quality: Optional[int] = None  # 编码质量 1-100，None 表示 JPEG 且不缩放时保留原始字节
+    format: str = "jpeg"  # jpeg | webp
+
+    @property
+    def is_passthrough(self) -> bool:
+        """是否直接使用抽帧原图（无需重新编码）."""
+        return self.format == "jpeg" and self.quality is None and self.max_edge >= FRAME_WIDTH
+
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES[self.format]
+
+    @classmethod
+    def from_config(cls, name: str, cfg: Dict[str, Any]) -> "FrameProfile":
+        """从 YAML 配置构建档位.
+
+        Raises:
+            ConfigError: 配置格式错误
+        """
+        if not isinstance(cfg, dict):
+            raise ConfigError(f"Frame profile {name} must be a mapping")
+        unknown = set(cfg) - {"max_edge", "quality", "format"}
+        if unknown:
+            raise ConfigError(f"Frame profile {name} has unknown keys: {sorted(unknown)}")
+
+        fmt = str(cfg.get("format", "jpeg")).lower()
+        if fmt not in FRAME_FORMATS:
+            raise ConfigError(f"Frame profile {name}: format must be one of {FRAME_FORMATS}")
+        max_edge = int(cfg.get("max_edge", FRAME_WIDTH))
+        if max_edge < 16:
+            raise ConfigError(f"Frame profile {name}: max_edge ({max_edge}) is too small")
+        quality = cfg.get("quality")
+        if quality is not None:
+            quality = int(quality)
+            if not 1 <= quality <= 100:
+                raise ConfigError(f"Frame profile {name}: quality ({quality}) must be 1-100")
+        return cls(max_edge=min(max_edge, FRAME_WIDTH), quality=quality, format=fmt)
+
+
+def named_frame_profiles(tasks_file: Dict[str, Any]) -> Dict[str, FrameProfile]:
+    """解析 analysis_tasks.yaml 中定义的命名档位（始终包含默认档位 full）.
+
+    Raises:
+        ConfigError: 档位定义错误
+    """
+    profiles = {DEFAULT_PROFILE_NAME: FrameProfile()}
+    for name, cfg in (tasks_file.get("frame_profiles") or {}).items():
+        profiles[name] = FrameProfile.from_config(name, cfg)
+    return profiles
+
+
+def load_frame_profiles(tasks_file: Dict[str, Any]) -> Dict[str, FrameProfile]:
+    """解析 analysis_tasks.yaml 中每个任务使用的帧编码档位.
+
+    Args:
+        tasks_file: analysis_tasks.yaml 的完整内容
+
+    Returns:
+        {任务 ID: 档位}；未声明 frame_profile 的任务使用默认档位
+
+    Raises:
+        ConfigError: 档位定义错误或任务引用了不存在的档位
+    """
+    profiles = named_frame_profiles(tasks_file)
+
+    result: Dict[str, FrameProfile] = {}
+    for task_id, task_cfg in (tasks_file.get("tasks") or {}).items():
+        name = (task_cfg or {}).get("frame_profile", DEFAULT_PROFILE_NAME)
+        if name not in profiles:
+            raise ConfigError(f"Task {task_id} references unknown frame_profile: {name}")
+        result[task_id] = profiles[name]
+    return result
+
+
+class FrameEncoder:
+    """按档位重新编码帧，每个（帧, 档位）只编码一次."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        # Frame 按对象身份哈希，键同时持有原始帧引用
+        self._cache: Dict[Tuple[Frame, FrameProfile], Frame] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def encode(self, frames: Sequence[FrameLike], profile: FrameProfile) -> List[FrameLike]:
+        """按档位编码帧（已编码过的直接复用）.
+
+        磁盘路径形式的帧、直通档位以及编码失败的帧都原样返回。
+
+        Args:
+            frames: 帧列表
+            profile: 编码档位
+
+        Returns:
+            编码后的帧列表（顺序与输入一致）
+        """
+        if profile.is_passthrough:
+            return list(frames)
+        try:
+            from PIL import Image
+        except ImportError:
+            self.logger.warning("Pillow 未安装，帧编码档位不生效，使用原始帧")
+            return list(frames)
+
+        encoded: List[FrameLike] = []
+        for frame in frames:
+            if not isinstance(frame, Frame):
+                encoded.append(frame)
+                continue
+            key = (frame, profile)
+            cached = self._cache.get(key)
+            if cached is None:
+                try:
+                    cached = self._encode_one(Image, frame, profile)
+                except Exception as e:
+                    self.logger.warning(f"帧编码失败 {frame.name}: {e}，使用原始帧")
+                    cached = frame
+                self._cache[key] = cached
+                self.bytes_in += len(frame.data)
+                self.bytes_out += len(cached.data)
+            encoded.append(cached)
+        return encoded
+
+    async def encode_async(
+        self, frames: Sequence[FrameLike], profile: FrameProfile
+    ) -> List[FrameLike]:
+        """在线程中编码帧，避免阻塞事件循环."""
+        if profile.is_passthrough:
+            return list(frames)
+        return await asyncio.to_thread(self.encode, frames, profile)
+
+    async def prepare(
+        self, frames: Sequence[FrameLike], profiles: Sequence[FrameProfile]
+    ) -> Dict[FrameProfile, List[FrameLike]]:
+        """预先为每个不同档位编码一次，供多个任务共享.
+
+        Args:
+            frames: 全部帧
+            profiles: 各任务使用的档位（可重复）
+
+        Returns:
+            {档位: 编码后的帧列表}
+        """
+        distinct = list(dict.fromkeys(profiles))
+        results = await asyncio.gather(*[self.encode_async(frames, p) for p in distinct])
+        if self.bytes_in:
+            self.logger.info(
+                f"帧编码: {len(distinct)} 个档位，{self.bytes_in / 1024:.0f} KB → "
+                f"{self.bytes_out / 1024:.0f} KB ({self.bytes_out / self.bytes_in:.0%})"
+            )
+        return dict(zip(distinct, results))
+
+    @staticmethod
+    def _encode_one(image_module: Any, frame: Frame, profile: FrameProfile) -> Frame:
+        img = image_module.open(io.BytesIO(frame.data))
+        # JPEG 解码时直接按 DCT 缩放到接近目标尺寸，比完整解码后再缩小便宜
+        img.draft("RGB", (profile.max_edge, profile.max_edge))
+        img = img.convert("RGB")
+        img.thumbnail((profile.max_edge, profile.max_edge), image_module.BILINEAR)
+
+        buf = io.BytesIO()
+        img.save(buf, format=profile.format.upper(), quality=profile.quality or DEFAULT_QUALITY)
+        return Frame(
+            index=frame.index,
+            data=buf.getvalue(),
+            timestamp=frame.timestamp,
+            mime_type=profile.mime_type,
+        )
@@ -0,0 +1,174 @@
+"""合并分析模式 - 一个请求同时回答所有子任务.
+
+默认每个子任务（角色原型、脸部可见性、场景类型、姿势）各自发送请求，
+同一批帧要上传多次。合并模式把各子任务的提示词拼成一个组合提示词，
+每批帧只发送一次，模型返回以任务 ID 为键的 JSON 对象，请求数和图片
+上传量约减少为 1/子任务数。各子任务仍按原有方式逐批统计标签频率。
+
+在 analysis_tasks.yaml 中切换：
+
+    analysis_mode: merged
+    merged:
+      batch_size: 20
+      frame_profile: full
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from vrenamer.core.exceptions import ConfigError
+from vrenamer.services.frame_encoding import (
+    DEFAULT_PROFILE_NAME,
+    FrameProfile,
+    named_frame_profiles,
+)
+
+# per_task：每个子任务单独请求（默认）| merged：一个请求回答所有子任务
+ANALYSIS_MODES = ("per_task", "merged")
+DEFAULT_ANALYSIS_MODE = "per_task"
+
+# 合并请求在批次规划器中使用的键
+MERGED_TASK_KEY = "merged"
+
+# 合并请求的输出 token 上限（需要容纳所有子任务的结果）
+MERGED_MAX_TOKENS = 1024
+
+
+@dataclass(frozen=True)
+class MergedOptions:
+    """合并模式配置."""
+
+    batch_size: Optional[int] = None  # 每个请求的图片数，None 表示使用全局 batch_size
+    frame_profile: FrameProfile = FrameProfile()  # 所有子任务共用的帧编码档位
+
+
+def load_merged_options(tasks_file: Dict[str, Any]) -> Optional[MergedOptions]:
+    """解析 analysis_tasks.yaml 中的分析模式.
+
+    Args:
+        tasks_file: analysis_tasks.yaml 的完整内容
+
+    Returns:
+        合并模式配置；per_task 模式返回 None
+
+    Raises:
+        ConfigError: 模式名称或 merged 配置错误
+    """
+    mode = tasks_file.get("analysis_mode", DEFAULT_ANALYSIS_MODE)
+    if mode not in ANALYSIS_MODES:
+        raise ConfigError(f"analysis_mode must be one of {ANALYSIS_MODES}: {mode}")
+    if mode != "merged":
+        return None
+
+    cfg = tasks_file.get("merged") or {}
+    if not isinstance(cfg, dict):
+        raise ConfigError("merged must be a mapping")
+    batch_size = cfg.get("batch_size")
+    if batch_size is not None and (not isinstance(batch_size, int) or batch_size < 1):
+        raise ConfigError(f"merged.batch_size must be a positive integer: {batch_size}")
+
+    profiles = named_frame_profiles(tasks_file)
+    name = cfg.get("frame_profile", DEFAULT_PROFILE_NAME)
+    if name not in profiles:
+        raise ConfigError(f"merged references unknown frame_profile: {name}")
+    return MergedOptions(batch_size=batch_size, frame_profile=profiles[name])
+
+
+def _common_affixes(texts: Sequence[str]) -> Tuple[str, str]:
+    """求所有提示词的公共前缀和后缀（按整行截断）."""
+    if len(texts) < 2:
+        return "", ""
+    prefix = os.path.commonprefix(list(texts))
+    prefix = prefix[: prefix.rfind("\n") + 1]
+    rest = [t[len(prefix) :] for t in texts]
+    suffix = os.path.commonprefix([t[::-1] for t in rest])[::-1]
+    newline = suffix.find("\n")
+    suffix = suffix[newline:] if newline >= 0 else ""
+    return prefix, suffix
+
+
+def build_merged_prompt(prompts: Dict[str, str]) -> str:
+    """把各子任务的提示词拼成一个组合提示词.
+
+    各提示词共有的开头（系统说明）和结尾（帧列表、字幕等）只保留一份，
+    每个子任务的专属部分放在以任务 ID 命名的小节中。
+
+    Args:
+        prompts: {任务 ID: 该任务的完整提示词}
+
+    Returns:
+        组合提示词
+    """
+    task_ids = list(prompts)
+    prefix, suffix = _common_affixes([prompts[k] for k in task_ids])
+
+    sections = []
+    for task_id in task_ids:
+        body = prompts[task_id][len(prefix) : len(prompts[task_id]) - len(suffix)]
+        sections.append(f"### 子任务 {task_id}\n{body.strip()}")
+
+    example = ", ".join(f'"{k}": {{"labels": [...], "confidence": 0.0}}' for k in task_ids)
+    instruction = (
+        f"以上 {len(task_ids)} 个子任务基于同一组图片一次完成，各子任务的候选标签和判定要求不变。\n"
+        "只输出一个 JSON 对象（忽略各子任务中的单任务输出格式），键为子任务 ID，"
+        "值为该子任务的结果：\n"
+        f"{{{example}}}"
+    )
+    parts = [prefix.strip("\n"), *sections, suffix.strip("\n"), instruction]
+    return "\n\n".join(part for part in parts if part)
+
+
+def _confidence(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def split_merged_response(parsed: Any, task_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """把合并请求的 JSON 响应拆成各子任务的批次结果.
+
+    缺失或格式不符的子任务返回空标签；值直接是标签列表或单个字符串时也接受。
+
+    Args:
+        parsed: 解析后的 JSON 响应
+        task_ids: 子任务 ID 列表
+
+    Returns:
+        {任务 ID: {"labels": [...], "confidence": float}}
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for task_id in task_ids:
+        value = parsed.get(task_id) if isinstance(parsed, dict) else None
+        confidence = 0.0
+        if isinstance(value, dict):
+            labels = value.get("labels") or []
+            confidence = _confidence(value.get("confidence", 0.0))
+        elif isinstance(value, list):
+            labels = value
+        elif isinstance(value, str):
+            labels = [value]
+        else:
+            labels = []
+        if isinstance(labels, str):
+            labels = [labels]
+        results[task_id] = {
+            "labels": [str(label) for label in labels if label],
+            "confidence": confidence,
+        }
+    return results
+
+
+def merged_task_results(
+    batch_results: List[Dict[str, Dict[str, Any]]], task_ids: Sequence[str]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """按子任务重组各批次结果，便于沿用单任务的标签汇总逻辑."""
+    return {
+        task_id: [
+            result.get(task_id, {"labels": [], "confidence": 0.0}) for result in batch_results
+        ]
+        for task_id in task_ids
+    }
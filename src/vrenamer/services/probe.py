@@ -0,0 +1,222 @@
+"""视频探测 - 一次 ffprobe JSON 调用得到完整的 VideoInfo.
+
+以前只用 ``format=duration`` 取时长，取不到时静默回退 180 秒，抽帧帧率随之
+出错。这里一次调用同时取 format / 视频流信息，并读取前 30 秒的视频包标志
+估算关键帧间隔；结果按视频指纹缓存，同一视频重复抽帧不再重复探测。
+抽帧模式、缩放和定位策略都基于这份 VideoInfo 决定。
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from vrenamer.core.exceptions import VideoProcessingError
+from vrenamer.core.types import VideoInfo
+from vrenamer.services.extractor import run_process
+
+# 探测失败时使用的默认时长（秒）
+DEFAULT_DURATION = 180.0
+
+# 估算关键帧间隔时读取的视频包时长（秒）
+KEYFRAME_PROBE_SECONDS = 30
+
+# 帧内编码（每帧都是关键帧），定位抽帧几乎没有解码开销
+INTRA_ONLY_CODECS = {"mjpeg", "prores", "dnxhd", "ffv1", "huffyuv", "rawvideo", "utvideo"}
+
+# 每次定位需要解码的帧数超过该值时，认为 GOP 过长，改用关键帧模式
+LONG_GOP_FRAMES = 300
+
+_MAX_CACHED = 256
+_INFO_CACHE: Dict[str, VideoInfo] = {}
+
+
+def build_probe_command(ffprobe: str, video_path: Path) -> List[str]:
+    """构建 ffprobe JSON 探测命令（format + 首个视频流 + 前 30 秒视频包标志）."""
+    return [
+        ffprobe,
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-read_intervals",
+        f"%+{KEYFRAME_PROBE_SECONDS}",
+        str(video_path),
+    ]
+
+
+def parse_probe_output(video_path: Path, payload: Dict[str, Any]) -> VideoInfo:
+    """把 ffprobe JSON 输出解析为 VideoInfo.
+
+    Args:
+        video_path: 视频文件路径
+        payload: ffprobe ``-print_format json`` 输出
+
+    Returns:
+        视频信息
+
+    Raises:
+        VideoProcessingError: 没有视频流或无法确定时长
+    """
+    fmt = payload.get("format") or {}
+    streams = [s for s in payload.get("streams") or [] if s.get("codec_type", "video") == "video"]
+    if not streams:
+        raise VideoProcessingError(f"未找到视频流: {video_path}")
+    stream = streams[0]
+
+    fps = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+    duration = _to_float(fmt.get("duration")) or _to_float(stream.get("duration"))
+    if not duration and fps:
+        duration = (_to_float(stream.get("nb_frames")) or 0.0) / fps
+    if not duration:
+        raise VideoProcessingError(f"无法确定视频时长: {video_path}")
+
+    size_bytes = int(_to_float(fmt.get("size")) or 0)
+    if not size_bytes and video_path.exists():
+        size_bytes = video_path.stat().st_size
+
+    return VideoInfo(
+        path=video_path,
+        duration=max(1.0, duration),
+        size_bytes=size_bytes,
+        format=str(fmt.get("format_name", "")).split(",")[0],
+        codec=stream.get("codec_name"),
+        width=int(stream.get("width") or 0),
+        height=int(stream.get("height") or 0),
+        fps=round(fps, 3),
+        rotation=_parse_rotation(stream),
+        keyframe_interval=_keyframe_interval(payload.get("packets") or []),
+    )
+
+
+async def probe_video(
+    ffprobe: str,
+    video_path: Path,
+    fingerprint: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> VideoInfo:
+    """探测视频信息，按视频指纹缓存.
+
+    Args:
+        ffprobe: ffprobe 可执行文件路径
+        video_path: 视频文件路径
+        fingerprint: 视频指纹（见 frame_cache.video_fingerprint），为空时不缓存
+        timeout: ffprobe 超时时间（秒）
+
+    Returns:
+        视频信息
+
+    Raises:
+        VideoProcessingError: ffprobe 执行失败、超时或输出无法解析
+    """
+    if fingerprint and fingerprint in _INFO_CACHE:
+        return _INFO_CACHE[fingerprint]
+
+    returncode, stdout, stderr = await run_process(
+        build_probe_command(ffprobe, video_path), timeout
+    )
+    if returncode != 0:
+        err_text = stderr.decode("utf-8", errors="ignore").strip()
+        raise VideoProcessingError(f"ffprobe exit {returncode}: {err_text}")
+    try:
+        payload = json.loads(stdout.decode("utf-8"))
+    except ValueError as e:
+        raise VideoProcessingError(f"ffprobe 输出解析失败: {e}") from e
+
+    info = parse_probe_output(video_path, payload)
+    if fingerprint:
+        if len(_INFO_CACHE) >= _MAX_CACHED:
+            _INFO_CACHE.pop(next(iter(_INFO_CACHE)))
+        _INFO_CACHE[fingerprint] = info
+    return info
+
+
+def fallback_info(video_path: Path) -> VideoInfo:
+    """探测失败时的兜底信息（默认时长，其余字段未知）."""
+    size_bytes = video_path.stat().st_size if video_path.exists() else 0
+    return VideoInfo(
+        path=video_path,
+        duration=DEFAULT_DURATION,
+        size_bytes=size_bytes,
+        format=video_path.suffix.lstrip(".").lower(),
+    )
+
+
+def choose_sampling_mode(info: VideoInfo, target: int) -> str:
+    """auto 模式：按编码和关键帧间隔选择解码开销最小的抽帧模式.
+
+    - 帧内编码（每帧都是关键帧）：seek，每个定位只解码一帧
+    - GOP 很长（每次定位要解码数百帧）且关键帧数量足够：keyframe
+    - 其余情况（含关键帧间隔未知）：seek
+
+    Args:
+        info: 视频信息
+        target: 目标帧数
+
+    Returns:
+        seek 或 keyframe
+    """
+    if (info.codec or "").lower() in INTRA_ONLY_CODECS:
+        return "seek"
+    interval = info.keyframe_interval
+    if not interval:
+        return "seek"
+    if info.duration / interval < target:
+        return "seek"  # 关键帧不足以取满目标帧数
+    if interval * (info.fps or 30.0) > LONG_GOP_FRAMES:
+        return "keyframe"
+    return "seek"
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if result > 0 else None
+
+
+def _parse_rate(value: Any) -> float:
+    """解析 ffprobe 的帧率分数（如 30000/1001）."""
+    if not value or not isinstance(value, str):
+        return 0.0
+    num, _, den = value.partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _parse_rotation(stream: Dict[str, Any]) -> int:
+    """读取旋转角度：新版 ffprobe 在 side_data_list，旧版在 tags.rotate."""
+    rotation: Any = (stream.get("tags") or {}).get("rotate")
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+    try:
+        return int(float(rotation or 0)) % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def _keyframe_interval(packets: List[Dict[str, Any]]) -> Optional[float]:
+    """由视频包的关键帧标志估算平均关键帧间隔（秒）."""
+    times = []
+    for packet in packets:
+        if "K" not in (packet.get("flags") or ""):
+            continue
+        try:
+            times.append(float(packet["pts_time"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    times.sort()
+    if len(times) < 2:
+        return None
+    return round((times[-1] - times[0]) / (len(times) - 1), 3)
@@ -0,0 +1,203 @@
+"""帧选择 - 在去重后的候选帧中挑选覆盖最广、差异最大的最终帧.
+
+去重只保留首次出现的帧，再均匀抽取到目标帧数，最终帧仍可能集中在
+画面相近的片段里。这里先把时间轴等分成若干区间，每个区间取最靠近中点
+的一帧保证时间覆盖，再按贪心最远点（farthest-point）依次加入与已选帧
+差异最大的候选帧。差异由 pHash 汉明距离和直方图距离组成，都归一化到
+0-1；剩余候选与已选帧的最小差异低于阈值时提前停止，画面单调的视频
+因此发送更少的帧，节省请求 token。
+
+特征优先使用 ffmpeg 输出的 32×32 灰度缩略图（pHash + 亮度直方图，不解码
+JPEG）；没有缩略图时用 Pillow 解码缩小后的 JPEG（pHash + RGB 颜色直方图）。
+numpy / Pillow 都不可用时退回均匀抽样。
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from vrenamer.core.types import Frame
+from vrenamer.services.dedup import np, phash_from_gray
+from vrenamer.services.extractor import GRAY_SIZE
+
+# diverse：时间覆盖 + 最远点选择（默认）| uniform：均匀抽样
+SELECTION_MODES = ("diverse", "uniform")
+DEFAULT_SELECTION_MODE = "diverse"
+
+# 剩余候选与已选帧的最小差异低于该值时停止加帧（0 表示总是取满目标帧数）
+DEFAULT_MIN_DISTANCE = 0.08
+
+# 每多少个目标帧划分一个时间区间（每个区间至少保留一帧）
+FRAMES_PER_BIN = 4
+
+# 直方图分箱数（每个通道）
+_HIST_BINS = 16
+
+
+def evenly_sample(items: Sequence, target: int) -> List:
+    """按位置均匀抽取 target 个元素（保留首尾）."""
+    if not items or target <= 0:
+        return []
+    if len(items) <= target:
+        return list(items)
+    if target == 1:
+        return [items[0]]
+    step = (len(items) - 1) / (target - 1)
+    return [items[int(round(i * step))] for i in range(target)]
+
+
+@dataclass
+class SelectionStats:
+    """帧选择统计."""
+
+    candidates: int = 0
+    selected: int = 0
+    bins: int = 0  # 时间区间数（保底帧数上限）
+    method: str = DEFAULT_SELECTION_MODE
+    stopped_early: bool = False  # 因差异低于阈值提前停止
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        if self.method != "diverse":
+            return f"帧选择 [均匀]: {self.candidates} 帧 → {self.selected} 帧"
+        text = (
+            f"帧选择 [多样性，{self.bins} 个时间区间]: {self.candidates} 帧 → {self.selected} 帧，"
+            f"耗时 {self.seconds:.3f}s"
+        )
+        if self.stopped_early:
+            text += "（剩余帧与已选帧过于相似，提前停止）"
+        return text
+
+
+def frame_features(frames: Sequence[Frame]) -> Optional["np.ndarray"]:
+    """计算帧的选择特征：64 位 pHash 比特 + 归一化直方图.
+
+    Args:
+        frames: 内存帧列表
+
+    Returns:
+        (N, 64 + 直方图维数) 的特征矩阵；numpy / Pillow 不可用时返回 None
+    """
+    if np is None or not frames:
+        return None
+    if all(f.gray is not None for f in frames):
+        grays = [f.gray for f in frames]
+        pixels = np.frombuffer(b"".join(grays), dtype=np.uint8).reshape(len(frames), -1)
+        hists = _histograms(pixels)
+    else:
+        try:
+            grays, hists = _decode_features(frames)
+        except Exception:  # 未安装 Pillow 或帧无法解码
+            return None
+    hashes = np.array(phash_from_gray(grays), dtype=">u8")
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(len(frames), 64)
+    return np.hstack([bits.astype(np.float32), hists])
+
+
+def _histograms(channels: "np.ndarray") -> "np.ndarray":
+    """按行计算归一化直方图（每行是一个通道的像素）."""
+    bins = (channels.astype(np.int64) * _HIST_BINS) >> 8
+    offsets = np.arange(len(channels))[:, None] * _HIST_BINS
+    counts = np.bincount((bins + offsets).ravel(), minlength=len(channels) * _HIST_BINS)
+    counts = counts.reshape(len(channels), _HIST_BINS).astype(np.float32)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+def _decode_features(frames: Sequence[Frame]) -> Tuple[List[bytes], "np.ndarray"]:
+    """用 Pillow 解码缩小后的 JPEG：32×32 灰度像素 + RGB 颜色直方图."""
+    from PIL import Image
+
+    grays: List[bytes] = []
+    hists = []
+    for frame in frames:
+        img = Image.open(io.BytesIO(frame.data))
+        img.draft("RGB", (GRAY_SIZE * 2, GRAY_SIZE * 2))
+        img = img.convert("RGB")
+        grays.append(img.convert("L").resize((GRAY_SIZE, GRAY_SIZE), Image.LANCZOS).tobytes())
+        rgb = np.asarray(img.resize((GRAY_SIZE, GRAY_SIZE)), dtype=np.uint8)
+        # 三个通道各自归一化后拼接，再整体归一化
+        hists.append(_histograms(rgb.reshape(-1, 3).T).ravel() / 3)
+    return grays, np.vstack(hists)
+
+
+def _distances(features: "np.ndarray", idx: int) -> "np.ndarray":
+    """所有帧到第 idx 帧的差异：0.5 × pHash 汉明距离 + 0.5 × 直方图 L1 距离（均归一化到 0-1）."""
+    diff = np.abs(features - features[idx])
+    hamming = diff[:, :64].sum(axis=1) / 64
+    hist = diff[:, 64:].sum(axis=1) / 2
+    return 0.5 * hamming + 0.5 * hist
+
+
+def _coverage_seeds(frames: Sequence[Frame], bins: int) -> List[int]:
+    """时间轴等分为 bins 个区间，每个非空区间取最靠近中点的一帧."""
+    if all(f.timestamp is not None for f in frames):
+        positions = [float(f.timestamp) for f in frames]
+    else:
+        positions = [float(i) for i in range(len(frames))]
+    start, end = min(positions), max(positions)
+    width = (end - start) / bins or 1.0
+
+    best = {}
+    for i, pos in enumerate(positions):
+        b = min(bins - 1, int((pos - start) / width))
+        offset = abs(pos - (start + (b + 0.5) * width))
+        if b not in best or offset < best[b][0]:
+            best[b] = (offset, i)
+    return sorted(i for _, i in best.values())
+
+
+def select_frames(
+    frames: Sequence[Frame],
+    target: int,
+    mode: str = DEFAULT_SELECTION_MODE,
+    min_distance: float = DEFAULT_MIN_DISTANCE,
+) -> Tuple[List[Frame], SelectionStats]:
+    """从候选帧中选出最终帧（按时间顺序返回）.
+
+    Args:
+        frames: 去重后的候选帧（按时间顺序）
+        target: 最多选出的帧数
+        mode: diverse（时间覆盖 + 最远点）或 uniform（均匀抽样）
+        min_distance: diverse 模式下的最小差异阈值，0 表示总是取满 target
+
+    Returns:
+        (选中的帧列表, 选择统计)
+    """
+    started = time.perf_counter()
+    stats = SelectionStats(candidates=len(frames), method=mode)
+    features = None
+    if mode == "diverse" and target > 0 and (len(frames) > target or min_distance > 0):
+        features = frame_features(frames)
+
+    if features is None:
+        selected = evenly_sample(frames, target)
+        stats.method = "uniform"
+        stats.selected = len(selected)
+        stats.seconds = time.perf_counter() - started
+        return selected, stats
+
+    stats.bins = max(1, min(target, math.ceil(target / FRAMES_PER_BIN)))
+    chosen = _coverage_seeds(frames, stats.bins)[:target]
+
+    # 贪心最远点：每次加入与已选帧最小差异最大的候选
+    min_dist = np.full(len(frames), np.inf, dtype=np.float32)
+    for idx in chosen:
+        min_dist = np.minimum(min_dist, _distances(features, idx))
+    min_dist[chosen] = -1.0
+    while len(chosen) < min(target, len(frames)):
+        best = int(np.argmax(min_dist))
+        if min_dist[best] < min_distance:
+            stats.stopped_early = True
+            break
+        chosen.append(best)
+        min_dist = np.minimum(min_dist, _distances(features, best))
+        min_dist[chosen] = -1.0
+
+    selected = [frames[i] for i in sorted(chosen)]
+    stats.selected = len(selected)
+    stats.seconds = time.perf_counter() - started
+    return selected, stats
@@ -2,27 +2,60 @@
 
 from __future__ import annotations
 
-import hashlib
+import asyncio
 import logging
 import shutil
-import subprocess
+import time
 from pathlib import Path
 from typing import List, Optional, Sequence
 
+from vrenamer.core.config import VideoConfig
 from vrenamer.core.exceptions import VideoProcessingError
-from vrenamer.core.types import FrameSampleResult
+from vrenamer.core.types import Frame, FrameSampleResult, VideoInfo
+from vrenamer.services.extractor import (
+    AUTO_MODE,
+    DEFAULT_SCALE,
+    FRAME_WIDTH,
+    SAMPLING_MODES,
+    SCENE_MIN_FRAMES,
+    build_fps_command,
+    build_keyframe_command,
+    build_scene_command,
+    extract_scene_frames,
+    extract_seek_frames,
+    extract_segmented_frames,
+    extract_stream_frames,
+    frames_dir_for,
+    persist_frames,
+    plan_segments,
+    plan_timestamps,
+    scale_filter,
+)
+from vrenamer.services.dedup import deduplicate_frames_async
+from vrenamer.services.frame_cache import FrameCache, video_fingerprint
+from vrenamer.services.probe import choose_sampling_mode, fallback_info, probe_video
+from vrenamer.services.selection import evenly_sample, select_frames
 
 
 class VideoProcessor:
     """视频处理服务."""
 
-    def __init__(self, logger: logging.Logger):
+    def __init__(self, logger: logging.Logger, config: Optional[VideoConfig] = None):
         """初始化视频处理器.
 
         Args:
             logger: 日志器
+            config: 抽帧配置（可选，默认使用 VideoConfig 默认值）
         """
         self.logger = logger
+        self.config = config or VideoConfig()
+        self.cache: Optional[FrameCache] = None
+        if self.config.cache_enabled:
+            self.cache = FrameCache(
+                self.config.cache_dir,
+                self.config.cache_max_mb * 1024 * 1024,
+                logger=self.logger,
+            )
         self._check_dependencies()
 
     def _check_dependencies(self):
@@ -50,13 +83,19 @@ class VideoProcessor:
         video_path: Path,
         target_frames: int = 96,
         output_dir: Optional[Path] = None,
+        mode: Optional[str] = None,
     ) -> FrameSampleResult:
         """抽取视频帧.
 
+        帧通过 ffmpeg 管道留在内存中；仅在开启 persist_frames 或显式传入
+        output_dir 时才写入磁盘。开启帧缓存时，相同视频和参数的重复抽帧
+        直接读取缓存，跳过 ffprobe / ffmpeg。
+
         Args:
             video_path: 视频文件路径
             target_frames: 目标帧数
-            output_dir: 输出目录（可选，默认为视频同目录下的 frames 子目录）
+            output_dir: 调试落盘目录（可选，传入即落盘；默认为视频同目录下的 frames 子目录）
+            mode: 抽帧模式（auto | seek | keyframe | fps | scene，可选，默认使用配置）
 
         Returns:
             抽帧结果
@@ -66,105 +105,285 @@ class VideoProcessor:
         """
         self.logger.info(f"开始抽帧: {video_path}")
 
-        # 确定输出目录
-        if output_dir is None:
-            frames_root = video_path.parent / "frames"
-            output_dir = frames_root / video_path.stem
-
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        # 清理旧帧
-        for existing in output_dir.glob("*.jpg"):
-            try:
-                existing.unlink()
-            except Exception as e:
-                self.logger.warning(f"无法删除旧帧 {existing}: {e}")
-
-        # 获取视频时长
-        duration = self.get_duration(video_path)
-        self.logger.info(f"视频时长: {duration:.2f} 秒")
+        mode = mode or self.config.sampling_mode
+        if mode != AUTO_MODE and mode not in SAMPLING_MODES:
+            raise VideoProcessingError(
+                f"不支持的抽帧模式: {mode}，可选: {', '.join((AUTO_MODE, *SAMPLING_MODES))}"
+            )
+        fingerprint = await asyncio.to_thread(video_fingerprint, video_path)
+
+        # 查询帧缓存
+        cache_key: Optional[str] = None
+        if self.cache is not None:
+            params = {
+                "mode": mode,
+                "target_frames": target_frames,
+                "width": FRAME_WIDTH,
+                "selection": self.config.frame_selection,
+                "min_distance": self.config.selection_min_distance,
+            }
+            if mode == "scene":
+                params["scene_threshold"] = self.config.scene_threshold
+            cache_key = self.cache.make_key(fingerprint, params)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                self.logger.info(f"帧缓存命中: {len(cached.frames)} 帧 {self.cache.stats()}")
+                return self._finish_sampling(
+                    video_path,
+                    cached.frames,
+                    output_dir,
+                    duration=cached.meta.get("duration", 0.0),
+                    fps=cached.meta.get("fps", 0.0),
+                    mode=cached.meta.get("mode", mode),
+                    extract_seconds=0.0,
+                )
+            self.logger.info(f"帧缓存未命中 {self.cache.stats()}")
+
+        # 一次 ffprobe 探测视频信息（按指纹缓存）
+        info = await self.probe(video_path, fingerprint)
+        duration = info.duration
+        scale = scale_filter(info)
+        if mode == AUTO_MODE:
+            mode = choose_sampling_mode(info, target_frames)
+            self.logger.info(
+                f"自动选择抽帧模式: {mode} "
+                f"(编码 {info.codec}，关键帧间隔 {info.keyframe_interval}s)"
+            )
 
         # 计算抽帧帧率
         fps = self._decide_sampling_fps(duration, target_frames)
-        self.logger.info(f"抽帧帧率: {fps:.4f} fps")
-
-        # 构建 ffmpeg 命令
-        cmd = [
-            "ffmpeg",
-            "-hide_banner",
-            "-loglevel",
-            "error",
-            "-i",
-            str(video_path),
-            "-vf",
-            f"fps={fps:.4f},scale=640:-1",
-            "-vsync",
-            "vfr",
-            str(output_dir / "frame_%05d.jpg"),
-        ]
+        self.logger.info(f"抽帧模式: {mode}，抽帧帧率: {fps:.4f} fps")
+
+        started = time.perf_counter()
+        frames: List[Frame] = []
+        failures: List[str] = []  # 失败的时间点 / 分段，结果不完整时不写入缓存
+        if mode == "seek":
+            timestamps = plan_timestamps(duration, target_frames)
+            self.logger.info(
+                f"定位抽帧: {len(timestamps)} 个时间点 (并发 {self.config.seek_concurrency})"
+            )
+            frames = await extract_seek_frames(
+                "ffmpeg",
+                video_path,
+                timestamps,
+                concurrency=self.config.seek_concurrency,
+                timeout=self.config.ffmpeg_timeout,
+                scale=scale,
+                gray=self.config.gray_thumbnails,
+                failures=failures,
+            )
+        elif mode == "keyframe":
+            frames = await self._decode(video_path, duration, scale=scale, failures=failures)
+            self.logger.info(f"关键帧数: {len(frames)}")
+            frames = evenly_sample(frames, target_frames)
+        elif mode == "scene":
+            frames = await self._decode(
+                video_path, duration, scale=scale, scene=True, failures=failures
+            )
+            self.logger.info(f"场景切换帧数: {len(frames)} (阈值 {self.config.scene_threshold})")
+            if len(frames) < SCENE_MIN_FRAMES:
+                # 几乎没有镜头切换（或阈值过高），场景帧不足以覆盖视频内容
+                frames = []
 
-        # 执行抽帧命令
-        try:
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            self.logger.debug("ffmpeg 执行成功")
-            if result.stderr:
-                self.logger.debug(f"ffmpeg stderr: {result.stderr[:200]}")
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"ffmpeg 执行失败: {e.stderr}")
-            raise VideoProcessingError(f"视频抽帧失败: {e.stderr}") from e
+        if not frames and mode != "fps":
+            self.logger.warning(f"{mode} 模式未生成足够的帧，回退到全量解码模式")
+            mode = "fps"
+            failures.clear()  # 结果只来自回退的全量解码
 
-        # 收集生成的帧
-        frames = sorted(output_dir.glob("*.jpg"))
-        self.logger.info(f"原始帧数: {len(frames)}")
+        if not frames:
+            frames = await self._decode(
+                video_path, duration, fps=fps, scale=scale, failures=failures
+            )
+
+        extract_seconds = time.perf_counter() - started
+        self.logger.info(f"原始帧数: {len(frames)} (模式 {mode}，耗时 {extract_seconds:.2f}s)")
 
         if not frames:
-            raise VideoProcessingError(f"抽帧失败：未生成任何帧文件。目录: {output_dir}")
+            raise VideoProcessingError(f"抽帧失败：未生成任何帧。视频: {video_path}")
 
-        # 去重
-        frames = self._deduplicate_frames(frames)
+        # 去重（MD5 / pHash 计算是 CPU 密集操作，分块交给进程池，不阻塞事件循环）
+        frames = await self._deduplicate_frames(frames)
         self.logger.info(f"去重后: {len(frames)} 帧")
 
-        # 限制帧数
-        frames = self._limit_frames(frames, target_frames)
+        # 选出最终帧（多样性选择需要计算特征，放到线程中执行）
+        frames = await asyncio.to_thread(self._select_frames, frames, target_frames)
         self.logger.info(f"最终采样: {len(frames)} 帧 (最大 {target_frames})")
 
+        if failures and self.cache is not None:
+            self.logger.warning(f"抽帧结果不完整（{len(failures)} 处失败），不写入帧缓存")
+        elif self.cache is not None and cache_key is not None:
+            meta = {
+                "mode": mode,
+                "duration": duration,
+                "fps": fps,
+                "extract_seconds": extract_seconds,
+            }
+            try:
+                await asyncio.to_thread(self.cache.put, cache_key, frames, meta)
+            except OSError as e:  # 缓存写入失败不影响本次抽帧结果
+                self.logger.warning(f"帧缓存写入失败: {e}")
+
+        return self._finish_sampling(
+            video_path,
+            frames,
+            output_dir,
+            duration=duration,
+            fps=fps,
+            mode=mode,
+            extract_seconds=extract_seconds,
+        )
+
+    def _finish_sampling(
+        self,
+        video_path: Path,
+        frames: List[Frame],
+        output_dir: Optional[Path],
+        duration: float,
+        fps: float,
+        mode: str,
+        extract_seconds: float,
+    ) -> FrameSampleResult:
+        """按需调试落盘并组装抽帧结果."""
+        # 调试落盘
+        if output_dir is None and self.config.persist_frames:
+            output_dir = frames_dir_for(video_path)
+        if output_dir is not None:
+            persist_frames(frames, output_dir)
+            self.logger.info(f"帧已落盘: {output_dir}")
+
         return FrameSampleResult(
-            directory=output_dir, frames=frames, duration=duration, fps=fps
+            directory=output_dir,
+            frames=frames,
+            duration=duration,
+            fps=fps,
+            mode=mode,
+            extract_seconds=extract_seconds,
         )
 
-    def get_duration(self, video_path: Path) -> float:
-        """获取视频时长（秒）.
+    async def _decode(
+        self,
+        video_path: Path,
+        duration: float,
+        fps: Optional[float] = None,
+        scale: Optional[str] = DEFAULT_SCALE,
+        scene: bool = False,
+        failures: Optional[List[str]] = None,
+    ) -> List[Frame]:
+        """keyframe / fps / scene 模式解码，长视频分段并行解码.
 
         Args:
             video_path: 视频文件路径
+            duration: 视频时长（秒）
+            fps: 输出帧率（fps 模式），为 None 时只解码关键帧
+            scale: 缩放滤镜（见 scale_filter）
+            scene: 是否按场景切换取帧（scene 模式）
+            failures: 失败记录（可选），跳过的分段追加到其中
+
+        Returns:
+            内存帧列表（按时间顺序）
+        """
+        segments = plan_segments(duration, self.config.segment_threshold, self.config.segment_count)
+        scene_threshold = self.config.scene_threshold if scene else None
+        gray = self.config.gray_thumbnails
+        if not segments:
+            if scene_threshold is not None:
+                cmd = build_scene_command(
+                    "ffmpeg", video_path, scene_threshold, scale=scale, gray=gray
+                )
+                return await self._run_ffmpeg(cmd, scene=True)
+            if fps:
+                cmd = build_fps_command("ffmpeg", video_path, fps, scale=scale, gray=gray)
+                return await self._run_ffmpeg(cmd, fps=fps)
+            cmd = build_keyframe_command("ffmpeg", video_path, scale=scale, gray=gray)
+            return await self._run_ffmpeg(cmd)
+
+        self.logger.info(f"分段并行解码: {len(segments)} 段，每段 {segments[0][1]:.0f}s")
+        try:
+            return await extract_segmented_frames(
+                "ffmpeg",
+                video_path,
+                segments,
+                fps=fps,
+                timeout=self.config.ffmpeg_timeout,
+                scale=scale,
+                scene_threshold=scene_threshold,
+                gray=gray,
+                failures=failures,
+            )
+        except VideoProcessingError as e:
+            self.logger.error(f"ffmpeg 执行失败: {e}")
+            raise
+
+    async def _run_ffmpeg(
+        self,
+        cmd: List[str],
+        fps: Optional[float] = None,
+        scene: bool = False,
+    ) -> List[Frame]:
+        """异步执行输出 MJPEG 管道的 ffmpeg 命令（keyframe / fps / scene 模式）.
+
+        Args:
+            cmd: ffmpeg 命令
+            fps: 输出帧率（用于推算帧时间点，keyframe 模式为 None）
 
         Returns:
-            视频时长（秒）
+            内存帧列表
 
         Raises:
-            VideoProcessingError: 获取时长失败
+            VideoProcessingError: ffmpeg 执行失败或超时
         """
+        # 执行抽帧命令
         try:
-            result = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    str(video_path),
-                ],
-                check=True,
-                capture_output=True,
-                text=True,
+            if scene:
+                frames = await extract_scene_frames(cmd, timeout=self.config.ffmpeg_timeout)
+            else:
+                frames = await extract_stream_frames(
+                    cmd, fps=fps, timeout=self.config.ffmpeg_timeout
+                )
+            self.logger.debug("ffmpeg 执行成功")
+        except VideoProcessingError as e:
+            self.logger.error(f"ffmpeg 执行失败: {e}")
+            raise
+
+        return frames
+
+    async def probe(self, video_path: Path, fingerprint: Optional[str] = None) -> VideoInfo:
+        """一次 ffprobe 调用获取视频信息（时长、编码、分辨率、帧率、旋转、关键帧间隔）.
+
+        Args:
+            video_path: 视频文件路径
+            fingerprint: 视频指纹（传入时按指纹缓存探测结果）
+
+        Returns:
+            视频信息；探测失败时返回默认时长的兜底信息
+        """
+        try:
+            info = await probe_video(
+                "ffprobe", video_path, fingerprint, timeout=self.config.probe_timeout
             )
-            duration = float(result.stdout.strip())
-            return max(1.0, duration)
         except Exception as e:
-            self.logger.warning(f"无法获取视频时长: {e}，使用默认值 180 秒")
-            return 180.0
+            info = fallback_info(video_path)
+            self.logger.warning(f"无法探测视频信息: {e}，使用默认时长 {info.duration:.0f} 秒")
+            return info
+
+        width, height = info.display_size
+        self.logger.info(
+            f"视频信息: 时长 {info.duration:.2f} 秒，{info.codec} {width}x{height} "
+            f"@ {info.fps:g}fps，关键帧间隔 {info.keyframe_interval}s"
+        )
+        return info
+
+    async def get_duration(self, video_path: Path) -> float:
+        """获取视频时长（秒）.
+
+        Args:
+            video_path: 视频文件路径
+
+        Returns:
+            视频时长（秒），探测失败时为默认值
+        """
+        info = await self.probe(video_path)
+        return info.duration
 
     def _decide_sampling_fps(self, duration: float, target_frames: int) -> float:
         """决定抽帧帧率.
@@ -179,124 +398,33 @@ class VideoProcessor:
         fps = target_frames / duration
         return max(0.1, min(6.0, fps))
 
-    def _deduplicate_frames(self, frames: Sequence[Path]) -> List[Path]:
-        """去重：MD5 完全相同 + pHash 内容相似.
+    async def _deduplicate_frames(self, frames: Sequence[Frame]) -> List[Frame]:
+        """去重：MD5 完全相同 + pHash 内容相似（直接处理内存帧字节）.
 
         Args:
-            frames: 帧文件路径列表
+            frames: 内存帧列表
 
         Returns:
             去重后的帧列表
         """
-        try:
-            import imagehash
-            from PIL import Image
-
-            use_phash = True
-            self.logger.debug("使用 MD5 + pHash 去重")
-        except ImportError:
-            use_phash = False
+        unique, stats = await deduplicate_frames_async(frames, workers=self.config.dedup_workers)
+        if not stats.use_phash:
             self.logger.warning("imagehash 未安装，仅使用 MD5 去重")
-
-        seen_md5 = {}
-        seen_phash = {}
-        unique = []
-        removed_count = 0
-
-        for frame in frames:
-            try:
-                # 1. MD5 完全去重
-                digest = hashlib.md5(frame.read_bytes()).hexdigest()
-                if digest in seen_md5:
-                    try:
-                        frame.unlink()
-                        removed_count += 1
-                    except Exception:
-                        pass
-                    continue
-
-                # 2. pHash 相似度去重（可选）
-                if use_phash:
-                    try:
-                        img = Image.open(frame)
-                        phash = imagehash.phash(img)
-
-                        # 检查是否有相似帧
-                        is_similar = False
-                        for existing_hash in seen_phash.keys():
-                            distance = imagehash.hex_to_hash(existing_hash) - phash
-                            if distance <= 5:  # 汉明距离 ≤ 5 认为相似
-                                is_similar = True
-                                try:
-                                    frame.unlink()
-                                    removed_count += 1
-                                except Exception:
-                                    pass
-                                break
-
-                        if not is_similar:
-                            seen_md5[digest] = frame
-                            seen_phash[str(phash)] = frame
-                            unique.append(frame)
-                    except Exception as e:
-                        # pHash 失败，仅用 MD5
-                        self.logger.warning(f"pHash 计算失败 {frame.name}: {e}")
-                        seen_md5[digest] = frame
-                        unique.append(frame)
-                else:
-                    # 仅 MD5 去重
-                    seen_md5[digest] = frame
-                    unique.append(frame)
-
-            except Exception as e:
-                self.logger.warning(f"帧去重失败 {frame.name}: {e}")
-                continue
-
-        self.logger.info(
-            f"去重结果: 原始 {len(frames)} 帧 → 保留 {len(unique)} 帧 (移除 {removed_count} 帧)"
-        )
+        self.logger.info(stats.summary())
         return unique
 
-    def _limit_frames(self, frames: Sequence[Path], limit: int) -> List[Path]:
-        """限制帧数.
+    def _select_frames(self, frames: Sequence[Frame], limit: int) -> List[Frame]:
+        """选出最终帧：时间覆盖 + 多样性（或均匀抽样）.
 
         Args:
-            frames: 帧文件路径列表
+            frames: 去重后的内存帧列表
             limit: 最大帧数
 
         Returns:
-            限制后的帧列表
+            选中的帧列表（按时间顺序）
         """
-        if len(frames) <= limit:
-            return list(frames)
-        return self._evenly_sample(list(frames), limit)
-
-    def _evenly_sample(self, items: Sequence[Path], target: int) -> List[Path]:
-        """均匀采样.
-
-        Args:
-            items: 项目列表
-            target: 目标数量
-
-        Returns:
-            采样后的列表
-        """
-        if not items:
-            return []
-        if len(items) <= target:
-            return list(items)
-
-        step = (len(items) - 1) / (target - 1)
-        selected = []
-        for i in range(target):
-            idx = int(round(i * step))
-            selected.append(items[idx])
-
-        # 去重保持顺序
-        seen = set()
-        ordered = []
-        for item in selected:
-            if item not in seen:
-                ordered.append(item)
-                seen.add(item)
-        return ordered
+        selected, stats = select_frames(
+            frames, limit, self.config.frame_selection, self.config.selection_min_distance
+        )
+        self.logger.info(stats.summary())
+        return selected
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -10,11 +11,25 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from vrenamer.services.dedup import shutdown_hash_pool
 from vrenamer.webui.services import pipeline
+from vrenamer.webui.services.context import PipelineContext
 from vrenamer.webui.settings import Settings
 
 
-app = FastAPI(title="VideoRenamer WebUI", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 进程级上下文：所有请求共享客户端连接池、风格配置和提示词模板
+    app.state.settings = Settings()  # loads .env
+    app.state.context = PipelineContext(app.state.settings)
+    try:
+        yield
+    finally:
+        await app.state.context.close()
+        shutdown_hash_pool()
+
+
+app = FastAPI(title="VideoRenamer WebUI", version="0.1.0", lifespan=lifespan)
 
 BASE_DIR = Path(__file__).resolve().parents[3]
 TEMPLATES_DIR = BASE_DIR / "templates"
@@ -38,7 +53,7 @@ async def analyze(
     custom_prompt: str = Form(""),
     n_candidates: int = Form(5),
 ):
-    settings = Settings()  # loads .env
+    settings = request.app.state.settings
 
     # Enforce single-video processing
     if file.content_type and not file.content_type.startswith("video/"):
@@ -58,6 +73,7 @@ async def analyze(
             user_prompt=custom_prompt,
             n_candidates=n_candidates,
             settings=settings,
+            context=request.app.state.context,
         )
 
     return templates.TemplateResponse(
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from vrenamer.core.exceptions import ConfigError
+from vrenamer.llm import gemini
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.key_pool import KeyEndpoint, KeyPool
+from vrenamer.llm.limiter import AdaptiveLimiter
+from vrenamer.llm.retry import RetryPolicy
+from vrenamer.llm.tracing import Tracer
+from vrenamer.llm.transport import HttpTransport
+from vrenamer.naming import NamingGenerator, NamingStyleConfig
+from vrenamer.webui.services.prompting import PromptTemplates
+from vrenamer.webui.settings import Settings
+
+
+def make_key_pool(settings: Settings) -> Optional[KeyPool]:
+    """按配置创建多 Key 池；只有一个 Key 且不限速时返回 None.
+
+    Raises:
+        ConfigError: Key 数与代理分组数不匹配
+    """
+    keys = settings.get_api_keys()
+    urls = settings.get_base_urls()
+    if len(keys) != len(urls) and len(keys) > 1 and len(urls) > 1:
+        raise ConfigError(
+            f"GEMINI_API_KEYS ({len(keys)}) and GEMINI_BASE_URLS ({len(urls)}) "
+            "must have the same length"
+        )
+    count = max(len(keys), len(urls))
+    if count == 1 and not settings.key_rpm and not settings.key_tpm:
+        return None
+    endpoints = [
+        KeyEndpoint(base_url=urls[i % len(urls)], api_key=keys[i % len(keys)]) for i in range(count)
+    ]
+    return KeyPool(
+        endpoints, rpm=settings.key_rpm, tpm=settings.key_tpm, cooldown=settings.key_cooldown
+    )
+
+
+def make_client(settings: Settings) -> GeminiClient:
+    """创建 Gemini 客户端（持有一个长连接会话和追踪输出，用完需 close）."""
+    tracer = Tracer.from_config(settings)
+    http = HttpTransport(
+        limit=settings.http_pool_limit,
+        limit_per_host=settings.http_pool_limit_per_host,
+        keepalive_timeout=settings.http_keepalive_timeout,
+        dns_cache_ttl=settings.http_dns_cache_ttl,
+        auto_decompress=False,  # GPT-Load 的 gzip 头有问题
+        tracer=tracer,
+    )
+    return GeminiClient(
+        base_url=settings.gemini_base_url,
+        api_key=settings.gemini_api_key,
+        transport=settings.llm_transport,
+        timeout=settings.request_timeout,
+        http=http,
+        retry_policy=RetryPolicy.from_config(settings),
+        key_pool=make_key_pool(settings),
+        stream=settings.llm_stream,
+        tracer=tracer,
+    )
+
+
+def make_limiter(settings: Settings) -> AdaptiveLimiter:
+    """创建 LLM 请求的并发限制器（关闭自适应时固定为 max_concurrency）."""
+    if not settings.adaptive_concurrency:
+        return AdaptiveLimiter.fixed(settings.max_concurrency or 1)
+    return AdaptiveLimiter(
+        initial=settings.initial_concurrency,
+        min_limit=settings.min_concurrency,
+        max_limit=settings.max_concurrency or 1,
+    )
+
+
+class PipelineContext:
+    """一次批量运行期间共享的资源.
+
+    持有 Gemini 客户端（连同连接池）、自适应并发限制器、命名风格配置、提示词模板
+    和子任务配置，首次使用时加载，之后每个视频直接复用（并发上限也随之延续）。交互式 CLI 在整个会话中使用同一个
+    上下文，WebUI 在进程启动时创建、关闭时释放。
+
+    用法::
+
+        async with PipelineContext(settings) as context:
+            for video in videos:
+                await pipeline.run_single(video, "", 5, settings, context=context)
+    """
+
+    def __init__(self, settings: Settings, client: Optional[GeminiClient] = None):
+        self.settings = settings
+        self.client = client or make_client(settings)
+        self.limiter = make_limiter(settings)
+        # 被重试吸收的 429 / 5xx 同样通知限制器下调；延迟按单次 HTTP 请求上报
+        retry_policy = getattr(self.client, "retry_policy", None)
+        if retry_policy is not None:
+            retry_policy.on_overload = self.limiter.record_overload
+            retry_policy.on_latency = self.limiter.record_latency
+        self._templates: Optional[PromptTemplates] = None
+        self._style_config: Optional[NamingStyleConfig] = None
+        self._tasks_file: Optional[Dict[str, Any]] = None
+        self._naming: Optional[NamingGenerator] = None
+
+    @property
+    def templates(self) -> PromptTemplates:
+        """提示词模板（prompts/ 目录，读取一次）."""
+        if self._templates is None:
+            self._templates = PromptTemplates.load()
+        return self._templates
+
+    @property
+    def style_config(self) -> NamingStyleConfig:
+        """命名风格配置（解析一次）.
+
+        Raises:
+            FileNotFoundError: 风格配置文件不存在
+        """
+        if self._style_config is None:
+            config_path = self.settings.get_style_config_path()
+            if not config_path.exists():
+                raise FileNotFoundError(f"Style config not found: {config_path}")
+            self._style_config = NamingStyleConfig.from_yaml(config_path)
+        return self._style_config
+
+    @property
+    def tasks_file(self) -> Dict[str, Any]:
+        """子任务配置（analysis_tasks.yaml，读取一次；不存在时为空配置）."""
+        if self._tasks_file is None:
+            config_path = Path(self.settings.analysis_tasks_config)
+            if config_path.exists():
+                import yaml
+
+                with open(config_path, "r", encoding="utf-8") as f:
+                    self._tasks_file = yaml.safe_load(f) or {}
+            else:
+                self._tasks_file = {}
+        return self._tasks_file
+
+    @property
+    def naming_generator(self) -> NamingGenerator:
+        """命名候选生成器（复用客户端和风格配置）."""
+        if self._naming is None:
+            backend = gemini.GeminiClient(
+                client=self.client,
+                model_flash=self.settings.model_flash,
+                model_pro=self.settings.model_pro,
+            )
+            self._naming = NamingGenerator(
+                llm_client=backend,
+                style_config=self.style_config,
+                model=self.settings.model_pro,
+            )
+        return self._naming
+
+    async def close(self) -> None:
+        """关闭客户端的连接池."""
+        await self.client.close()
+
+    async def __aenter__(self) -> "PipelineContext":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
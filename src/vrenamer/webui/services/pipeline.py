@@ -1,22 +1,55 @@
 from __future__ import annotations
 
 import asyncio
-import hashlib
 import json
+import random
 import shutil
-import subprocess
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Sequence
 
-from asyncio.subprocess import PIPE, create_subprocess_exec
-
+from vrenamer.core.exceptions import VideoProcessingError
+from vrenamer.core.types import Frame, FrameLike, VideoInfo
 from vrenamer.webui.settings import Settings
+from vrenamer.webui.services.context import PipelineContext
 from vrenamer.webui.services.prompting import compose_task_prompts, compose_name_prompt
-from vrenamer.llm.adapter import GeminiLLMAdapter
-from vrenamer.llm.client import GeminiClient
 from vrenamer.llm.json_utils import parse_json_loose
-from vrenamer.naming import NamingGenerator, NamingStyleConfig
+from vrenamer.services.extractor import (
+    AUTO_MODE,
+    DEFAULT_SCALE,
+    FRAME_WIDTH,
+    SAMPLING_MODES,
+    SCENE_MIN_FRAMES,
+    build_fps_command,
+    build_keyframe_command,
+    build_scene_command,
+    extract_scene_frames,
+    extract_seek_frames,
+    extract_segmented_frames,
+    extract_stream_frames,
+    frames_dir_for,
+    persist_frames,
+    plan_segments,
+    plan_timestamps,
+    scale_filter,
+)
+from vrenamer.services.batching import BatchPlanner
+from vrenamer.services.contact_sheet import contact_sheet_hint, tile_frames_async
+from vrenamer.services.dedup import deduplicate_frames_async
+from vrenamer.services.frame_cache import FrameCache, video_fingerprint
+from vrenamer.services.frame_encoding import FrameEncoder, FrameProfile, load_frame_profiles
+from vrenamer.services.merged_analysis import (
+    MERGED_MAX_TOKENS,
+    MERGED_TASK_KEY,
+    MergedOptions,
+    build_merged_prompt,
+    load_merged_options,
+    merged_task_results,
+    split_merged_response,
+)
+from vrenamer.services.probe import choose_sampling_mode, fallback_info, probe_video
+from vrenamer.services.selection import evenly_sample, select_frames
 from vrenamer.services.transcript import create_transcript_extractor
 
 
@@ -24,28 +57,42 @@ _FFMPEG_PATH: Optional[str] = None
 _FFPROBE_PATH: Optional[str] = None
 _FFMPEG_LOCK = asyncio.Lock()
 _FFPROBE_LOCK = asyncio.Lock()
+_FRAME_CACHES: Dict[tuple, FrameCache] = {}
 
 
 @dataclass
 class FrameSampleResult:
     """视频抽帧结果."""
 
-    directory: Path
-    frames: List[Path]
+    directory: Optional[Path]  # 调试落盘目录（未开启落盘时为 None）
+    frames: List[FrameLike]
+    mode: str = "fps"  # 实际使用的抽帧模式
+    extract_seconds: float = 0.0  # ffmpeg 抽帧耗时（不含去重）
+
 
+async def run_single(
+    video_path: Path,
+    user_prompt: str,
+    n_candidates: int,
+    settings: Settings,
+    context: Optional[PipelineContext] = None,
+) -> Dict[str, Any]:
+    if context is None:
+        async with PipelineContext(settings) as context:
+            return await run_single(video_path, user_prompt, n_candidates, settings, context)
 
-async def run_single(video_path: Path, user_prompt: str, n_candidates: int, settings: Settings) -> Dict[str, Any]:
-    frame_result = await sample_frames(video_path)
+    frame_result = await sample_frames(video_path, settings)
     transcript = await extract_transcript(settings, video_path)  # 改为 await 调用
     task_prompts = compose_task_prompts(
         frame_result.directory,
         transcript,
         user_prompt,
         frames=frame_result.frames,
+        templates=context.templates,
     )
-    tags, batches = await analyze_tasks(frame_result, task_prompts, settings)
-    name_prompt = compose_name_prompt(tags, user_prompt, n_candidates)
-    candidates = await generate_names(name_prompt, settings, int(n_candidates))
+    tags, batches = await analyze_tasks(frame_result, task_prompts, settings, context=context)
+    name_prompt = compose_name_prompt(tags, user_prompt, n_candidates, templates=context.templates)
+    candidates = await generate_names(name_prompt, settings, int(n_candidates), context=context)
     return {
         "frames": [p.name for p in frame_result.frames[:12]],
         "transcript": transcript[:8000],
@@ -98,81 +145,257 @@ async def _check_ffprobe() -> str:
         return ffprobe_path
 
 
-async def sample_frames(video_path: Path) -> FrameSampleResult:
-    """抽帧并返回代表性帧列表."""
+async def sample_frames(
+    video_path: Path,
+    settings: Optional[Settings] = None,
+    mode: Optional[str] = None,
+) -> FrameSampleResult:
+    """抽帧并返回代表性帧列表.
+
+    帧通过 ffmpeg 管道留在内存中，仅在 settings.persist_frames 开启时
+    才写入 <视频目录>/frames/<文件名>/ 便于调试。开启帧缓存时，同一视频
+    以相同参数重复抽帧会直接命中缓存，完全跳过 ffprobe / ffmpeg。
+
+    Args:
+        video_path: 视频文件路径
+        settings: 设置（抽帧模式、并发数、调试落盘），为空时使用默认设置
+        mode: 抽帧模式（auto | seek | keyframe | fps | scene），为空时使用 settings.sampling_mode
+    """
+    settings = settings or Settings()
+    mode = mode or settings.sampling_mode
+    if mode != AUTO_MODE and mode not in SAMPLING_MODES:
+        raise ValueError(
+            f"不支持的抽帧模式: {mode}，可选: {', '.join((AUTO_MODE, *SAMPLING_MODES))}"
+        )
+    target_max = 96
+    fingerprint = await asyncio.to_thread(video_fingerprint, video_path)
+
+    # 查询帧缓存
+    cache = _get_frame_cache(settings)
+    cache_key: Optional[str] = None
+    if cache is not None:
+        params = {
+            "mode": mode,
+            "target_max": target_max,
+            "width": FRAME_WIDTH,
+            "selection": settings.frame_selection,
+            "min_distance": settings.selection_min_distance,
+        }
+        if mode == "scene":
+            params["scene_threshold"] = settings.scene_threshold
+        cache_key = cache.make_key(fingerprint, params)
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            print(f"  → 帧缓存命中: {len(cached.frames)} 帧 ({_format_cache_stats(cache)})")
+            return await _finish_sampling(
+                video_path,
+                settings,
+                cached.frames,
+                cached.meta.get("mode", mode),
+                0.0,
+            )
+        print(f"  → 帧缓存未命中 ({_format_cache_stats(cache)})")
 
     # 检查 ffmpeg 是否可用
     ffmpeg_cmd = await _check_ffmpeg()
 
-    frames_root = video_path.parent / "frames"
-    frames_dir = frames_root / video_path.stem
-    frames_dir.mkdir(parents=True, exist_ok=True)
+    # 一次 ffprobe 探测时长、编码、分辨率、关键帧间隔（按指纹缓存）
+    info = await _probe_video(video_path, fingerprint)
+    duration = info.duration
+    target_count = _decide_target_count(duration)
+    scale = scale_filter(info)
+    if mode == AUTO_MODE:
+        mode = choose_sampling_mode(info, target_count)
+        print(
+            f"  → 自动选择抽帧模式: {mode} "
+            f"(编码 {info.codec or '未知'}，关键帧间隔 {info.keyframe_interval or '未知'}s)"
+        )
+
+    started = time.perf_counter()
+    frames: List[Frame] = []
+    failures: List[str] = []  # 失败的时间点 / 分段，结果不完整时不写入缓存
+    if mode == "seek":
+        timestamps = plan_timestamps(duration, target_count)
+        print(f"  → 定位抽帧: {len(timestamps)} 个时间点 (并发 {settings.seek_concurrency})")
+        frames = await extract_seek_frames(
+            ffmpeg_cmd,
+            video_path,
+            timestamps,
+            concurrency=settings.seek_concurrency,
+            scale=scale,
+            gray=settings.gray_thumbnails,
+            failures=failures,
+        )
+    elif mode == "keyframe":
+        print("  → 关键帧抽帧: 仅解码 I 帧")
+        frames = await _run_decode(
+            ffmpeg_cmd, video_path, duration, settings, scale=scale, failures=failures
+        )
+        print(f"  → 关键帧数: {len(frames)}")
+        frames = evenly_sample(frames, target_count)
+    elif mode == "scene":
+        print(f"  → 场景切换抽帧: 阈值 {settings.scene_threshold}")
+        frames = await _run_decode(
+            ffmpeg_cmd, video_path, duration, settings, scale=scale, scene=True, failures=failures
+        )
+        print(f"  → 场景切换帧数: {len(frames)}")
+        if len(frames) < SCENE_MIN_FRAMES:
+            # 几乎没有镜头切换（或阈值过高），场景帧不足以覆盖视频内容
+            print(f"  [WARNING] 场景切换帧少于 {SCENE_MIN_FRAMES} 帧")
+            frames = []
+
+    if not frames and mode != "fps":
+        print(f"  [WARNING] {mode} 模式未生成足够的帧，回退到全量解码模式")
+        mode = "fps"
+        failures.clear()  # 结果只来自回退的全量解码
+
+    if not frames:
+        fps = _decide_sampling_fps(duration)
+        frames = await _run_decode(
+            ffmpeg_cmd, video_path, duration, settings, fps=fps, scale=scale, failures=failures
+        )
 
-    # 清理旧帧
-    for existing in frames_dir.glob("*.jpg"):
+    extract_seconds = time.perf_counter() - started
+    print(f"  → 原始帧数: {len(frames)} (模式 {mode}，耗时 {extract_seconds:.2f}s)")
+
+    if not frames:
+        raise RuntimeError(f"抽帧失败：未生成任何帧。视频: {video_path}")
+
+    # 去重（哈希计算在进程池中执行）和限制
+    frames = await _deduplicate_frames(frames, settings.dedup_workers)
+    print(f"  → 去重后: {len(frames)} 帧")
+
+    frames = await asyncio.to_thread(_select_frames, frames, target_max, settings)
+    print(f"  → 最终采样: {len(frames)} 帧 (最大 {target_max})")
+
+    if failures and cache is not None:
+        print(f"  [WARNING] 抽帧结果不完整（{len(failures)} 处失败），不写入帧缓存")
+    elif cache is not None and cache_key is not None:
+        meta = {"mode": mode, "duration": duration, "extract_seconds": extract_seconds}
         try:
-            existing.unlink()
-        except Exception:
-            continue
+            await asyncio.to_thread(cache.put, cache_key, frames, meta)
+        except OSError as e:  # 缓存写入失败不影响本次抽帧结果
+            print(f"  [WARNING] 帧缓存写入失败: {e}")
 
-    # 获取视频时长
-    duration = await _probe_duration(video_path)
-    fps = _decide_sampling_fps(duration)
-    target_max = 96
+    return await _finish_sampling(video_path, settings, frames, mode, extract_seconds)
 
-    # 构建 ffmpeg 命令
-    cmd = [
-        ffmpeg_cmd,
-        "-hide_banner",
-        "-loglevel",
-        "error",
-        "-i",
-        str(video_path),
-        "-vf",
-        f"fps={fps:.4f},scale=640:-1",
-        "-vsync",
-        "vfr",
-        str(frames_dir / "frame_%05d.jpg"),
-    ]
 
+async def _finish_sampling(
+    video_path: Path,
+    settings: Settings,
+    frames: List[Frame],
+    mode: str,
+    extract_seconds: float,
+) -> FrameSampleResult:
+    """按需调试落盘并组装抽帧结果."""
+    frames_dir: Optional[Path] = None
+    if settings.persist_frames:
+        frames_dir = frames_dir_for(video_path)
+        await asyncio.to_thread(persist_frames, frames, frames_dir)
+        print(f"  → 调试落盘: {frames_dir}")
+
+    return FrameSampleResult(
+        directory=frames_dir,
+        frames=frames,
+        mode=mode,
+        extract_seconds=extract_seconds,
+    )
+
+
+def _get_frame_cache(settings: Settings) -> Optional[FrameCache]:
+    """获取（按目录和容量复用的）帧缓存实例，未开启时返回 None."""
+    if not settings.frame_cache_enabled:
+        return None
+    key = (settings.frame_cache_dir, settings.frame_cache_max_mb)
+    cache = _FRAME_CACHES.get(key)
+    if cache is None:
+        cache = FrameCache(
+            Path(settings.frame_cache_dir), settings.frame_cache_max_mb * 1024 * 1024
+        )
+        _FRAME_CACHES[key] = cache
+    return cache
+
+
+def _format_cache_stats(cache: FrameCache) -> str:
+    stats = cache.stats()
+    return (
+        f"累计命中 {stats['hits']} / 未命中 {stats['misses']}，"
+        f"节省抽帧 {stats['saved_seconds']:.2f}s"
+    )
+
+
+async def _run_decode(
+    ffmpeg_cmd: str,
+    video_path: Path,
+    duration: float,
+    settings: Settings,
+    fps: Optional[float] = None,
+    scale: Optional[str] = DEFAULT_SCALE,
+    scene: bool = False,
+    failures: Optional[List[str]] = None,
+) -> List[Frame]:
+    """keyframe（默认）/ fps（传入 fps）/ scene（scene=True）模式解码；长视频分段并行解码.
+
+    跳过的分段追加到 ``failures``（可选）。
+    """
+    scene_threshold = settings.scene_threshold if scene else None
+    gray = settings.gray_thumbnails
+    segments = plan_segments(duration, settings.segment_threshold, settings.segment_count)
+    if not segments:
+        if scene_threshold is not None:
+            cmd = build_scene_command(
+                ffmpeg_cmd, video_path, scene_threshold, scale=scale, gray=gray
+            )
+            return await _run_ffmpeg(cmd, scene=True)
+        if fps:
+            cmd = build_fps_command(ffmpeg_cmd, video_path, fps, scale=scale, gray=gray)
+            return await _run_ffmpeg(cmd, fps=fps)
+        return await _run_ffmpeg(
+            build_keyframe_command(ffmpeg_cmd, video_path, scale=scale, gray=gray)
+        )
+
+    print(f"  → 分段并行解码: {len(segments)} 段，每段 {segments[0][1]:.0f}s")
+    try:
+        frames = await extract_segmented_frames(
+            ffmpeg_cmd,
+            video_path,
+            segments,
+            fps=fps,
+            scale=scale,
+            scene_threshold=scene_threshold,
+            gray=gray,
+            failures=failures,
+        )
+        print("  ✓ ffmpeg 执行成功")
+    except VideoProcessingError as e:
+        print(f"  ✗ ffmpeg 执行失败: {e}")
+        raise RuntimeError(str(e)) from e
+    return frames
+
+
+async def _run_ffmpeg(
+    cmd: List[str],
+    fps: Optional[float] = None,
+    scene: bool = False,
+) -> List[Frame]:
+    """执行输出 MJPEG 管道的 ffmpeg 命令（keyframe / fps / scene 模式），返回内存帧."""
     print(f"  → 执行命令: {' '.join(cmd)}")
 
     # 执行抽帧命令
     try:
-        result = await asyncio.to_thread(
-            subprocess.run,
-            cmd,
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        if scene:
+            frames = await extract_scene_frames(cmd)
+        else:
+            frames = await extract_stream_frames(cmd, fps=fps)
         print(f"  ✓ ffmpeg 执行成功")
-        if result.stderr:
-            print(f"  [dim]stderr: {result.stderr[:200]}[/]")
-    except subprocess.CalledProcessError as e:
-        print(f"  ✗ ffmpeg 执行失败:")
-        print(f"    返回码: {e.returncode}")
-        print(f"    stderr: {e.stderr}")
-        raise RuntimeError(f"视频抽帧失败: {e.stderr}") from e
+    except VideoProcessingError as e:
+        print(f"  ✗ ffmpeg 执行失败: {e}")
+        raise RuntimeError(str(e)) from e
     except Exception as e:
         print(f"  ✗ 未知错误: {e}")
         raise
 
-    # 收集生成的帧
-    frames = sorted(frames_dir.glob("*.jpg"))
-    print(f"  → 原始帧数: {len(frames)}")
-
-    if not frames:
-        raise RuntimeError(f"抽帧失败：未生成任何帧文件。目录: {frames_dir}")
-
-    # 去重和限制
-    frames = _deduplicate_frames(frames)
-    print(f"  → 去重后: {len(frames)} 帧")
-
-    frames = _limit_frames(frames, target_max)
-    print(f"  → 最终采样: {len(frames)} 帧 (最大 {target_max})")
-
-    return FrameSampleResult(directory=frames_dir, frames=frames)
+    return frames
 
 
 async def extract_transcript(settings: Settings, video_path: Path) -> str:
@@ -207,6 +430,66 @@ async def extract_transcript(settings: Settings, video_path: Path) -> str:
         return ""
 
 
+def _aggregate_batch_labels(sub_results: Sequence[Dict[str, Any]]) -> tuple[List[str], float]:
+    """汇总一个子任务的所有批次结果：标签按出现频率取前 3，置信度取平均."""
+    from collections import Counter
+
+    all_labels = []
+    all_confidences = []
+    for result in sub_results:
+        if result and isinstance(result, dict):
+            labels = result.get("labels", [])
+            if labels:
+                all_labels.extend(labels)
+            conf = result.get("confidence", 0.0)
+            if conf > 0:
+                all_confidences.append(conf)
+
+    # 标签去重并按出现频率排序（取前3个最常见的）
+    if all_labels:
+        final_labels = [label for label, count in Counter(all_labels).most_common(3)]
+    else:
+        final_labels = ["未知"]
+
+    avg_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
+    return final_labels, avg_confidence
+
+
+def _print_request_stats(context: PipelineContext) -> None:
+    """输出自适应并发和多 Key 池的统计."""
+    print(f"[INFO] {context.limiter.summary()}")
+    key_pool = getattr(context.client, "key_pool", None)
+    if key_pool is not None:
+        print(f"[INFO] {key_pool.summary()}")
+
+
+async def _encode_frame_assignments(
+    frames: Sequence[FrameLike],
+    frame_assignments: Dict[str, List[FrameLike]],
+    profiles: Dict[str, FrameProfile],
+) -> Dict[str, List[FrameLike]]:
+    """按子任务的帧编码档位替换预分配的帧，每个档位每帧只编码一次."""
+    profile_of = {key: profiles.get(key, FrameProfile()) for key in frame_assignments}
+    if all(p.is_passthrough for p in profile_of.values()):
+        return frame_assignments
+
+    encoder = FrameEncoder()
+    encoded = await encoder.prepare(frames, list(profile_of.values()))
+    if encoder.bytes_in:
+        print(
+            f"[INFO] 帧编码: {encoder.bytes_in / 1024:.0f} KB → {encoder.bytes_out / 1024:.0f} KB "
+            f"({encoder.bytes_out / encoder.bytes_in:.0%})"
+        )
+    # 原始帧 → 编码后帧（Frame 按对象身份哈希）
+    mapping = {
+        profile: dict(zip(frames, encoded_frames)) for profile, encoded_frames in encoded.items()
+    }
+    return {
+        key: [mapping[profile_of[key]].get(frame, frame) for frame in batch]
+        for key, batch in frame_assignments.items()
+    }
+
+
 async def analyze_tasks_stub() -> Dict[str, Any]:
     # 占位：返回伪标签，便于前后端打通
     return {
@@ -222,7 +505,8 @@ async def analyze_tasks(
     task_prompts: Dict[str, str],
     settings: Settings,
     progress_callback=None,
-) -> tuple[Dict[str, Any], Dict[str, List[Path]]]:
+    context: Optional[PipelineContext] = None,
+) -> tuple[Dict[str, Any], Dict[str, List[FrameLike]]]:
     """分析视频任务.
 
     Args:
@@ -230,73 +514,116 @@ async def analyze_tasks(
         task_prompts: 任务提示词字典
         settings: 设置
         progress_callback: 进度回调函数，接收 (task_key, status, result) 参数
+        context: 批量运行共享的上下文（None 则为本次调用临时创建）
 
     Returns:
         (标签字典, 帧批次字典)
     """
-    client = GeminiClient(
-        base_url=settings.gemini_base_url,
-        api_key=settings.gemini_api_key,
-        transport=settings.llm_transport,
-        timeout=settings.request_timeout,
-    )
+    if context is None:
+        async with PipelineContext(settings) as context:
+            return await _analyze_tasks(
+                context, frame_result, task_prompts, settings, progress_callback
+            )
+    return await _analyze_tasks(context, frame_result, task_prompts, settings, progress_callback)
+
+
+async def _analyze_tasks(
+    context: PipelineContext,
+    frame_result: FrameSampleResult,
+    task_prompts: Dict[str, str],
+    settings: Settings,
+    progress_callback=None,
+) -> tuple[Dict[str, Any], Dict[str, List[FrameLike]]]:
+    """使用上下文中的客户端分析视频任务（参数与返回值同 analyze_tasks）."""
+    # 所有子任务的请求共享同一个客户端的连接池
+    client = context.client
     frames = frame_result.frames
-    frame_assignments = _build_frame_batches(frames, list(task_prompts.keys()))
+    # 所有子任务共享一个批次规划器：确定性分批，每帧的 base64 载荷只编码一次
+    planner = BatchPlanner(frames, settings.analysis_batch_seed)
+
+    # 合并模式：一个请求同时回答所有子任务（analysis_tasks.yaml: analysis_mode: merged）
+    merged = load_merged_options(context.tasks_file)
+    if merged:
+        return await _analyze_tasks_merged(
+            context, frames, task_prompts, settings, merged, planner, progress_callback
+        )
 
-    semaphore = asyncio.Semaphore(settings.max_concurrency or 1)
+    frame_assignments = _build_frame_batches(
+        frames, list(task_prompts.keys()), rng=planner.rng("assign")
+    )
+    profiles = load_frame_profiles(context.tasks_file)
+    frame_assignments = await _encode_frame_assignments(frames, frame_assignments, profiles)
+
+    # 自适应并发：按 429 / 5xx / 延迟动态调整在途请求数，上限在整个批量运行中延续
+    limiter = context.limiter
     completed_count = 0
     total_count = len(task_prompts)
 
-    async def _one(key: str, prompt: str, batch: List[Path]) -> tuple[str, Any]:
+    async def _one(key: str, prompt: str, batch: List[FrameLike]) -> tuple[str, Any]:
         nonlocal completed_count
 
-        # 使用预分配的帧；若为空则回退为全量
-        available_frames = list(batch) if batch else list(frames)
+        # 使用预分配的帧；若为空则回退为全量（回退时同样按档位编码）
+        if not batch:
+            batch = (await _encode_frame_assignments(frames, {key: list(frames)}, profiles))[key]
+        available_frames = list(batch)
         print(f"    [INFO] {key}: 使用 {len(available_frames)} 帧进行分批分析")
 
         # 通知开始
         if progress_callback:
             progress_callback(key, "start", {"frames": len(available_frames)})
 
-        # 打乱帧顺序（每个子任务独立打乱，增加多样性）
-        import random
-        shuffled_frames = available_frames.copy()
-        random.shuffle(shuffled_frames)
-
         # 计算批次：从配置读取 batch_size（Free Tier 默认 20，上限 50）
+        # 拼图模式下每张图片含 N×N 帧，一个请求覆盖的帧数相应放大
         batch_size = settings.analysis_batch_size
-        frame_chunks = [
-            shuffled_frames[i : i + batch_size]
-            for i in range(0, len(shuffled_frames), batch_size)
-        ]
+        grid = settings.contact_sheet_grid
+        frames_per_call = batch_size * grid * grid if grid else batch_size
+        # 按种子确定性打乱（每个子任务的顺序不同，增加多样性）；逐帧发送时预先附带 base64 载荷
+        frame_chunks = planner.plan(available_frames, frames_per_call, key)
+        if not grid:
+            frame_chunks = planner.attach_payloads(frame_chunks)
         num_calls = len(frame_chunks)
         frames_used = sum(len(chunk) for chunk in frame_chunks)
 
-        print(f"    [INFO] {key}: 打乱后分成 {num_calls} 批，每批 ≤ {batch_size} 帧")
+        if grid:
+            print(
+                f"    [INFO] {key}: 打乱后分成 {num_calls} 批，每批 ≤ {batch_size} 张 {grid}×{grid} 拼图"
+            )
+        else:
+            print(f"    [INFO] {key}: 打乱后分成 {num_calls} 批，每批 ≤ {batch_size} 帧")
         print(f"    [INFO] {key}: 总计将使用 {frames_used} 帧（覆盖率 {frames_used}/{len(available_frames)}）")
 
         # 定义单批次调用函数
-        async def _call_one_batch(batch_idx: int, frame_batch: List[Path]) -> Dict[str, Any]:
-            async with semaphore:
-                try:
-                    print(f"      [DEBUG] {key} 批次{batch_idx+1}/{num_calls}: 调用模型 ({len(frame_batch)} 帧)")
+        async def _call_one_batch(batch_idx: int, frame_batch: List[FrameLike]) -> Dict[str, Any]:
+            try:
+                user_text = prompt
+                images = frame_batch
+                if grid:
+                    images = await tile_frames_async(frame_batch, grid, settings.contact_sheet_tile)
+                    user_text = prompt + contact_sheet_hint(grid)
+                print(
+                    f"      [DEBUG] {key} 批次{batch_idx+1}/{num_calls}: 调用模型 "
+                    f"({len(frame_batch)} 帧，{len(images)} 张图片)"
+                )
 
+                async with limiter.slot():
                     raw = await client.classify_json(
                         model=settings.model_flash,
                         system_prompt="严格输出JSON，不得多余文本。",
-                        user_text=prompt,
-                        images=frame_batch,
+                        user_text=user_text,
+                        images=images,
                         response_json=True,
                         temperature=0.1,
                         extra={"max_output_tokens": 512},
                     )
-                    data = parse_json_loose(raw)
-                    result = data or {"labels": [], "confidence": 0.0}
-                    print(f"      [SUCCESS] {key} 批次{batch_idx+1}: 返回 {len(result.get('labels', []))} 个标签")
-                    return result
-                except Exception as e:
-                    print(f"      [ERROR] {key} 批次{batch_idx+1} 失败: {e}")
-                    return {"labels": [], "confidence": 0.0, "error": str(e)}
+                data = parse_json_loose(raw)
+                result = data or {"labels": [], "confidence": 0.0}
+                print(
+                    f"      [SUCCESS] {key} 批次{batch_idx+1}: 返回 {len(result.get('labels', []))} 个标签"
+                )
+                return result
+            except Exception as e:
+                print(f"      [ERROR] {key} 批次{batch_idx+1} 失败: {e}")
+                return {"labels": [], "confidence": 0.0, "error": str(e)}
 
         # 并发执行所有批次调用
         try:
@@ -305,29 +632,8 @@ async def analyze_tasks(
                 return_exceptions=False
             )
 
-            # 汇总结果：收集所有labels并统计频率
-            from collections import Counter
-            all_labels = []
-            all_confidences = []
-
-            for result in sub_results:
-                if result and isinstance(result, dict):
-                    labels = result.get("labels", [])
-                    if labels:
-                        all_labels.extend(labels)
-                    conf = result.get("confidence", 0.0)
-                    if conf > 0:
-                        all_confidences.append(conf)
-
-            # 标签去重并按出现频率排序（取前3个最常见的）
-            if all_labels:
-                label_counts = Counter(all_labels)
-                final_labels = [label for label, count in label_counts.most_common(3)]
-            else:
-                final_labels = ["未知"]
-
-            # 计算平均置信度
-            avg_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0.0
+            # 汇总结果：统计标签频率，计算平均置信度
+            final_labels, avg_confidence = _aggregate_batch_labels(sub_results)
 
             final_result = {
                 "labels": final_labels,
@@ -367,19 +673,119 @@ async def analyze_tasks(
     tasks = [_one(key, prompt, frame_assignments.get(key, [])) for key, prompt in task_prompts.items()]
     results_pairs = await asyncio.gather(*tasks)
     results: Dict[str, Any] = {key: value for key, value in results_pairs}
+    if planner.stats.uses:
+        print(f"[INFO] {planner.stats.summary()}")
+    _print_request_stats(context)
 
     tags = {k: (results[k].get("labels") or ["未知"]) for k in results}
     return tags, frame_assignments
 
 
-async def generate_names(name_prompt: str, settings: Settings, n: int) -> list:
-    client = GeminiClient(
-        base_url=settings.gemini_base_url,
-        api_key=settings.gemini_api_key,
-        transport=settings.llm_transport,
-        timeout=settings.request_timeout,
+async def _analyze_tasks_merged(
+    context: PipelineContext,
+    frames: Sequence[FrameLike],
+    task_prompts: Dict[str, str],
+    settings: Settings,
+    merged: MergedOptions,
+    planner: BatchPlanner,
+    progress_callback=None,
+) -> tuple[Dict[str, Any], Dict[str, List[FrameLike]]]:
+    """合并模式：每批帧只发送一次，组合提示词同时回答所有子任务.
+
+    每个子任务的标签仍按批次统计频率（取前 3）。
+
+    Returns:
+        (标签字典, 帧批次字典)；所有子任务共用同一组帧
+    """
+    client = context.client
+    keys = list(task_prompts)
+    prompt = build_merged_prompt(task_prompts)
+    encoder = FrameEncoder()
+    used = (await encoder.prepare(frames, [merged.frame_profile]))[merged.frame_profile]
+
+    batch_size = merged.batch_size or settings.analysis_batch_size
+    grid = settings.contact_sheet_grid
+    frames_per_call = batch_size * grid * grid if grid else batch_size
+    frame_chunks = planner.plan(used, frames_per_call, MERGED_TASK_KEY)
+    if not grid:
+        frame_chunks = planner.attach_payloads(frame_chunks)
+    num_calls = len(frame_chunks)
+    print(f"    [INFO] 合并模式: {len(keys)} 个子任务共用 {num_calls} 次调用（{len(used)} 帧）")
+
+    if progress_callback:
+        for key in keys:
+            progress_callback(key, "start", {"frames": len(used)})
+
+    limiter = context.limiter
+
+    async def _call_one_batch(batch_idx: int, frame_batch: List[FrameLike]) -> Dict[str, Any]:
+        try:
+            user_text = prompt
+            images = frame_batch
+            if grid:
+                images = await tile_frames_async(frame_batch, grid, settings.contact_sheet_tile)
+                user_text = prompt + contact_sheet_hint(grid)
+            print(
+                f"      [DEBUG] 合并批次{batch_idx+1}/{num_calls}: 调用模型 "
+                f"({len(frame_batch)} 帧，{len(images)} 张图片)"
+            )
+            async with limiter.slot():
+                raw = await client.classify_json(
+                    model=settings.model_flash,
+                    system_prompt="严格输出JSON，不得多余文本。",
+                    user_text=user_text,
+                    images=images,
+                    response_json=True,
+                    temperature=0.1,
+                    extra={"max_output_tokens": MERGED_MAX_TOKENS},
+                )
+            result = split_merged_response(parse_json_loose(raw), keys)
+            print(f"      [SUCCESS] 合并批次{batch_idx+1}: 返回 {len(result)} 个子任务结果")
+            return result
+        except Exception as e:
+            print(f"      [ERROR] 合并批次{batch_idx+1} 失败: {e}")
+            return {}
+
+    sub_results = await asyncio.gather(
+        *[_call_one_batch(idx, chunk) for idx, chunk in enumerate(frame_chunks)]
     )
-    raw = await client.name_candidates(
+    if planner.stats.uses:
+        print(f"[INFO] {planner.stats.summary()}")
+    _print_request_stats(context)
+
+    tags: Dict[str, Any] = {}
+    for done, (key, results) in enumerate(merged_task_results(sub_results, keys).items(), 1):
+        final_labels, avg_confidence = _aggregate_batch_labels(results)
+        tags[key] = final_labels
+        print(
+            f"    [SUCCESS] {key}: 汇总 {num_calls} 次调用 → {final_labels} (置信度: {avg_confidence:.2f})"
+        )
+        if progress_callback:
+            progress_callback(
+                key,
+                "done",
+                {
+                    "parsed": {
+                        "labels": final_labels,
+                        "confidence": avg_confidence,
+                        "total_calls": num_calls,
+                        "total_frames_available": len(used),
+                        "total_frames_used": len(used),
+                    },
+                    "progress": f"{done}/{len(keys)}",
+                },
+            )
+    return tags, {key: list(used) for key in keys}
+
+
+async def generate_names(
+    name_prompt: str, settings: Settings, n: int, context: Optional[PipelineContext] = None
+) -> list:
+    if context is None:
+        async with PipelineContext(settings) as context:
+            return await generate_names(name_prompt, settings, n, context)
+
+    raw = await context.client.name_candidates(
         model=settings.model_pro,
         system_prompt="仅输出JSON数组，元素为字符串。",
         user_text=name_prompt,
@@ -400,6 +806,7 @@ async def generate_names_with_styles(
     settings: Settings,
     style_ids: Optional[List[str]] = None,
     n_per_style: Optional[int] = None,
+    context: Optional[PipelineContext] = None,
 ) -> List[Dict[str, str]]:
     """使用命名风格系统生成候选名称.
 
@@ -408,32 +815,17 @@ async def generate_names_with_styles(
         settings: 配置
         style_ids: 指定的风格 ID 列表（None 则用配置默认值）
         n_per_style: 每个风格的候选数（None 则用配置默认值）
+        context: 批量运行共享的上下文（None 则为本次调用临时创建）
 
     Returns:
         候选名称列表，每个元素包含 {style_id, style_name, filename, language}
     """
-    # 加载风格配置
-    config_path = settings.get_style_config_path()
-    if not config_path.exists():
-        raise FileNotFoundError(f"Style config not found: {config_path}")
-
-    style_config = NamingStyleConfig.from_yaml(config_path)
-
-    # 创建 LLM 客户端
-    client = GeminiClient(
-        base_url=settings.gemini_base_url,
-        api_key=settings.gemini_api_key,
-        transport=settings.llm_transport,
-        timeout=settings.request_timeout,
-    )
-    llm_adapter = GeminiLLMAdapter(client, model_flash=settings.model_flash, model_pro=settings.model_pro)
+    if context is None:
+        async with PipelineContext(settings) as context:
+            return await generate_names_with_styles(tags, settings, style_ids, n_per_style, context)
 
-    # 创建生成器
-    generator = NamingGenerator(
-        llm_client=llm_adapter,
-        style_config=style_config,
-        model=settings.model_pro,
-    )
+    # 生成器（连同风格配置和客户端）由上下文持有，只在首次使用时创建
+    generator = context.naming_generator
 
     # 使用设置的风格或默认值
     if style_ids is None:
@@ -442,7 +834,7 @@ async def generate_names_with_styles(
     if n_per_style is None:
         n_per_style = settings.candidates_per_style
 
-    # 生成候选
+    # 生成候选（各风格的请求共享连接池）
     candidates = await generator.generate_candidates(
         analysis=tags,
         style_ids=style_ids,
@@ -468,150 +860,70 @@ async def store_feedback(selected_name: str, context: str) -> None:
         f.write(json.dumps({"name": selected_name, "context": context}, ensure_ascii=False) + "\n")
 
 
-async def _probe_duration(video_path: Path) -> float:
-    """获取视频时长（秒）."""
+async def _probe_video(video_path: Path, fingerprint: Optional[str] = None) -> VideoInfo:
+    """探测视频信息（时长、编码、分辨率、帧率、旋转、关键帧间隔）."""
     ffprobe_cmd = await _check_ffprobe()
-    
+
     try:
-        proc = await create_subprocess_exec(
-            ffprobe_cmd,
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(video_path),
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        stdout, stderr = await proc.communicate()
-        if proc.returncode != 0:
-            err_text = stderr.decode("utf-8", errors="ignore").strip()
-            raise RuntimeError(f"ffprobe exit {proc.returncode}: {err_text}")
-        return max(1.0, float(stdout.decode("utf-8").strip()))
+        info = await probe_video(ffprobe_cmd, video_path, fingerprint, timeout=30)
     except Exception as e:
-        print(f"  [警告] 无法获取视频时长: {e}，使用默认值 180 秒")
-        return 180.0
+        info = fallback_info(video_path)
+        print(f"  [警告] 无法探测视频信息: {e}，使用默认时长 {info.duration:.0f} 秒")
+        return info
+
+    width, height = info.display_size
+    print(
+        f"  → 视频信息: {info.duration:.1f}s, {info.codec or '未知编码'} "
+        f"{width}x{height} @ {info.fps:g}fps"
+    )
+    return info
 
 
-def _decide_sampling_fps(duration: float) -> float:
+def _decide_target_count(duration: float) -> int:
+    """按时长分档决定目标抽帧数."""
     if duration <= 120:
-        target = 48
-    elif duration <= 300:
-        target = 64
-    elif duration <= 900:
-        target = 80
-    else:
-        target = 96
-    fps = target / duration
-    return max(0.1, min(6.0, fps))
-
+        return 48
+    if duration <= 300:
+        return 64
+    if duration <= 900:
+        return 80
+    return 96
 
-def _deduplicate_frames(frames: Sequence[Path]) -> List[Path]:
-    """去重：MD5 完全相同 + pHash 内容相似."""
-    try:
-        import imagehash
-        from PIL import Image
 
-        use_phash = True
-        print(f"  [INFO] 去重算法: MD5 + pHash (汉明距离阈值 ≤ 5)")
-    except ImportError:
-        use_phash = False
-        print(f"  [WARNING] imagehash 未安装，仅使用 MD5 去重")
-
-    seen_md5: Dict[str, Path] = {}
-    seen_phash: Dict[str, Path] = {}
-    unique: List[Path] = []
-    removed_count = 0
-
-    for frame in frames:
-        try:
-            # 1. MD5 完全去重
-            digest = hashlib.md5(frame.read_bytes()).hexdigest()
-            if digest in seen_md5:
-                try:
-                    frame.unlink()
-                    removed_count += 1
-                except Exception:
-                    pass
-                continue
-
-            # 2. pHash 相似度去重（可选）
-            if use_phash:
-                try:
-                    img = Image.open(frame)
-                    phash = imagehash.phash(img)
-
-                    # 检查是否有相似帧
-                    is_similar = False
-                    for existing_hash in seen_phash.keys():
-                        distance = imagehash.hex_to_hash(existing_hash) - phash
-                        if distance <= 5:  # 汉明距离 ≤ 5 认为相似
-                            is_similar = True
-                            try:
-                                frame.unlink()
-                                removed_count += 1
-                            except Exception:
-                                pass
-                            break
-
-                    if not is_similar:
-                        seen_md5[digest] = frame
-                        seen_phash[str(phash)] = frame
-                        unique.append(frame)
-                except Exception as e:
-                    # pHash 失败，仅用 MD5
-                    print(f"  [WARNING] pHash 计算失败 {frame.name}: {e}")
-                    seen_md5[digest] = frame
-                    unique.append(frame)
-            else:
-                # 仅 MD5 去重
-                seen_md5[digest] = frame
-                unique.append(frame)
+def _decide_sampling_fps(duration: float) -> float:
+    fps = _decide_target_count(duration) / duration
+    return max(0.1, min(6.0, fps))
 
-        except Exception as e:
-            print(f"  [WARNING] 帧去重失败 {frame.name}: {e}")
-            continue
 
-    print(f"  [INFO] 去重结果: 原始 {len(frames)} 帧 → 保留 {len(unique)} 帧 (移除 {removed_count} 帧)")
+async def _deduplicate_frames(frames: Sequence[Frame], workers: int = 0) -> List[Frame]:
+    """去重：MD5 完全相同 + pHash 内容相似（直接处理内存帧字节）."""
+    unique, stats = await deduplicate_frames_async(frames, workers=workers)
+    if not stats.use_phash:
+        print(f"  [WARNING] imagehash 未安装，仅使用 MD5 去重")
+    print(f"  [INFO] {stats.summary()}")
     return unique
 
 
-def _limit_frames(frames: Sequence[Path], limit: int) -> List[Path]:
-    if len(frames) <= limit:
-        return list(frames)
-    return _evenly_sample(list(frames), limit)
-
-
-def _evenly_sample(items: Sequence[Path], target: int) -> List[Path]:
-    if not items:
-        return []
-    if len(items) <= target:
-        return list(items)
-    step = (len(items) - 1) / (target - 1)
-    selected = []
-    for i in range(target):
-        idx = int(round(i * step))
-        selected.append(items[idx])
-    # 去重保持顺序
-    seen: set[Path] = set()
-    ordered: List[Path] = []
-    for item in selected:
-        if item not in seen:
-            ordered.append(item)
-            seen.add(item)
-    return ordered
+def _select_frames(frames: Sequence[Frame], limit: int, settings: Settings) -> List[Frame]:
+    """选出最终帧：时间覆盖 + 多样性（或均匀抽样），最多 limit 帧."""
+    selected, stats = select_frames(
+        frames, limit, settings.frame_selection, settings.selection_min_distance
+    )
+    print(f"  [INFO] {stats.summary()}")
+    return selected
 
 
 def _build_frame_batches(
-    frames: Sequence[Path],
+    frames: Sequence[FrameLike],
     keys: Sequence[str],
     min_batch: int = 15,  # 提升：旧值 3
     max_batch: int = 20,  # 提升：旧值 8
-) -> Dict[str, List[Path]]:
-    """构建帧批次，大幅提升利用率到 70%+."""
-    import random
+    rng: Optional[random.Random] = None,
+) -> Dict[str, List[FrameLike]]:
+    """构建帧批次，大幅提升利用率到 70%+.
+
+    rng 用于打乱中间帧；传入批次规划器的随机数生成器时分配结果可复现。
+    """
 
     frames = list(frames)
     num_tasks = len(keys)
@@ -624,7 +936,7 @@ def _build_frame_batches(
         print(f"  [WARNING] 帧或任务为空，返回空批次")
         return {k: [] for k in keys}
 
-    batches: Dict[str, List[Path]] = {k: [] for k in keys}
+    batches: Dict[str, List[FrameLike]] = {k: [] for k in keys}
 
     # 策略1: 保留首尾帧（时间轴覆盖）
     if len(frames) >= 2:
@@ -638,7 +950,7 @@ def _build_frame_batches(
         middle_frames = []
 
     # 策略2: 随机打乱中间帧（增加多样性）
-    random.shuffle(middle_frames)
+    (rng or random).shuffle(middle_frames)
     print(f"  [INFO] 随机打乱: {len(middle_frames)} 个中间帧")
 
     # 策略3: 重新组合帧序列
@@ -678,7 +990,7 @@ def _build_frame_batches(
         # 确保至少有 min_batch 帧
         if len(batch) < min_batch and len(shuffled) >= min_batch:
             print(f"  [WARNING] 任务 {key} 只有 {len(batch)} 帧，补充到 {min_batch} 帧")
-            batch = _evenly_sample(shuffled, min_batch)
+            batch = evenly_sample(shuffled, min_batch)
 
         batches[key] = batch
         print(f"  [INFO]   ✓ {key}: {len(batch)} 帧")
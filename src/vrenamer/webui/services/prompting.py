@@ -1,36 +1,55 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Sequence
 
+from vrenamer.core.types import Frame, FrameLike
 
 PROMPTS_DIR = Path("prompts")
 
+# 分析子任务对应的提示词模块
+TASK_MODULES = ("role_archetype", "face_visibility", "scene_type", "positions")
+
+
+@dataclass(frozen=True)
+class PromptTemplates:
+    """提示词模板（基础系统提示词 + 各模块），读取一次后在批量运行中复用."""
+
+    base: str
+    modules: Dict[str, str]
+
+    @classmethod
+    def load(cls, prompts_dir: Path = PROMPTS_DIR) -> "PromptTemplates":
+        base = (prompts_dir / "base.system.md").read_text(encoding="utf-8")
+        modules = {
+            name: (prompts_dir / "modules" / f"{name}.md").read_text(encoding="utf-8")
+            for name in (*TASK_MODULES, "name_generator")
+        }
+        return cls(base=base, modules=modules)
+
 
 def compose_task_prompts(
-    frames_dir: Path,
+    frames_dir: Optional[Path],
     transcript: str,
     user_prompt: str,
-    frames: Optional[Sequence[Path]] = None,
+    frames: Optional[Sequence[FrameLike]] = None,
+    templates: Optional[PromptTemplates] = None,
 ) -> Dict[str, str]:
-    base = (PROMPTS_DIR / "base.system.md").read_text(encoding="utf-8")
-    def _read(name: str) -> str:
-        return (PROMPTS_DIR / "modules" / f"{name}.md").read_text(encoding="utf-8")
+    templates = templates or PromptTemplates.load()
+    base = templates.base
 
     if frames is not None:
-        frames_list = [str(p) for p in frames]
-    else:
+        frames_list = [p.name if isinstance(p, Frame) else str(p) for p in frames]
+    elif frames_dir is not None:
         frames_list = sorted([str(p) for p in frames_dir.glob("*.jpg")])
+    else:
+        frames_list = []
     frames_hint = "\n".join(frames_list[:12])
 
     shared = f"\n[FRAMES]\n{frames_hint}\n[TRANSCRIPT]\n{transcript[:4000]}\n"
 
-    tasks = {
-        "role_archetype": _read("role_archetype"),
-        "face_visibility": _read("face_visibility"),
-        "scene_type": _read("scene_type"),
-        "positions": _read("positions"),
-    }
+    tasks = {name: templates.modules[name] for name in TASK_MODULES}
 
     composed: Dict[str, str] = {}
     for k, v in tasks.items():
@@ -40,9 +59,15 @@ def compose_task_prompts(
     return composed
 
 
-def compose_name_prompt(tags: Dict[str, Any], user_prompt: str, n_candidates: int) -> str:
-    generator = (PROMPTS_DIR / "modules" / "name_generator.md").read_text(encoding="utf-8")
-    base = (PROMPTS_DIR / "base.system.md").read_text(encoding="utf-8")
+def compose_name_prompt(
+    tags: Dict[str, Any],
+    user_prompt: str,
+    n_candidates: int,
+    templates: Optional[PromptTemplates] = None,
+) -> str:
+    templates = templates or PromptTemplates.load()
+    generator = templates.modules["name_generator"]
+    base = templates.base
     content = base + "\n" + generator + f"\n[TAGS]\n{tags}\n[N]\n{n_candidates}\n"
     if user_prompt:
         content += "\n[USER_PROMPT]\n" + user_prompt
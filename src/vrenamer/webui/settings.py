@@ -9,16 +9,56 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     gemini_base_url: str = "http://localhost:3001/proxy/free"
     gemini_api_key: str = ""
+    # 多 Key 池：逗号分隔的多个 Key / 代理分组地址，数量相同时一一对应，其一只有一个时共用
+    gemini_api_keys: str = ""  # 为空时只用 gemini_api_key
+    gemini_base_urls: str = ""  # 为空时只用 gemini_base_url
+    key_rpm: int = 0  # 每个 Key 的每分钟请求数上限，0 表示不限
+    key_tpm: int = 0  # 每个 Key 的每分钟 token 上限（按提示词长度和图片数估算），0 表示不限
+    key_cooldown: float = 60.0  # Key 返回 429 后的冷却时间（秒）
     model_flash: str = "gemini-flash-latest"
     model_pro: str = "gemini-2.5-pro"
     llm_transport: str = "openai_compat"  # openai_compat | gemini_native
-    max_concurrency: int = 64  # 提升默认并发数，充分利用 GPT-Load 资源
+    llm_stream: bool = False  # 分析请求走 SSE 流式，收到完整 JSON 对象即返回（降低慢生成的尾延迟）
+    max_concurrency: int = 64  # 并发上限（自适应并发时为增长上界），充分利用 GPT-Load 资源
+    adaptive_concurrency: bool = True  # AIMD 自适应并发：健康时逐步加并发，429 / 5xx / 延迟突增时减半
+    initial_concurrency: int = 16  # 自适应并发的初始值
+    min_concurrency: int = 2  # 自适应并发的下界
     request_timeout: int = 30
-    retry: int = 3
+    retry: int = 3  # 单个请求的最大重试次数（429 / 5xx / 连接断开；超时最多 1 次）
+    retry_base_delay: float = 0.5  # 退避下限（秒），按去相关抖动递增
+    retry_max_delay: float = 20.0  # 单次退避上限（秒）；Retry-After 优先
+    retry_budget_ratio: float = 0.2  # 重试预算：每个请求补充的重试令牌
+    retry_budget_reserve: int = 20  # 重试预算：令牌初始值与上限，避免 429 放大成重试风暴
+    http_pool_limit: int = 100  # HTTP 连接池总连接数上限，0 表示不限
+    http_pool_limit_per_host: int = 64  # 单主机连接数上限（与 max_concurrency 匹配），0 表示不限
+    http_keepalive_timeout: float = 30.0  # 空闲连接保持时间（秒）
+    http_dns_cache_ttl: int = 300  # DNS 缓存时间（秒）
+    llm_trace: str = "off"  # 请求追踪：off | spans（每次请求的排队 / 建连 / 上传 / TTFB / 总耗时）| debug（另记脱敏后的请求 / 响应）
+    llm_trace_file: str = "logs/llm_trace.jsonl"  # 追踪记录输出（JSONL）
 
     # 分析配置（基于 Free Tier 实测：50 张可用，建议默认 20）
     analysis_batch_size: int = 20  # 每批次的帧数（Free Tier 保守策略）
     analysis_batch_size_max: int = 50  # 最大批次大小（Free Tier 实测上限）
+    contact_sheet_grid: int = 0  # 拼图模式：每 N×N 帧拼成一张宫格图（2-4），0 表示逐帧发送
+    contact_sheet_tile: int = 320  # 拼图单格长边像素
+    analysis_tasks_config: str = "config/analysis_tasks.yaml"  # 子任务配置（读取 frame_profiles 帧编码档位）
+    analysis_batch_seed: Optional[int] = None  # 分批随机种子，同一种子 + 同一组帧得到相同批次；None 表示由帧内容生成
+
+    # 抽帧配置
+    # auto（按编码自动选择）| seek（定位抽帧）| keyframe（仅解码关键帧）| fps（全量解码，回退）| scene（场景切换）
+    sampling_mode: str = "auto"
+    scene_threshold: float = 0.3  # scene 模式的场景分数阈值（0-1，越小取帧越多）
+    seek_concurrency: int = 8  # seek 模式同时运行的 ffmpeg 进程数
+    segment_threshold: float = 600.0  # keyframe / fps 模式超过该时长（秒）时分段并行解码
+    segment_count: int = 0  # 分段数，0 表示按 CPU 核数自动决定
+    frame_selection: str = "diverse"  # diverse（时间覆盖 + 多样性选择）| uniform（均匀抽样）
+    selection_min_distance: float = 0.08  # diverse：剩余帧与已选帧差异（0-1）低于该值时不再加帧，0 表示总是取满
+    gray_thumbnails: bool = True  # ffmpeg 同时输出 32×32 灰度缩略图，去重 pHash 不再解码 JPEG（仅 POSIX）
+    dedup_workers: int = 0  # 去重哈希计算的工作进程数，0 表示按 CPU 核数自动决定，1 表示不用进程池
+    persist_frames: bool = False  # 调试落盘：把最终帧写入 <视频目录>/frames/<文件名>/
+    frame_cache_enabled: bool = True  # 帧缓存：重复分析同一视频时跳过 ffmpeg
+    frame_cache_dir: str = ".cache/frames"  # 帧缓存目录
+    frame_cache_max_mb: int = 2048  # 帧缓存容量上限（MB），超出后按 LRU 淘汰
 
     # 命名风格配置
     naming_styles: str = "chinese_descriptive,scene_role,pornhub_style,concise"
@@ -37,6 +77,16 @@ class Settings(BaseSettings):
         """解析命名风格 ID 列表."""
         return [s.strip() for s in self.naming_styles.split(",") if s.strip()]
 
+    def get_api_keys(self) -> list[str]:
+        """解析 Key 列表（未配置多 Key 时为单个 gemini_api_key）."""
+        keys = [k.strip() for k in self.gemini_api_keys.split(",") if k.strip()]
+        return keys or [self.gemini_api_key]
+
+    def get_base_urls(self) -> list[str]:
+        """解析代理分组地址列表（未配置时为单个 gemini_base_url）."""
+        urls = [u.strip() for u in self.gemini_base_urls.split(",") if u.strip()]
+        return urls or [self.gemini_base_url]
+
     def get_style_config_path(self) -> Path:
         """获取命名风格配置文件路径."""
         return Path(self.naming_style_config)
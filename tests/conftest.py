@@ -1,6 +1,11 @@
 """pytest 配置和 fixtures."""
 
+import asyncio
+import json
+import threading
+
 import pytest
+from aiohttp import web
 from pathlib import Path
 from vrenamer.core.config import AppConfig, LLMBackendConfig
 
@@ -58,3 +63,128 @@ def sample_analysis_result():
         "scene_type": ["办公室"],
         "positions": ["传教士"],
     }
+
+
+class FakeClock:
+    """可控时钟：调用返回当前时间，sleep 直接推进时间而不真正等待."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock():
+    """可控时钟（Key 池限流、自适应并发等依赖时间的测试共用）."""
+    return FakeClock()
+
+
+class FakeLLMServer:
+    """本地 GPT-Load 替身：在后台线程运行 aiohttp 服务，离线测试 LLM 客户端.
+
+    支持 openai_compat（chat/completions，stream=true 时返回 SSE）和
+    gemini_native（generateContent / streamGenerateContent?alt=sse）。
+    流式响应把 ``content`` 按 ``chunk_size`` 切块发送，之后等待 ``tail_delay``
+    秒再发送 ``tail`` 和结束事件，模拟模型在 JSON 之后继续生成的慢尾巴。
+    """
+
+    def __init__(self):
+        self.content = '{"labels": ["卧室"], "confidence": 0.9}'
+        self.tail = "\n以上是分析结果。"
+        self.chunk_size = 8
+        self.tail_delay = 0.0
+        self.requests = []  # (path, query, body)
+        self.finished_streams = 0  # 完整发送到结束事件的流
+        self.url = ""
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+
+    def _events(self, transport, text):
+        if transport == "openai_compat":
+            return {"choices": [{"index": 0, "delta": {"content": text}}]}
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+    def _full(self, transport):
+        text = self.content + self.tail
+        if transport == "openai_compat":
+            return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+    async def _handle(self, request, transport, stream):
+        body = await request.json()
+        self.requests.append((request.path, request.query_string, body))
+        if not (stream or body.get("stream")):
+            return web.json_response(self._full(transport))
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        chunks = [
+            self.content[i : i + self.chunk_size]
+            for i in range(0, len(self.content), self.chunk_size)
+        ]
+
+        def _sse(text: str) -> bytes:
+            event = json.dumps(self._events(transport, text), ensure_ascii=False)
+            return f"data: {event}\n\n".encode()
+
+        for chunk in chunks:
+            await resp.write(_sse(chunk))
+        await asyncio.sleep(self.tail_delay)
+        await resp.write(_sse(self.tail))
+        if transport == "openai_compat":
+            await resp.write(b"data: [DONE]\n\n")
+        self.finished_streams += 1
+        return resp
+
+    async def _chat(self, request):
+        return await self._handle(request, "openai_compat", stream=False)
+
+    async def _native(self, request):
+        action = request.match_info["action"]
+        return await self._handle(
+            request, "gemini_native", stream=action == "streamGenerateContent"
+        )
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1beta/openai/chat/completions", self._chat)
+        app.router.add_post("/v1beta/models/{model}:{action}", self._native)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    def start(self):
+        ready = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        ready.wait(5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._loop.close()
+
+
+@pytest.fixture
+def fake_llm_server():
+    """本地 LLM 替身服务（离线测试 HTTP / 流式解析）."""
+    server = FakeLLMServer()
+    server.start()
+    yield server
+    server.stop()
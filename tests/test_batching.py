@@ -0,0 +1,61 @@
+"""测试批次规划与载荷缓存."""
+
+from __future__ import annotations
+
+import base64
+
+from vrenamer.core.types import Frame
+from vrenamer.llm.base import image_payload
+from vrenamer.services.batching import BatchPlanner
+
+
+def _frames(n: int = 30):
+    return [Frame(index=i + 1, data=b"jpeg-%03d" % i * 50, timestamp=float(i)) for i in range(n)]
+
+
+def _indices(batches):
+    return [[f.index for f in batch] for batch in batches]
+
+
+def test_plan_is_deterministic_per_video_and_task():
+    frames = _frames()
+
+    first = BatchPlanner(frames).plan(frames, 8, "positions")
+    again = BatchPlanner(_frames()).plan(_frames(), 8, "positions")
+    other_task = BatchPlanner(frames).plan(frames, 8, "scene_type")
+    other_seed = BatchPlanner(frames, seed=42).plan(frames, 8, "positions")
+
+    assert _indices(first) == _indices(again)  # 同一内容 → 同一批次
+    assert [len(b) for b in first] == [8, 8, 8, 6]
+    assert sorted(i for b in first for i in _indices([b])[0]) == list(range(1, 31))
+    assert _indices(other_task) != _indices(first)
+    assert _indices(other_seed) != _indices(first)
+
+
+def test_payload_encoded_once_and_shared_across_tasks():
+    frames = _frames(10)
+    planner = BatchPlanner(frames)
+
+    a = planner.attach_payloads(planner.plan(frames, 4, "a"))
+    b = planner.attach_payloads(planner.plan(frames, 4, "b"))
+
+    stats = planner.stats
+    size = len(base64.b64encode(frames[0].data))
+    assert (stats.frames, stats.uses, stats.reused) == (10, 20, 10)
+    assert stats.payload_bytes == 2 * stats.encoded_bytes == 20 * size
+    assert "复用 10 次" in stats.summary()
+    # 两个任务拿到的是同一帧对象，请求构建直接复用载荷
+    assert {id(f) for batch in a for f in batch} == {id(f) for batch in b for f in batch}
+    assert image_payload(a[0][0]) is a[0][0].payload
+
+
+def test_path_frames_are_loaded_once(tmp_path):
+    path = tmp_path / "frame_00001.jpg"
+    path.write_bytes(b"jpeg")
+    planner = BatchPlanner([path])
+
+    first = planner.attach_payloads([[path]])[0][0]
+    second = planner.attach_payloads([[path]])[0][0]
+
+    assert first is second and first.name == "frame_00001.jpg"
+    assert base64.b64decode(first.payload) == b"jpeg"
@@ -0,0 +1,75 @@
+"""测试分块 JSON 请求体：预编码载荷按引用拼接，序列化结果与 json 一致."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+
+from vrenamer.core.types import Frame
+from vrenamer.llm.body import EncodedImage, JsonBody
+from vrenamer.llm.client import GeminiClient
+
+
+def test_json_body_splices_payload_bytes_by_reference():
+    frame = Frame(index=1, data=b"\xff\xd8" + bytes(range(256)) * 40, mime_type="image/webp")
+    image = EncodedImage.of(frame, data_url=True)
+    body = {
+        "model": "flash",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": '描述\n"画面"'},
+                    {"type": "image_url", "image_url": {"url": image}},
+                ],
+            }
+        ],
+        "parts": [{"inline_data": {"mime_type": "image/webp", "data": EncodedImage.of(frame)}}],
+        "temperature": 0.2,
+        "stream": True,
+    }
+
+    encoded = JsonBody(body)
+    payload = base64.b64encode(frame.data).decode("ascii")
+
+    assert json.loads(bytes(encoded)) == {
+        **body,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": '描述\n"画面"'},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/webp;base64,{payload}"},
+                    },
+                ],
+            }
+        ],
+        "parts": [{"inline_data": {"mime_type": "image/webp", "data": payload}}],
+    }
+    assert encoded.size == len(bytes(encoded))
+    # 帧载荷编码一次缓存在帧上，请求体按引用使用同一个 bytes 对象
+    assert sum(chunk is frame.payload for chunk in encoded.chunks) == 2
+
+
+def test_native_request_body_reaches_server_intact(fake_llm_server):
+    frames = [Frame(index=i, data=bytes([i]) * 5000) for i in range(3)]
+
+    async def _run():
+        client = GeminiClient(fake_llm_server.url, "k", transport="gemini_native")
+        async with client:
+            for _ in range(2):
+                await client.classify_json(
+                    model="flash", system_prompt="json", user_text="p", images=frames
+                )
+
+    asyncio.run(_run())
+
+    for _, _, body in fake_llm_server.requests:
+        parts = body["contents"][0]["parts"]
+        assert [base64.b64decode(p["inline_data"]["data"]) for p in parts[1:]] == [
+            f.data for f in frames
+        ]
+    assert all(isinstance(f.payload, bytes) for f in frames)
@@ -0,0 +1,43 @@
+"""测试拼图模式."""
+
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from vrenamer.core.types import Frame
+from vrenamer.services.contact_sheet import build_contact_sheet, tile_frames
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _frame(index: int, timestamp: float, color) -> Frame:
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 360), color).save(buf, format="JPEG")
+    return Frame(index=index, data=buf.getvalue(), timestamp=timestamp)
+
+
+def test_contact_sheet_tiles_in_grid():
+    frames = [_frame(i, float(i), (i * 50, 0, 0)) for i in range(1, 5)]
+
+    sheet = build_contact_sheet(frames, grid=2, tile_edge=320)
+
+    img = Image.open(io.BytesIO(sheet.data))
+    assert img.size == (640, 360)  # 2×2 个 320×180 格子
+    assert (sheet.index, sheet.timestamp) == (1, 1.0)
+    # 右下角格子的中心来自第 4 帧
+    assert img.getpixel((480, 270))[0] == pytest.approx(200, abs=8)
+
+
+def test_tile_frames_orders_by_timestamp_and_keeps_single_leftover():
+    colors = {0: (255, 0, 0), 1: (0, 255, 0), 2: (0, 0, 255), 3: (255, 255, 255), 4: (0, 0, 0)}
+    # 打乱后的批次：拼图前按时间戳恢复顺序
+    frames = [_frame(i, float(i), colors[i]) for i in (3, 0, 4, 2, 1)]
+
+    sheets = tile_frames(frames, grid=2, tile_edge=160)
+
+    assert len(sheets) == 2
+    first = Image.open(io.BytesIO(sheets[0].data))
+    assert first.getpixel((120, 60))[0] > 200  # 左上格编号 1 → 时间戳 0（红色）
+    assert sheets[1] is frames[2]  # 最后剩下的单帧原样发送
@@ -0,0 +1,114 @@
+"""测试帧去重."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import random
+
+import pytest
+
+from vrenamer.core.types import Frame
+from vrenamer.services import dedup
+from vrenamer.services.dedup import HammingIndex, deduplicate_frames, deduplicate_frames_async
+
+
+def _jpeg(seed: int, brightness: int = 0) -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    pytest.importorskip("imagehash")
+    rng = random.Random(seed)
+    img = Image.new("L", (64, 36))
+    img.putdata([min(255, rng.randrange(256) + brightness) for _ in range(64 * 36)])
+    buf = io.BytesIO()
+    img.resize((640, 360)).convert("RGB").save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def test_hamming_index_matches_bit_count():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    index = HammingIndex(capacity=4)  # 触发扩容
+    for value in values:
+        index.add(value)
+
+    probe = rng.getrandbits(64)
+    expected = min(bin(probe ^ v).count("1") for v in values)
+    assert len(index) == 300
+    assert index.min_distance(probe) == expected
+    assert index.contains_within(values[42] ^ 0b111, 3)
+    assert HammingIndex().min_distance(probe) is None
+
+
+def test_deduplicate_removes_exact_and_similar_frames():
+    a, b = _jpeg(1), _jpeg(2)
+    frames = [
+        Frame(index=1, data=a),
+        Frame(index=2, data=a),  # 完全相同
+        Frame(index=3, data=_jpeg(1, brightness=3)),  # 轻微变化
+        Frame(index=4, data=b),
+    ]
+
+    unique, stats = deduplicate_frames(frames)
+
+    assert [f.index for f in unique] == [1, 4]
+    assert (stats.total, stats.kept, stats.exact, stats.similar) == (4, 2, 1, 1)
+    assert "帧/秒" in stats.summary()
+
+
+def test_async_dedup_in_process_pool_matches_serial(monkeypatch):
+    monkeypatch.setattr(dedup, "MIN_POOL_FRAMES", 0)
+    monkeypatch.setattr(dedup, "MIN_CHUNK_FRAMES", 2)
+    datas = [_jpeg(seed) for seed in (1, 2, 3)]
+    frames = [Frame(index=i, data=datas[i % 3] if i < 6 else _jpeg(i)) for i in range(8)]
+
+    try:
+        unique, stats = asyncio.run(deduplicate_frames_async(frames, workers=2))
+    finally:
+        dedup.shutdown_hash_pool()
+
+    expected, _ = deduplicate_frames(frames)
+    assert [f.index for f in unique] == [f.index for f in expected]
+    assert (stats.total, stats.exact) == (8, 3)
+
+
+def test_gray_thumbnails_hash_without_decoding_jpeg():
+    imagehash = pytest.importorskip("imagehash")
+    Image = pytest.importorskip("PIL.Image")
+    rng = random.Random(3)
+    grays = [bytes(rng.randrange(256) for _ in range(1024)) for _ in range(3)]
+
+    # 与 imagehash.phash 在同一 32×32 灰度图上的结果一致
+    expected = [int(str(imagehash.phash(Image.frombytes("L", (32, 32), g))), 16) for g in grays]
+    assert dedup.phash_from_gray(grays) == expected
+
+    # data 不是合法 JPEG：只有走灰度缩略图路径才能得到 pHash
+    frames = [
+        Frame(index=1, data=b"x1", gray=grays[0]),
+        Frame(index=2, data=b"x2", gray=grays[0]),
+        Frame(index=3, data=b"x3", gray=grays[1]),
+    ]
+    unique, stats = asyncio.run(deduplicate_frames_async(frames, workers=1))
+
+    assert [f.index for f in unique] == [1, 3]
+    assert stats.from_gray and stats.similar == 1 and stats.failed == 0
+
+
+def test_async_dedup_falls_back_when_executor_cancels(monkeypatch):
+    from concurrent.futures import Executor, Future
+
+    class CancellingPool(Executor):
+        """模拟另一个调用方关闭了共享进程池：已提交的任务被取消."""
+
+        def submit(self, fn, *args, **kwargs):
+            future = Future()
+            future.cancel()
+            return future
+
+    monkeypatch.setattr(dedup, "MIN_POOL_FRAMES", 0)
+    monkeypatch.setattr(dedup, "_get_pool", lambda workers: CancellingPool())
+    frames = [Frame(index=i, data=_jpeg(i % 2 + 1)) for i in range(4)]
+
+    unique, stats = asyncio.run(deduplicate_frames_async(frames, workers=2))
+
+    assert [f.index for f in unique] == [f.index for f in deduplicate_frames(frames)[0]]
+    assert stats.exact == 2
@@ -0,0 +1,253 @@
+"""测试抽帧引擎."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+from vrenamer.core.exceptions import VideoProcessingError
+from vrenamer.core.types import Frame
+from vrenamer.services import extractor
+from vrenamer.services.extractor import (
+    build_seek_command,
+    persist_frames,
+    plan_timestamps,
+    split_mjpeg,
+)
+
+
+def test_plan_timestamps_uniform_midpoints():
+    timestamps = plan_timestamps(100.0, 4)
+
+    assert timestamps == [12.5, 37.5, 62.5, 87.5]
+    assert all(0 < t < 100.0 for t in timestamps)
+
+
+def test_plan_timestamps_empty_inputs():
+    assert plan_timestamps(0.0, 10) == []
+    assert plan_timestamps(60.0, 0) == []
+
+
+def test_seek_command_uses_input_side_seek():
+    cmd = build_seek_command("ffmpeg", Path("v.mp4"), 12.5)
+
+    # -ss 必须出现在 -i 之前才会走输入端快速定位
+    assert cmd.index("-ss") < cmd.index("-i")
+    assert cmd[cmd.index("-frames:v") + 1] == "1"
+    assert cmd[-1] == "pipe:1"
+
+
+def _fake_jpeg(payload: bytes) -> bytes:
+    # SOI + DQT（表内容里故意放一个 FF D9）+ SOS + 熵编码数据（含 FF 00 转义）+ EOI
+    dqt = b"\xff\xdb\x00\x06\x00\xff\xd9\x01"
+    sos = b"\xff\xda\x00\x02"
+    return b"\xff\xd8" + dqt + sos + payload + b"\xff\x00" + b"\xff\xd9"
+
+
+def test_split_mjpeg_follows_segment_structure():
+    first, second = _fake_jpeg(b"\x10\x20"), _fake_jpeg(b"\x30")
+
+    frames = split_mjpeg(first + second + b"\xff\xd8\xff\xdb")  # 末尾为不完整帧
+
+    assert frames == [first, second]
+
+
+def test_extract_seek_frames_skips_failed_seeks(monkeypatch):
+    class DummyProc:
+        def __init__(self, ok: bool):
+            self.returncode = 0 if ok else 1
+
+        async def communicate(self):
+            return (_fake_jpeg(b"\x01") if self.returncode == 0 else b""), b""
+
+    async def fake_exec(*cmd, **kwargs):
+        # 模拟最后一个时间点定位失败
+        return DummyProc(ok=cmd[cmd.index("-ss") + 1] != "3.000")
+
+    monkeypatch.setattr(extractor, "create_subprocess_exec", fake_exec)
+
+    frames = asyncio.run(extractor.extract_seek_frames("ffmpeg", Path("v.mp4"), [1.0, 2.0, 3.0]))
+
+    assert [f.name for f in frames] == ["frame_00001.jpg", "frame_00002.jpg"]
+    assert [f.timestamp for f in frames] == [1.0, 2.0]
+    assert all(f.path is None for f in frames)
+
+
+def test_persist_frames_writes_only_final_frames(tmp_path):
+    (tmp_path / "frame_00009.jpg").write_bytes(b"stale")
+    frames = [Frame(index=2, data=b"a"), Frame(index=5, data=b"b")]
+
+    persist_frames(frames, tmp_path)
+
+    assert sorted(p.name for p in tmp_path.glob("*.jpg")) == ["frame_00002.jpg", "frame_00005.jpg"]
+    assert frames[1].path.read_bytes() == b"b"
+
+
+def test_keyframe_command_skips_non_intra_frames():
+    cmd = extractor.build_keyframe_command("ffmpeg", Path("v.mp4"))
+
+    # -skip_frame 是解码器输入选项，必须在 -i 之前
+    assert cmd[cmd.index("-skip_frame") + 1] == "nokey"
+    assert cmd.index("-skip_frame") < cmd.index("-i")
+
+
+def test_plan_segments_only_for_long_videos():
+    assert extractor.plan_segments(300.0, threshold=600.0, count=4) == []
+    assert extractor.plan_segments(1200.0, threshold=600.0, count=4) == [
+        (0.0, 300.0),
+        (300.0, 300.0),
+        (600.0, 300.0),
+        (900.0, 300.0),
+    ]
+
+
+def test_extract_segmented_frames_merges_in_time_order(monkeypatch):
+    class DummyProc:
+        returncode = 0
+
+        def __init__(self, count: int):
+            self.count = count
+
+        async def communicate(self):
+            return _fake_jpeg(b"\x01") * self.count, b""
+
+    launched = []
+
+    async def fake_exec(*cmd, **kwargs):
+        launched.append(cmd)
+        start = float(cmd[cmd.index("-ss") + 1])
+        # 后一段先返回也不影响合并顺序
+        if start == 0.0:
+            await asyncio.sleep(0.01)
+        return DummyProc(count=2)
+
+    monkeypatch.setattr(extractor, "create_subprocess_exec", fake_exec)
+
+    frames = asyncio.run(
+        extractor.extract_segmented_frames(
+            "ffmpeg", Path("v.mp4"), [(0.0, 10.0), (10.0, 10.0)], fps=0.5
+        )
+    )
+
+    assert [f.timestamp for f in frames] == [0.0, 2.0, 10.0, 12.0]
+    assert [f.index for f in frames] == [1, 2, 3, 4]
+    for cmd in launched:
+        assert cmd.index("-threads") < cmd.index("-ss") < cmd.index("-t") < cmd.index("-i")
+
+
+def test_extract_segmented_frames_reports_failed_segments(monkeypatch, caplog):
+    class DummyProc:
+        def __init__(self, ok: bool):
+            self.returncode = 0 if ok else 1
+
+        async def communicate(self):
+            return (_fake_jpeg(b"\x01") if self.returncode == 0 else b""), b"decode error"
+
+    async def fake_exec(*cmd, **kwargs):
+        # 第二段解码失败
+        return DummyProc(ok=cmd[cmd.index("-ss") + 1] != "10.000")
+
+    monkeypatch.setattr(extractor, "create_subprocess_exec", fake_exec)
+    failures = []
+
+    with caplog.at_level("WARNING", logger=extractor.__name__):
+        frames = asyncio.run(
+            extractor.extract_segmented_frames(
+                "ffmpeg", Path("v.mp4"), [(0.0, 10.0), (10.0, 10.0)], fps=0.5, failures=failures
+            )
+        )
+
+    assert [f.timestamp for f in frames] == [0.0]
+    assert len(failures) == 1 and failures[0].startswith("segment 10s+10s")
+    assert "10s" in caplog.text and "decode error" in caplog.text
+
+
+def test_run_process_kills_child_on_timeout(monkeypatch):
+    class HangingProc:
+        returncode = None
+        killed = False
+
+        async def communicate(self):
+            await asyncio.sleep(10)
+
+        def kill(self):
+            self.killed = True
+
+        async def wait(self):
+            return -9
+
+    proc = HangingProc()
+
+    async def fake_exec(*cmd, **kwargs):
+        return proc
+
+    monkeypatch.setattr(extractor, "create_subprocess_exec", fake_exec)
+
+    with pytest.raises(VideoProcessingError, match="超时"):
+        asyncio.run(extractor.run_process(["ffmpeg", "-i", "v.mp4"], timeout=0.01))
+    assert proc.killed
+
+
+def test_scene_command_scores_after_downscale():
+    cmd = extractor.build_scene_command(
+        "ffmpeg", Path("v.mp4"), threshold=0.4, scale="scale=640:-2"
+    )
+
+    vf = cmd[cmd.index("-vf") + 1]
+    assert vf == "scale=640:-2,select='eq(n,0)+gt(scene,0.4)',showinfo"
+    # showinfo 输出在 info 级别
+    assert cmd[cmd.index("-loglevel") + 1] == "info"
+
+
+def test_extract_scene_frames_uses_showinfo_timestamps(monkeypatch):
+    log = (
+        b"[Parsed_showinfo_2 @ 0x1] n:   0 pts:      0 pts_time:0       duration:1\n"
+        b"[Parsed_showinfo_2 @ 0x1] n:   1 pts: 192192 pts_time:12.012  duration:1\n"
+    )
+
+    class DummyProc:
+        returncode = 0
+
+        async def communicate(self):
+            return _fake_jpeg(b"\x01") + _fake_jpeg(b"\x02"), log
+
+    async def fake_exec(*cmd, **kwargs):
+        return DummyProc()
+
+    monkeypatch.setattr(extractor, "create_subprocess_exec", fake_exec)
+
+    frames = asyncio.run(extractor.extract_scene_frames(["ffmpeg"]))
+
+    assert [f.timestamp for f in frames] == [0.0, 12.012]
+
+
+def test_gray_command_splits_second_output():
+    cmd = extractor.build_fps_command("ffmpeg", Path("v.mp4"), 0.5, scale="scale=640:-1", gray=True)
+
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.startswith("[0:v]fps=0.5000,scale=640:-1,split=2[jpg][g]")
+    assert "format=gray" in graph
+    assert "-vf" not in cmd
+    # 两路输出各自带 -vsync；灰度输出写到占位管道
+    assert cmd.count("-vsync") == 2
+    assert cmd[-1] == "pipe:{gray_fd}"
+
+
+@pytest.mark.skipif(not extractor.gray_supported(), reason="需要 pass_fds")
+def test_extract_stream_frames_reads_gray_pipe():
+    # 用 Python 子进程模拟 ffmpeg：JPEG 写 stdout，灰度写到 pipe:N 指定的描述符
+    script = (
+        "import os, sys\n"
+        "fd = int(sys.argv[-1].split(':')[1])\n"
+        f"sys.stdout.buffer.write({_fake_jpeg(b'a') + _fake_jpeg(b'b')!r})\n"
+        "os.write(fd, bytes([1]) * 1024 + bytes([2]) * 1024)\n"
+    )
+    cmd = [sys.executable, "-c", script, "pipe:{gray_fd}"]
+
+    frames = asyncio.run(extractor.extract_stream_frames(cmd, fps=1.0))
+
+    assert [f.gray[:1] for f in frames] == [b"\x01", b"\x02"]
+    assert all(len(f.gray) == 1024 for f in frames)
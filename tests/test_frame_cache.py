@@ -0,0 +1,85 @@
+"""测试帧缓存."""
+
+from __future__ import annotations
+
+import os
+
+from vrenamer.core.types import Frame
+from vrenamer.services.frame_cache import FrameCache, video_fingerprint
+
+
+def _video(tmp_path, content: bytes = b"video-bytes"):
+    path = tmp_path / "v.mp4"
+    path.write_bytes(content)
+    return path
+
+
+def test_cache_roundtrip_counts_hits_and_misses(tmp_path):
+    video = _video(tmp_path)
+    cache = FrameCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    key = cache.make_key(video_fingerprint(video), {"mode": "seek", "target": 96})
+
+    assert cache.get(key) is None
+
+    frames = [Frame(index=1, data=b"a", timestamp=0.5), Frame(index=7, data=b"b", timestamp=3.5)]
+    cache.put(key, frames, {"mode": "seek", "extract_seconds": 2.5})
+    cached = cache.get(key)
+
+    assert [(f.name, f.data, f.timestamp) for f in cached.frames] == [
+        ("frame_00001.jpg", b"a", 0.5),
+        ("frame_00007.jpg", b"b", 3.5),
+    ]
+    assert cached.meta["mode"] == "seek"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "saved_seconds": 2.5}
+
+
+def test_cache_key_depends_on_params_and_content(tmp_path):
+    video = _video(tmp_path)
+    cache = FrameCache(tmp_path / "cache", max_bytes=1024)
+    fingerprint = video_fingerprint(video)
+    key = cache.make_key(fingerprint, {"mode": "seek"})
+
+    assert cache.make_key(fingerprint, {"mode": "keyframe"}) != key
+
+    stat = video.stat()
+    video.write_bytes(b"video-bytez")
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    # 大小和修改时间不变，内容变化仍会改变指纹
+    assert video_fingerprint(video) != fingerprint
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    video = _video(tmp_path)
+    cache = FrameCache(tmp_path / "cache", max_bytes=2500)
+    payload = [Frame(index=1, data=b"x" * 1000)]
+
+    old, recent, new = (cache.make_key(video_fingerprint(video), {"n": n}) for n in range(3))
+    cache.put(old, payload, {})
+    cache.put(recent, payload, {})
+    os.utime(cache.cache_dir / old / "meta.json", (0, 0))
+    os.utime(cache.cache_dir / recent / "meta.json", (1, 1))
+    cache.get(recent)  # 访问后成为最近使用
+    cache.put(new, payload, {})
+
+    assert cache.get(old) is None
+    assert cache.get(recent) is not None
+    assert cache.get(new) is not None
+
+
+def test_cache_concurrent_puts_do_not_fail(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    video = _video(tmp_path)
+    cache = FrameCache(tmp_path / "cache", max_bytes=8 * 1024)
+    fingerprint = video_fingerprint(video)
+    keys = [cache.make_key(fingerprint, {"n": n % 3}) for n in range(24)]
+    frames = [Frame(index=i, data=b"x" * 500) for i in range(4)]
+
+    # 相同键和不同键的写入交错进行，同时触发淘汰
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda key: cache.put(key, frames, {}), keys))
+
+    assert not [p.name for p in cache.cache_dir.iterdir() if p.name.startswith(".")]
+    for key in set(keys):
+        cached = cache.get(key)
+        assert cached is None or len(cached.frames) == 4
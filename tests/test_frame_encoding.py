@@ -0,0 +1,60 @@
+"""测试帧编码档位."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+
+import pytest
+
+from vrenamer.core.exceptions import ConfigError
+from vrenamer.core.types import Frame
+from vrenamer.services.frame_encoding import FrameEncoder, FrameProfile, load_frame_profiles
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg_frame(index: int = 1, size=(640, 360)) -> Frame:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (index * 40 % 255, 120, 200)).save(buf, format="JPEG", quality=95)
+    return Frame(index=index, data=buf.getvalue(), timestamp=float(index))
+
+
+def test_thumb_profile_downsizes_once_per_frame():
+    frames = [_jpeg_frame(1), _jpeg_frame(2)]
+    thumb = FrameProfile(max_edge=384, quality=75)
+    encoder = FrameEncoder()
+
+    encoded = asyncio.run(encoder.prepare(frames, [FrameProfile(), thumb, thumb]))
+
+    assert encoded[FrameProfile()] == frames  # 原图档位不重新编码
+    small = encoded[thumb]
+    assert [f.index for f in small] == [1, 2]
+    assert Image.open(io.BytesIO(small[0].data)).size == (384, 216)
+    assert encoder.bytes_out < encoder.bytes_in
+    # 同一（帧, 档位）再次编码直接复用
+    assert encoder.encode(frames, thumb)[0] is small[0]
+
+
+def test_webp_profile_sets_mime_type_and_name():
+    profile = FrameProfile(max_edge=320, quality=70, format="webp")
+    (encoded,) = FrameEncoder().encode([_jpeg_frame(3)], profile)
+
+    assert encoded.mime_type == "image/webp"
+    assert encoded.name == "frame_00003.webp"
+    assert Image.open(io.BytesIO(encoded.data)).format == "WEBP"
+
+
+def test_load_frame_profiles_resolves_task_references():
+    profiles = load_frame_profiles(
+        {
+            "frame_profiles": {"thumb": {"max_edge": 384, "quality": 75}},
+            "tasks": {"face": {"frame_profile": "thumb"}, "positions": {}},
+        }
+    )
+
+    assert profiles["face"] == FrameProfile(max_edge=384, quality=75)
+    assert profiles["positions"].is_passthrough
+
+    with pytest.raises(ConfigError):
+        load_frame_profiles({"tasks": {"face": {"frame_profile": "missing"}}})
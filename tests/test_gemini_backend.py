@@ -0,0 +1,80 @@
+"""测试 BaseLLMClient 接口的 Gemini 客户端：请求统一走 llm.client 传输层."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from vrenamer.core.config import LLMBackendConfig
+from vrenamer.core.exceptions import APIError
+from vrenamer.core.types import Frame
+from vrenamer.llm.gemini import GeminiClient
+
+
+def _config(url: str, **kwargs) -> LLMBackendConfig:
+    return LLMBackendConfig(base_url=url, api_key="k", retry=0, **kwargs)
+
+
+def test_backend_uses_shared_transport_for_classify_and_generate(fake_llm_server, tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    config = _config(
+        fake_llm_server.url,
+        transport="gemini_native",
+        llm_trace="spans",
+        llm_trace_file=str(trace_file),
+    )
+    frame = Frame(index=1, data=b"\xff\xd8" * 100)
+
+    async def _run():
+        async with GeminiClient(config, model_flash="flash-x", model_pro="pro-x") as client:
+            labels = await client.classify(prompt="分析", images=[frame], max_tokens=256)
+            names = await client.generate(prompt="命名")
+            return labels, names, client.http
+
+    labels, names, http = asyncio.run(_run())
+
+    assert "卧室" in labels and "卧室" in names
+    (path1, _, body1), (path2, _, _) = fake_llm_server.requests
+    assert path1.endswith("/flash-x:generateContent") and path2.endswith("/pro-x:generateContent")
+    assert body1["generation_config"]["max_output_tokens"] == 256
+    assert body1["contents"][0]["parts"][1]["inline_data"]["data"] == frame.payload.decode("ascii")
+    # 同一个连接池，追踪记录来自统一传输层
+    assert http.requests == 2 and http.reused == 1
+    assert len(trace_file.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_backend_raises_api_error_with_status(fake_llm_server):
+    async def _run():
+        async with GeminiClient(_config(fake_llm_server.url + "/missing")) as client:
+            await client.generate(prompt="命名")
+
+    with pytest.raises(APIError) as exc_info:
+        asyncio.run(_run())
+    assert exc_info.value.status_code == 404
+
+
+def test_empty_naming_response_yields_no_names(fake_llm_server):
+    from pathlib import Path
+
+    from vrenamer.naming import NamingGenerator, NamingStyleConfig
+
+    fake_llm_server.content = ""
+    fake_llm_server.tail = ""
+    style_config = NamingStyleConfig.from_yaml(Path("examples/naming_styles.yaml"))
+
+    async def _run():
+        async with GeminiClient(_config(fake_llm_server.url)) as client:
+            text = await client.generate(prompt="命名")
+            generator = NamingGenerator(client, style_config, model="pro")
+            candidates = await generator.generate_candidates(
+                {"scene": "卧室"}, style_ids=["chinese_descriptive", "scene_role"]
+            )
+            return text, candidates
+
+    text, candidates = asyncio.run(_run())
+
+    # 空输出不抛 APIError，各风格只是没有候选
+    assert text == ""
+    assert candidates == []
+    assert len(fake_llm_server.requests) == 3
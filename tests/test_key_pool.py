@@ -0,0 +1,116 @@
+"""测试多 Key 池：轮询分配、令牌桶限流和 429 冷却."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from vrenamer.core.exceptions import APIError
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.key_pool import KeyEndpoint, KeyPool
+from vrenamer.llm.retry import RetryPolicy
+
+
+def _pool(n: int, clock, **kwargs) -> KeyPool:
+    endpoints = [KeyEndpoint("http://proxy", f"k{i}") for i in range(n)]
+    return KeyPool(endpoints, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_requests_spread_across_least_loaded_keys(fake_clock):
+    clock = fake_clock
+    pool = _pool(3, clock)
+
+    async def _run():
+        leases = [await pool.acquire() for _ in range(6)]
+        names = [lease.name for lease in leases]
+        leases[0].release()
+        # key#1 负载最低，下一个请求分配给它
+        names.append((await pool.acquire()).name)
+        return names
+
+    names = asyncio.run(_run())
+
+    assert names[:6] == ["key#1", "key#2", "key#3"] * 2
+    assert names[6] == "key#1"
+
+
+def test_rate_limited_key_is_benched_until_cooldown(fake_clock):
+    clock = fake_clock
+    pool = _pool(2, clock, cooldown=30.0)
+
+    async def _run():
+        lease = await pool.acquire()
+        lease.release(APIError("quota", status_code=429, retry_after=5.0))
+        during = [(await pool.acquire()).name for _ in range(3)]
+        clock.now += 31.0
+        after = {(await pool.acquire()).name for _ in range(4)}
+        return lease.name, during, after
+
+    benched, during, after = asyncio.run(_run())
+
+    assert benched == "key#1"
+    assert during == ["key#2"] * 3
+    assert after == {"key#1", "key#2"}
+    assert pool.snapshot()[0]["rate_limited"] == 1
+
+
+def test_rpm_and_tpm_buckets_pace_requests(fake_clock):
+    clock = fake_clock
+    pool = _pool(2, clock, rpm=2)
+
+    async def _run(p, n, tokens=0):
+        for _ in range(n):
+            (await p.acquire(tokens)).release()
+
+    # 2 个 Key × 每分钟 2 次：前 4 次立即发出，第 5 次等 30 秒补充令牌
+    asyncio.run(_run(pool, 5))
+    assert clock.now == 30.0
+
+    # 单 Key 每分钟 6000 token：前 2 次立即发出，第 3 次等 30 秒
+    pool = _pool(1, clock, tpm=6000)
+    asyncio.run(_run(pool, 3, tokens=3000))
+    assert clock.now == 60.0
+
+
+def test_client_routes_around_rate_limited_key():
+    seen = []
+
+    async def chat(request: web.Request) -> web.Response:
+        key = request.headers["Authorization"].split()[-1]
+        seen.append(key)
+        if key == "bad":
+            return web.Response(status=429)
+        body = {"choices": [{"message": {"content": '{"labels": ["卧室"]}'}}]}
+        return web.Response(body=json.dumps(body).encode("utf-8"), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_post("/v1beta/openai/chat/completions", chat)
+
+    async def _sleep(seconds):
+        pass
+
+    async def _run():
+        async with TestServer(app) as server:
+            base = str(server.make_url("")).rstrip("/")
+            pool = KeyPool([KeyEndpoint(base, "bad"), KeyEndpoint(base, "good")])
+            client = GeminiClient(
+                "http://unused", "", key_pool=pool, retry_policy=RetryPolicy(sleep=_sleep)
+            )
+            async with client:
+                results = [
+                    await client.classify_json(
+                        model="flash", system_prompt="json", user_text="p", images=[]
+                    )
+                    for _ in range(3)
+                ]
+            return results, pool
+
+    results, pool = asyncio.run(_run())
+
+    assert all("卧室" in r for r in results)
+    # 第一次请求落到 bad 后被冷却，重试和后续请求都走 good
+    assert seen == ["bad", "good", "good", "good"]
+    assert pool.snapshot()[0]["cooling"]
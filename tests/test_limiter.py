@@ -0,0 +1,133 @@
+"""测试 AIMD 自适应并发限制器."""
+
+from __future__ import annotations
+
+import asyncio
+
+from vrenamer.core.exceptions import APIError
+from vrenamer.llm.limiter import AdaptiveLimiter
+
+
+async def _request(limiter: AdaptiveLimiter, clock, latency: float, status: int = 200):
+    try:
+        async with limiter.slot():
+            await asyncio.sleep(0)
+            clock.now += latency
+            if status != 200:
+                raise APIError("error", status_code=status)
+            # 传输层按单次 HTTP 请求上报延迟
+            limiter.record_latency(latency)
+    except APIError:
+        pass
+
+
+async def _timeout(limiter: AdaptiveLimiter):
+    try:
+        async with limiter.slot():
+            raise asyncio.TimeoutError()
+    except asyncio.TimeoutError:
+        pass
+
+
+def test_limit_grows_additively_while_healthy(fake_clock):
+    clock = fake_clock
+    limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=8, clock=clock)
+
+    async def _run():
+        for _ in range(40):
+            await _request(limiter, clock, 1.0)
+
+    asyncio.run(_run())
+
+    assert limiter.limit == 8
+    assert limiter.snapshot()["peak_limit"] == 8
+    assert limiter.snapshot()["latency_ms"] == 1000
+
+
+def test_burst_of_429s_halves_limit_once_per_round(fake_clock):
+    clock = fake_clock
+    limiter = AdaptiveLimiter(initial=16, min_limit=2, max_limit=64, clock=clock)
+
+    async def _run():
+        # 同一轮内 8 个请求同时 429，只减半一次
+        await asyncio.gather(*[_request(limiter, clock, 0.1, status=429) for _ in range(8)])
+        first = limiter.limit
+        # 下调之后开始的请求再次失败，再减半
+        await _request(limiter, clock, 0.1, status=503)
+        return first
+
+    first = asyncio.run(_run())
+
+    assert first == 8
+    assert limiter.limit == 4
+    assert limiter.overloads == 9
+    # 非过载错误和超时不影响上限
+    asyncio.run(_request(limiter, clock, 0.1, status=400))
+    asyncio.run(_timeout(limiter))
+    assert limiter.limit == 4
+    assert limiter.overloads == 9
+
+
+def test_latency_spike_cuts_limit_and_inflight_is_bounded(fake_clock):
+    clock = fake_clock
+    limiter = AdaptiveLimiter(initial=10, min_limit=1, max_limit=10, clock=clock)
+
+    async def _run():
+        for _ in range(6):
+            await _request(limiter, clock, 1.0)
+        await _request(limiter, clock, 5.0)
+
+    asyncio.run(_run())
+    assert limiter.latency_spikes == 1
+    assert limiter.limit == 5
+
+    fixed = AdaptiveLimiter.fixed(3)
+    peak = 0
+
+    async def _worker():
+        nonlocal peak
+        async with fixed.slot():
+            peak = max(peak, fixed.inflight)
+            await asyncio.sleep(0.01)
+
+    async def _burst():
+        await asyncio.gather(*[_worker() for _ in range(10)])
+
+    asyncio.run(_burst())
+    assert peak == 3
+    assert fixed.limit == 3 and fixed.inflight == 0
+
+
+def test_baseline_follows_sustained_latency_change(fake_clock):
+    clock = fake_clock
+    limiter = AdaptiveLimiter(initial=16, min_limit=2, max_limit=16, clock=clock)
+
+    async def _run():
+        for _ in range(50):
+            await _request(limiter, clock, 1.0)
+        # 批次变大后延迟整体上升：只在基线跟上之前下调有限次，之后恢复增长
+        for _ in range(500):
+            await _request(limiter, clock, 2.5)
+
+    asyncio.run(_run())
+
+    assert limiter.latency_spikes <= 3
+    assert limiter.snapshot()["latency_ms"] == 2500
+    assert limiter.limit == 16
+
+
+def test_slot_time_outside_http_attempts_is_not_latency(fake_clock):
+    clock = fake_clock
+    limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=8, clock=clock)
+
+    async def _run():
+        for _ in range(10):
+            await _request(limiter, clock, 1.0)
+        async with limiter.slot():
+            clock.now += 60.0  # Key 池冷却 / 重试退避
+            limiter.record_latency(1.0)
+
+    asyncio.run(_run())
+
+    assert limiter.latency_spikes == 0
+    assert limiter.limit == 8
@@ -0,0 +1,124 @@
+"""测试合并分析模式."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+import pytest
+import yaml
+
+from vrenamer.core.config import AnalysisConfig, AppConfig
+from vrenamer.core.exceptions import ConfigError
+from vrenamer.core.types import Frame
+from vrenamer.services.analysis import AnalysisService
+from vrenamer.services.merged_analysis import (
+    build_merged_prompt,
+    load_merged_options,
+    split_merged_response,
+)
+
+
+def test_merged_prompt_keeps_shared_text_once():
+    base = "系统说明第一行\n系统说明第二行\n"
+    shared = "\n[FRAMES]\nframe_00001.jpg\n[TRANSCRIPT]\n\n"
+    prompts = {
+        "scene_type": base + "任务：识别场景类型。\n候选：办公室、卧室\n" + shared,
+        "positions": base + "任务：识别姿势。\n候选：传教士、后入\n" + shared,
+    }
+
+    prompt = build_merged_prompt(prompts)
+
+    assert prompt.count("系统说明第一行") == 1
+    assert prompt.count("[FRAMES]") == 1
+    assert "### 子任务 scene_type\n任务：识别场景类型。" in prompt
+    assert "### 子任务 positions\n任务：识别姿势。" in prompt
+    assert '"positions": {"labels": [...], "confidence": 0.0}' in prompt
+
+
+def test_split_merged_response_tolerates_partial_answers():
+    parsed = {
+        "scene_type": {"labels": ["卧室"], "confidence": "0.8"},
+        "positions": ["后入", ""],
+        "role_archetype": "人妻",
+    }
+
+    result = split_merged_response(
+        parsed, ["scene_type", "positions", "role_archetype", "face_visibility"]
+    )
+
+    assert result["scene_type"] == {"labels": ["卧室"], "confidence": 0.8}
+    assert result["positions"]["labels"] == ["后入"]
+    assert result["role_archetype"]["labels"] == ["人妻"]
+    assert result["face_visibility"] == {"labels": [], "confidence": 0.0}
+    assert split_merged_response(None, ["scene_type"])["scene_type"]["labels"] == []
+
+
+def test_load_merged_options_validates_mode():
+    assert load_merged_options({"tasks": {}}) is None
+    options = load_merged_options(
+        {
+            "analysis_mode": "merged",
+            "merged": {"batch_size": 10, "frame_profile": "thumb"},
+            "frame_profiles": {"thumb": {"max_edge": 384, "quality": 75}},
+        }
+    )
+    assert options.batch_size == 10 and options.frame_profile.max_edge == 384
+    with pytest.raises(ConfigError):
+        load_merged_options({"analysis_mode": "together"})
+    with pytest.raises(ConfigError):
+        load_merged_options({"analysis_mode": "merged", "merged": {"frame_profile": "missing"}})
+
+
+class _MergedLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def classify(self, prompt, images, **kwargs):
+        self.calls.append(len(images))
+        return json.dumps(
+            {
+                "scene_type": {"labels": ["卧室"], "confidence": 0.9},
+                "positions": {"labels": ["后入"]},
+            },
+            ensure_ascii=False,
+        )
+
+
+def test_analysis_service_merged_mode_sends_each_batch_once(tmp_path):
+    prompts_dir = tmp_path / "prompts"
+    prompts_dir.mkdir()
+    for task_id in ("scene_type", "positions"):
+        (prompts_dir / f"{task_id}.yaml").write_text(
+            yaml.safe_dump(
+                {"system_prompt": "严格输出 JSON", "user_prompt_template": f"识别 {task_id}"}
+            ),
+            encoding="utf-8",
+        )
+    tasks_path = tmp_path / "tasks.yaml"
+    tasks_path.write_text(
+        yaml.safe_dump(
+            {
+                "analysis_mode": "merged",
+                "merged": {"batch_size": 5},
+                "tasks": {
+                    "scene_type": {"prompt_file": "scene_type.yaml"},
+                    "positions": {"prompt_file": "positions.yaml"},
+                },
+            }
+        ),
+        encoding="utf-8",
+    )
+    config = AppConfig(
+        analysis=AnalysisConfig(tasks_config_path=tasks_path, prompts_dir=prompts_dir)
+    )
+    llm = _MergedLLM()
+    service = AnalysisService(llm, config, logging.getLogger("test"))
+    frames = [Frame(index=i + 1, data=b"jpeg%d" % i) for i in range(12)]
+
+    result = asyncio.run(service.analyze_video(frames))
+
+    # 12 帧 / 每批 5 帧 = 3 个请求，两个子任务共用
+    assert llm.calls == [5, 5, 2]
+    assert result == {"scene_type": ["卧室"], "positions": ["后入"]}
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import asyncio
-from pathlib import Path
-from types import SimpleNamespace
 
+from vrenamer.naming import NamingStyleConfig
+from vrenamer.webui.services import context as pipeline_context
 from vrenamer.webui.services import pipeline
+from vrenamer.webui.settings import Settings
+
+
+def _settings(**overrides) -> Settings:
+    """真实的 Settings（不读取 .env），只覆盖测试关心的字段."""
+    base = {"retry": 0, "request_timeout": 5, "adaptive_concurrency": False, "max_concurrency": 4}
+    return Settings(_env_file=None, **{**base, **overrides})
 
 
 def test_generate_names_with_styles_uses_adapter(monkeypatch):
@@ -14,6 +21,9 @@ def test_generate_names_with_styles_uses_adapter(monkeypatch):
         def __init__(self, *args, **kwargs):
             pass
 
+        async def close(self):
+            pass
+
         async def classify_json(
             self,
             model,
@@ -37,24 +47,15 @@ def test_generate_names_with_styles_uses_adapter(monkeypatch):
             DummyClient.calls += 1
             return '{"names": ["测试<>文件", "次选"]}'
 
-    monkeypatch.setattr(pipeline, "GeminiClient", DummyClient)
-
-    class DummySettings:
-        gemini_base_url = ""
-        gemini_api_key = ""
-        llm_transport = "openai_compat"
-        request_timeout = 5
-        model_flash = "flash"
-        model_pro = "pro"
-        naming_styles = "chinese_descriptive"
-        naming_style_config = "examples/naming_styles.yaml"
-        candidates_per_style = 2
+    monkeypatch.setattr(pipeline_context, "GeminiClient", DummyClient)
 
-        def get_style_ids(self):
-            return ["chinese_descriptive"]
-
-        def get_style_config_path(self) -> Path:
-            return Path(self.naming_style_config)
+    settings = _settings(
+        gemini_base_url="",
+        model_flash="flash",
+        model_pro="pro",
+        naming_styles="chinese_descriptive",
+        candidates_per_style=2,
+    )
 
     tags = {
         "category": "剧情",
@@ -63,7 +64,7 @@ def test_generate_names_with_styles_uses_adapter(monkeypatch):
         "actors": ["演员A"],
     }
 
-    result = asyncio.run(pipeline.generate_names_with_styles(tags, DummySettings()))
+    result = asyncio.run(pipeline.generate_names_with_styles(tags, settings))
 
     assert DummyClient.calls == 1
     assert result
@@ -71,6 +72,57 @@ def test_generate_names_with_styles_uses_adapter(monkeypatch):
     assert all(item["filename"] for item in result)
 
 
+def test_pipeline_context_reuses_client_and_style_config(monkeypatch):
+    class DummyClient:
+        instances = 0
+        closed = 0
+
+        def __init__(self, *args, **kwargs):
+            DummyClient.instances += 1
+
+        async def close(self):
+            DummyClient.closed += 1
+
+        async def name_candidates(
+            self, model, system_prompt, user_text, temperature=0.0, json_array=True
+        ):
+            return '{"names": ["甲", "乙"]}'
+
+    monkeypatch.setattr(pipeline_context, "GeminiClient", DummyClient)
+
+    loads = []
+    original = NamingStyleConfig.from_yaml.__func__
+
+    def counting_from_yaml(cls, path):
+        loads.append(path)
+        return original(cls, path)
+
+    monkeypatch.setattr(NamingStyleConfig, "from_yaml", classmethod(counting_from_yaml))
+
+    settings = _settings(
+        gemini_base_url="http://example.com",
+        gemini_api_key="key",
+        model_flash="flash",
+        model_pro="pro",
+        naming_styles="chinese_descriptive",
+        candidates_per_style=1,
+    )
+
+    async def _run():
+        async with pipeline_context.PipelineContext(settings) as context:
+            for _ in range(3):
+                await pipeline.generate_names_with_styles(
+                    {"scene": "卧室"}, settings, context=context
+                )
+                await pipeline.generate_names("prompt", settings, 2, context=context)
+
+    asyncio.run(_run())
+
+    assert DummyClient.instances == 1
+    assert DummyClient.closed == 1
+    assert len(loads) == 1
+
+
 def test_analyze_tasks_respects_batches(tmp_path, monkeypatch):
     frames = []
     for i in range(12):
@@ -84,6 +136,9 @@ def test_analyze_tasks_respects_batches(tmp_path, monkeypatch):
         def __init__(self, *args, **kwargs):
             pass
 
+        async def close(self):
+            pass
+
         async def classify_json(
             self,
             model,
@@ -107,16 +162,13 @@ def test_analyze_tasks_respects_batches(tmp_path, monkeypatch):
         ):
             return '{"names": []}'
 
-    monkeypatch.setattr(pipeline, "GeminiClient", DummyClient)
+    monkeypatch.setattr(pipeline_context, "GeminiClient", DummyClient)
 
-    settings = SimpleNamespace(
-        gemini_base_url="",
-        gemini_api_key="",
-        llm_transport="openai_compat",
-        request_timeout=5,
+    settings = _settings(
+        gemini_base_url="http://example.com",
+        gemini_api_key="key",
         model_flash="flash",
         model_pro="pro",
-        max_concurrency=4,
         analysis_batch_size=20,  # 新增：从配置读取的批次大小
     )
 
@@ -154,9 +206,14 @@ def test_generate_names_json_fallback(monkeypatch):
             return payload.encode("utf-8")
 
     class DummySession:
+        closed = False
+
         def __init__(self, *args, **kwargs):
             pass
 
+        async def close(self):
+            pass
+
         async def __aenter__(self):
             return self
 
@@ -166,13 +223,11 @@ def test_generate_names_json_fallback(monkeypatch):
         def post(self, *args, **kwargs):
             return DummyResponse()
 
-    monkeypatch.setattr("vrenamer.llm.client.aiohttp.ClientSession", DummySession)
+    monkeypatch.setattr("vrenamer.llm.transport.aiohttp.ClientSession", DummySession)
 
-    settings = SimpleNamespace(
+    settings = _settings(
         gemini_base_url="http://example.com",
         gemini_api_key="key",
-        llm_transport="openai_compat",
-        request_timeout=5,
         model_pro="model",
     )
 
@@ -0,0 +1,63 @@
+"""测试视频探测."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from vrenamer.core.types import VideoInfo
+from vrenamer.services.extractor import scale_filter
+from vrenamer.services.probe import choose_sampling_mode, parse_probe_output
+
+
+def _payload(**stream):
+    return {
+        "format": {"duration": "1200.5", "size": "1000", "format_name": "mov,mp4,m4a"},
+        "streams": [
+            {
+                "codec_type": "video",
+                "codec_name": "h264",
+                "width": 1920,
+                "height": 1080,
+                "avg_frame_rate": "30000/1001",
+                **stream,
+            }
+        ],
+        "packets": [
+            {"pts_time": "0.000000", "flags": "K__"},
+            {"pts_time": "0.033367", "flags": "___"},
+            {"pts_time": "2.002000", "flags": "K__"},
+            {"pts_time": "4.004000", "flags": "K__"},
+        ],
+    }
+
+
+def test_parse_probe_output_fills_video_info():
+    info = parse_probe_output(Path("v.mp4"), _payload(side_data_list=[{"rotation": -90}]))
+
+    assert (info.duration, info.size_bytes, info.format) == (1200.5, 1000, "mov")
+    assert (info.codec, info.width, info.height, info.fps) == ("h264", 1920, 1080, 29.97)
+    assert info.rotation == 270
+    assert info.display_size == (1080, 1920)
+    assert info.keyframe_interval == 2.002
+
+
+def test_scale_filter_bounds_long_edge_without_upscaling():
+    landscape = VideoInfo(Path("a"), 60.0, 0, "mp4", width=1920, height=1080)
+    portrait = VideoInfo(Path("b"), 60.0, 0, "mp4", width=1920, height=1080, rotation=90)
+    small = VideoInfo(Path("c"), 60.0, 0, "mp4", width=480, height=360)
+
+    assert scale_filter(landscape) == "scale=640:-2"
+    assert scale_filter(portrait) == "scale=-2:640"
+    assert scale_filter(small) is None
+
+
+def test_choose_sampling_mode_prefers_keyframes_for_long_gops():
+    def info(codec, interval):
+        return VideoInfo(
+            Path("v"), 3600.0, 0, "mp4", codec=codec, fps=30.0, keyframe_interval=interval
+        )
+
+    assert choose_sampling_mode(info("h264", 2.0), 96) == "seek"
+    assert choose_sampling_mode(info("hevc", 20.0), 96) == "keyframe"
+    assert choose_sampling_mode(info("mjpeg", 20.0), 96) == "seek"
+    assert choose_sampling_mode(info("h264", None), 96) == "seek"
@@ -0,0 +1,121 @@
+"""测试 LLM 请求的重试策略."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from email.utils import formatdate
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from vrenamer.core.exceptions import APIError
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+
+def _policy(waits, **kwargs) -> RetryPolicy:
+    async def _sleep(seconds):
+        waits.append(seconds)
+
+    return RetryPolicy(rng=random.Random(0), sleep=_sleep, **kwargs)
+
+
+def test_client_retries_429_and_honours_retry_after():
+    hits = []
+
+    async def chat(request: web.Request) -> web.Response:
+        hits.append(1)
+        if len(hits) <= 2:
+            return web.Response(status=429, headers={"Retry-After": "3"})
+        body = {"choices": [{"message": {"content": '{"labels": ["卧室"]}'}}]}
+        return web.Response(body=json.dumps(body).encode("utf-8"), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_post("/v1beta/openai/chat/completions", chat)
+    waits = []
+    latencies = []
+
+    async def _run():
+        async with TestServer(app) as server:
+            policy = _policy(waits, base_delay=0.1, max_delay=1.0)
+            policy.on_latency = latencies.append
+            async with GeminiClient(str(server.make_url("")), "key", retry_policy=policy) as client:
+                return await client.classify_json(
+                    model="flash", system_prompt="json", user_text="p", images=[]
+                )
+
+    result = asyncio.run(_run())
+
+    assert "卧室" in result
+    assert len(hits) == 3
+    # Retry-After 优先于（更短的）抖动退避
+    assert waits == [3.0, 3.0]
+    # 只有成功的那次 HTTP 请求上报延迟，不含退避
+    assert len(latencies) == 1 and latencies[0] < 3.0
+
+
+def test_retry_budget_caps_retries_under_burst():
+    calls = []
+    waits = []
+    policy = _policy(waits, retries=3, budget=RetryBudget(ratio=0.0, reserve=2))
+
+    async def _send():
+        calls.append(1)
+        raise APIError("busy", status_code=503)
+
+    async def _run():
+        return await asyncio.gather(*[policy.call(_send) for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(_run())
+
+    assert all(isinstance(r, APIError) for r in results)
+    # 5 个首发请求 + 预算内的 2 次重试，其余立即失败
+    assert len(calls) == 7
+    assert policy.budget.spent == 2
+    assert policy.budget.denied == 5
+
+
+def test_timeouts_and_client_errors_are_handled_differently():
+    waits = []
+    policy = _policy(waits, retries=3, base_delay=0.5, max_delay=4.0)
+    timeouts = []
+    bad_requests = []
+    overloads = []
+    policy.on_overload = lambda: overloads.append(1)
+
+    async def _timeout():
+        timeouts.append(1)
+        raise asyncio.TimeoutError()
+
+    async def _bad_request():
+        bad_requests.append(1)
+        raise APIError("bad", status_code=400)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.call(_timeout))
+    with pytest.raises(APIError):
+        asyncio.run(policy.call(_bad_request))
+
+    # 超时只重试一次且等待很短；400 不重试
+    assert len(timeouts) == 2
+    assert len(bad_requests) == 1
+    assert len(waits) == 1 and waits[0] <= 0.5
+    # 超时不是过载信号，不通知并发限制器下调
+    assert overloads == []
+
+
+def test_backoff_and_retry_after_parsing():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0, rng=random.Random(1))
+    delay = policy.base_delay
+    for _ in range(20):
+        delay = policy.next_delay(delay)
+        assert 0.5 <= delay <= 4.0
+
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+    assert 0 < parse_retry_after(formatdate(usegmt=True, timeval=time.time() + 30)) <= 30
@@ -0,0 +1,67 @@
+"""测试最终帧选择."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from vrenamer.core.types import Frame
+from vrenamer.services.selection import evenly_sample, select_frames
+
+pytest.importorskip("numpy")
+
+
+def _gray(seed: int) -> bytes:
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(1024))
+
+
+def _frames(grays):
+    return [
+        Frame(index=i + 1, data=b"jpeg%d" % i, timestamp=float(i), gray=g)
+        for i, g in enumerate(grays)
+    ]
+
+
+def test_diverse_selection_covers_timeline_and_distinct_scenes():
+    # 前 90 帧是同一个画面，最后 10 帧是 10 个不同画面
+    frames = _frames([_gray(0)] * 90 + [_gray(100 + i) for i in range(10)])
+
+    selected, stats = select_frames(frames, 12, min_distance=0.0)
+
+    assert len(selected) == 12
+    assert [f.timestamp for f in selected] == sorted(f.timestamp for f in selected)
+    # 每个时间区间都有帧
+    assert stats.bins == 3
+    assert {int(f.timestamp // (99 / 3)) for f in selected} >= {0, 1, 2}
+    # 3 个区间保底帧都落在重复画面上，其余 9 帧全部取自不同画面；
+    # 均匀抽样只会拿到 1-2 个不同画面
+    distinct = {f.gray for f in selected}
+    assert len(distinct) == 10
+    assert len({f.gray for f in evenly_sample(frames, 12)}) <= 3
+
+
+def test_monotonous_video_stops_early():
+    frames = _frames([_gray(0)] * 40)
+
+    selected, stats = select_frames(frames, 20, min_distance=0.08)
+
+    assert stats.stopped_early
+    assert len(selected) == stats.bins == 5
+
+
+def test_falls_back_to_uniform_without_features():
+    frames = [Frame(index=i, data=b"not-a-jpeg", timestamp=float(i)) for i in range(10)]
+
+    selected, stats = select_frames(frames, 4)
+
+    assert stats.method == "uniform"
+    assert [f.index for f in selected] == [0, 3, 6, 9]
+
+
+def test_evenly_sample_handles_single_target():
+    # 关键帧模式和批次补帧共用此函数；target 为 1 时不能除以 target - 1
+    assert evenly_sample(list(range(10)), 1) == [0]
+    assert evenly_sample(list(range(10)), 4) == [0, 3, 6, 9]
+    assert evenly_sample([], 4) == []
@@ -0,0 +1,71 @@
+"""测试流式响应解析：增量 JSON 扫描和提前结束（本地替身服务，离线运行）."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.streaming import JsonObjectScanner
+
+
+def _feed_all(chunks):
+    scanner = JsonObjectScanner()
+    for chunk in chunks:
+        complete = scanner.feed(chunk)
+        if complete is not None:
+            return complete
+    return None
+
+
+def test_scanner_handles_braces_in_strings_and_leading_text():
+    text = '```json\n{"labels": ["a}b", "c\\"{"], "confidence": 0.8}\n```\n说明文字 {"x": 1}'
+    # 逐字符喂入，结果与一次性喂入一致
+    assert _feed_all(list(text)) == _feed_all([text])
+    assert json.loads(_feed_all([text])) == {"labels": ["a}b", 'c"{'], "confidence": 0.8}
+    # 括号配平但不是合法 JSON 的片段被跳过
+    assert _feed_all(["先看 {labels} 再输出 ", '{"labels": []}']) == '{"labels": []}'
+    assert _feed_all(['{"labels": ["未闭合"']) is None
+
+
+@pytest.mark.parametrize("transport", ["openai_compat", "gemini_native"])
+def test_stream_returns_at_first_complete_object(fake_llm_server, transport):
+    fake_llm_server.tail_delay = 2.0
+
+    async def _run():
+        client = GeminiClient(fake_llm_server.url, "test-key", transport=transport, stream=True)
+        async with client:
+            started = time.monotonic()
+            text = await client.classify_json(
+                model="flash", system_prompt="json", user_text="p", images=[]
+            )
+            return text, time.monotonic() - started
+
+    text, elapsed = asyncio.run(_run())
+
+    assert json.loads(text) == {"labels": ["卧室"], "confidence": 0.9}
+    # 不等待 JSON 之后的慢尾巴
+    assert elapsed < 1.0
+    assert fake_llm_server.finished_streams == 0
+    path, query, body = fake_llm_server.requests[0]
+    if transport == "openai_compat":
+        assert body["stream"] is True
+    else:
+        assert path.endswith(":streamGenerateContent") and query == "alt=sse"
+
+
+def test_non_stream_mode_reads_full_response(fake_llm_server):
+    async def _run():
+        client = GeminiClient(fake_llm_server.url, "test-key", stream=True)
+        async with client:
+            return await client.classify_json(
+                model="flash", system_prompt="json", user_text="p", images=[], stream=False
+            )
+
+    text = asyncio.run(_run())
+
+    assert text == fake_llm_server.content + fake_llm_server.tail
+    assert "stream" not in fake_llm_server.requests[0][2]
@@ -0,0 +1,126 @@
+"""测试请求追踪：懒脱敏和每次请求的 span 记录."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from vrenamer.core.types import Frame
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.tracing import Tracer, redact, redact_headers
+
+
+def test_redact_replaces_base64_without_touching_the_original():
+    blob = "A" * 100_000
+    prompt = "描述画面" * 100
+    body = {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": f"data:image/webp;base64,{blob}"}},
+                ],
+            },
+        ],
+        "contents": [
+            {
+                "parts": [
+                    {"text": prompt},
+                    {"inline_data": {"mime_type": "image/jpeg", "data": blob}},
+                ]
+            }
+        ],
+    }
+
+    view = redact(body)
+
+    assert (
+        view["messages"][0]["content"][1]["image_url"]["url"]
+        == "data:image/webp;base64,<BASE64_LENGTH:100000>"
+    )
+    assert view["contents"][0]["parts"][1]["inline_data"] == {
+        "mime_type": "image/jpeg",
+        "data": "<BASE64_LENGTH:100000>",
+    }
+    # 文本按引用保留，原请求体不变
+    assert view["messages"][0]["content"][0]["text"] is prompt
+    assert body["contents"][0]["parts"][1]["inline_data"]["data"] is blob
+    assert redact_headers({"Authorization": "Bearer sk-secret", "Accept": "*/*"}) == {
+        "Authorization": "***REDACTED***",
+        "Accept": "*/*",
+    }
+
+
+def test_tracing_is_off_by_default(tmp_path):
+    tracer = Tracer(path=tmp_path / "trace.jsonl")
+
+    assert not tracer.spans and not tracer.debug
+    assert tracer.span("classify_json") is None
+    tracer.event("classify_json", "request", body={})
+    assert not (tmp_path / "trace.jsonl").exists()
+
+
+def test_client_writes_request_spans_and_redacted_events(fake_llm_server, tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    frame = Frame(index=1, data=b"\xff\xd8" + b"\x00" * 3000)
+
+    async def _run():
+        client = GeminiClient(
+            fake_llm_server.url, "sk-secret", tracer=Tracer("debug", path=trace_file)
+        )
+        async with client:
+            for _ in range(2):
+                await client.classify_json(
+                    model="flash", system_prompt="json", user_text="p", images=[frame]
+                )
+
+    asyncio.run(_run())
+
+    text = trace_file.read_text(encoding="utf-8")
+    records = [json.loads(line) for line in text.splitlines()]
+    spans = [r for r in records if r["type"] == "span"]
+    events = {r["event"] for r in records if r["type"] == "event"}
+
+    assert len(spans) == 2
+    assert all(s["op"] == "classify_json" and s["status"] == 200 for s in spans)
+    assert all(s["upload_bytes"] > 4000 and s["ttfb_ms"] is not None for s in spans)
+    # 第二次请求复用长连接
+    assert [s["reused"] for s in spans] == [False, True]
+    assert events == {"request", "response_headers", "response"}
+    assert "sk-secret" not in text
+    assert "<BASE64_LENGTH:" in text
+
+
+def test_empty_response_is_logged_and_traced_only_at_debug(tmp_path, caplog):
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    blob = "B" * 50_000
+    body = {"choices": [], "echo": {"url": f"data:image/jpeg;base64,{blob}"}}
+
+    async def chat(request: web.Request) -> web.Response:
+        return web.json_response(body)
+
+    trace_file = tmp_path / "trace.jsonl"
+
+    async def _run(tracer):
+        app = web.Application()
+        app.router.add_post("/v1beta/openai/chat/completions", chat)
+        async with TestServer(app) as server:
+            async with GeminiClient(str(server.make_url("")), "key", tracer=tracer) as client:
+                return await client.name_candidates(
+                    model="pro", system_prompt="json", user_text="p"
+                )
+
+    with caplog.at_level("ERROR", logger="vrenamer.llm.client"):
+        assert asyncio.run(_run(Tracer())) == ""
+        assert asyncio.run(_run(Tracer("debug", path=trace_file))) == ""
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "name_candidates - 空 choices 数组（响应字段: choices, echo）"
+    ] * 2
+    assert blob not in caplog.text
+    events = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    empty = [e for e in events if e.get("event") == "empty_response"]
+    assert empty[0]["response"]["echo"]["url"] == "data:image/jpeg;base64,<BASE64_LENGTH:50000>"
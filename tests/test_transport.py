@@ -0,0 +1,88 @@
+"""测试共享连接池的 HTTP 传输层."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from vrenamer.llm.client import GeminiClient
+from vrenamer.llm.transport import HttpTransport
+
+
+def _app() -> web.Application:
+    async def chat(request: web.Request) -> web.Response:
+        await request.json()
+        body = {"choices": [{"message": {"content": '{"labels": ["卧室"], "confidence": 0.9}'}}]}
+        return web.Response(body=json.dumps(body).encode("utf-8"), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_post("/v1beta/openai/chat/completions", chat)
+    app.router.add_post("/chat/completions", chat)  # OpenAI 后端
+    return app
+
+
+async def _classify(client: GeminiClient) -> str:
+    return await client.classify_json(model="flash", system_prompt="json", user_text="p", images=[])
+
+
+def test_client_reuses_pooled_connections():
+    async def _run():
+        async with TestServer(_app()) as server:
+            http = HttpTransport(limit_per_host=4, auto_decompress=False)
+            async with GeminiClient(str(server.make_url("")), "key", http=http) as client:
+                for _ in range(5):
+                    await _classify(client)
+                results = await asyncio.gather(*[_classify(client) for _ in range(20)])
+                session = http.session()
+            return results, http, session
+
+    results, http, session = asyncio.run(_run())
+
+    assert all("卧室" in r for r in results)
+    assert http.requests == 25
+    # 串行请求复用同一个连接，并发请求受单主机上限约束
+    assert http.connections <= 4
+    assert http.reused >= 21
+    assert session.closed
+
+
+def test_session_is_rebuilt_for_new_event_loop():
+    http = HttpTransport()
+
+    async def _get():
+        return http.session()
+
+    first = asyncio.run(_get())
+    second = asyncio.run(_get())
+
+    assert first is not second
+    asyncio.run(http.close())  # 旧循环的会话无法关闭，不应抛错
+
+
+def test_openai_backend_shares_transport_post(tmp_path):
+    from vrenamer.core.config import LLMBackendConfig
+    from vrenamer.llm.openai import OpenAIClient
+    from vrenamer.llm.tracing import Tracer
+
+    app = _app()
+    trace_file = tmp_path / "trace.jsonl"
+    latencies = []
+
+    async def _run():
+        async with TestServer(app) as server:
+            config = LLMBackendConfig(base_url=str(server.make_url("")), api_key="k", retry=0)
+            client = OpenAIClient(config, tracer=Tracer("spans", path=trace_file))
+            client.retry_policy.on_latency = latencies.append
+            try:
+                return await client.generate(prompt="p")
+            finally:
+                await client.close()
+
+    assert "卧室" in asyncio.run(_run())
+    # 与 Gemini 后端同一条发送路径：span 和单次请求耗时都由 HttpTransport.post 记录
+    (span,) = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert span["op"] == "generate" and span["status"] == 200
+    assert len(latencies) == 1